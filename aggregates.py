@@ -0,0 +1,159 @@
+"""
+Derived screener views computed once per data version and shared by every
+session: top-K tables via partial selection (np.argpartition) instead of
+full sorts, and a correlation matrix from streaming pairwise covariance.
+"""
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Hashable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from metrics import span
+
+CORR_COLUMNS = ["priceUsd", "liquidity", "volume", "netflow", "buyVolume", "sellVolume"]
+MEMO_SIZE = 32
+EMERGING_MAX_AGE_DAYS = 30
+
+
+def top_k(df: pd.DataFrame, by: Sequence[str], ascending: Sequence[bool], k: int) -> pd.DataFrame:
+    """
+    Same rows as df.sort_values(by, ascending=ascending).head(k), but only the
+    candidates for the first k positions of the leading column are sorted.
+    """
+    by, ascending = list(by), list(ascending)
+    if len(df) <= k:
+        return df.sort_values(by, ascending=ascending)
+    lead = df[by[0]].to_numpy(dtype="float64", na_value=np.nan)
+    key = lead if ascending[0] else -lead
+    valid = np.flatnonzero(~np.isnan(key))
+    if len(valid) > k:
+        kth = np.partition(key[valid], k - 1)[k - 1]
+        # Keep ties at the boundary so the secondary columns decide among them.
+        candidates = valid[key[valid] <= kth]
+    else:
+        candidates = np.arange(len(df))  # NaN rows are needed to fill up to k
+    return df.iloc[candidates].sort_values(by, ascending=ascending).head(k)
+
+
+class StreamingCovariance:
+    """
+    Pairwise-complete covariance/correlation accumulated over row batches, like
+    DataFrame.corr() but without holding all rows. Non-finite values count as
+    missing. Values are shifted by the first batch's means to limit cancellation.
+    """
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.shift: Optional[np.ndarray] = None
+        self.n = np.zeros((p, p))
+        self.sx = np.zeros((p, p))
+        self.sxx = np.zeros((p, p))
+        self.sxy = np.zeros((p, p))
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype="float64")
+        mask = np.isfinite(values)
+        if self.shift is None:
+            counts = mask.sum(axis=0)
+            sums = np.where(mask, values, 0.0).sum(axis=0)
+            self.shift = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        z = np.where(mask, values - self.shift, 0.0)
+        m = mask.astype("float64")
+        self.n += m.T @ m
+        self.sx += z.T @ m
+        self.sxx += (z * z).T @ m
+        self.sxy += z.T @ z
+
+    def update_frame(self, df: pd.DataFrame):
+        self.update(df.reindex(columns=self.columns).to_numpy(dtype="float64", na_value=np.nan))
+
+    def correlation(self) -> pd.DataFrame:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_i = self.sx / self.n
+            mean_j = mean_i.T
+            cov = self.sxy / self.n - mean_i * mean_j
+            var_i = self.sxx / self.n - mean_i ** 2
+            var_j = var_i.T
+            corr = cov / np.sqrt(var_i * var_j)
+        corr = np.clip(corr, -1.0, 1.0)
+        np.fill_diagonal(corr, np.where(np.diag(var_i) > 0, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def correlation(df: pd.DataFrame, columns: Sequence[str] = CORR_COLUMNS, batch_rows: int = 65536) -> pd.DataFrame:
+    acc = StreamingCovariance(columns)
+    for start in range(0, len(df), batch_rows):
+        acc.update_frame(df.iloc[start:start + batch_rows])
+    return acc.correlation()
+
+
+class ScreenerAggregates(NamedTuple):
+    significant: pd.DataFrame
+    fundamentals: pd.DataFrame
+    emerging: pd.DataFrame
+    correlation: pd.DataFrame
+
+
+def compute_screener_aggregates(df: pd.DataFrame, k: int = 30) -> ScreenerAggregates:
+    with span("aggregate", endpoint="/token-screener", rows=len(df)):
+        significant = top_k(df, ["volume", "netflow"], [False, False], k)
+        if "fdvMcRatio" in df.columns:
+            fundamentals = top_k(df, ["fdvMcRatio", "volume"], [True, False], k)
+        else:
+            fundamentals = top_k(df, ["volume"], [False], k)
+        emerging = df
+        if "tokenAgeDaysNum" in df.columns:
+            emerging = df[df["tokenAgeDaysNum"].fillna(1e9) <= EMERGING_MAX_AGE_DAYS]
+        emerging = top_k(emerging, ["netflow", "volume"], [False, False], k)
+        return ScreenerAggregates(significant, fundamentals, emerging, correlation(df))
+
+
+_memo: "OrderedDict[Hashable, tuple]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _memo_key(df: pd.DataFrame, version: Optional[Hashable], k: int) -> tuple:
+    return ("version", version, k) if version is not None else ("frame", id(df), k)
+
+
+def cached_screener_aggregates(
+    df: pd.DataFrame, version: Optional[Hashable] = None, k: int = 30
+) -> Optional[ScreenerAggregates]:
+    """The memoised result for this frame/version, or None."""
+    key = _memo_key(df, version, k)
+    with _memo_lock:
+        hit = _memo.get(key)
+        if hit is not None and (hit[0] is None or hit[0]() is df):
+            _memo.move_to_end(key)
+            return hit[1]
+    return None
+
+
+def store_screener_aggregates(
+    df: pd.DataFrame, version: Optional[Hashable], k: int, result: ScreenerAggregates
+):
+    with _memo_lock:
+        _memo[_memo_key(df, version, k)] = (None if version is not None else weakref.ref(df), result)
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+
+
+def screener_aggregates(df: pd.DataFrame, version: Optional[Hashable] = None, k: int = 30) -> ScreenerAggregates:
+    """
+    Memoised compute_screener_aggregates. Pass the data version when there is
+    one; otherwise results are tied to this exact (unchanged) frame object.
+    """
+    result = cached_screener_aggregates(df, version, k)
+    if result is None:
+        result = compute_screener_aggregates(df, k)
+        store_screener_aggregates(df, version, k, result)
+    return result
+
+
+def memo_keys() -> List[Hashable]:
+    with _memo_lock:
+        return list(_memo)
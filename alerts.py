@@ -0,0 +1,390 @@
+"""
+Smart money alerts: declarative rules evaluated on every polled batch.
+
+Rules file (JSON):
+
+    {
+      "sinks": [{"type": "jsonl", "path": "alerts.jsonl"}, {"type": "sqlite", "path": "alerts.db"}],
+      "rules": [
+        {"id": "new-token-volume", "dataset": "inflows",
+         "when": [["tokenAgeDaysNum", "<=", 7], ["volume24hUSD", ">=", 1000000]],
+         "message": "{symbol} ({chain}) is {tokenAgeDays} old with ${volume24hUSD:,.0f} 24h SM volume"},
+        {"id": "balance-jump", "dataset": "holdings", "when": [["balancePctChange24H", ">", 25]],
+         "cooldown": 21600}
+      ]
+    }
+
+Conditions are [column, op, value] with op one of < <= > >= == != in not_in,
+all of which must hold. Each batch is hashed over the columns the rules read,
+and only rows that are new or changed since the previous batch of the dataset
+are evaluated, with one vectorized mask per distinct condition. Alerts are
+edge-triggered: a rule fires for a token when it starts matching, not on every
+poll while it keeps matching, and never twice for a token within the rule's
+cooldown (default NANSEN_ALERT_COOLDOWN seconds), whichever query it came from. The SQLite sink also remembers when
+each alert last fired, so a restarted worker does not repeat them.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from deltas import TRACKER_SETTINGS
+from metrics import inc, span
+
+ALERT_COOLDOWN = float(os.getenv("NANSEN_ALERT_COOLDOWN", "3600"))
+WEBHOOK_TIMEOUT = float(os.getenv("NANSEN_ALERT_WEBHOOK_TIMEOUT", "5"))
+
+OPS = ("<", "<=", ">", ">=", "==", "!=", "in", "not_in")
+SYMBOL_COLUMNS = ("symbol", "tokenSymbol")
+
+logger = logging.getLogger("nansen.alerts")
+
+Condition = Tuple[str, str, object]
+
+
+class Rule(NamedTuple):
+    id: str
+    dataset: str
+    when: Tuple[Condition, ...]
+    message: str = ""
+    cooldown: float = ALERT_COOLDOWN
+
+
+class Alert(NamedTuple):
+    rule_id: str
+    dataset: str
+    key: str  # "chain:tokenAddress"
+    fired_at: float
+    message: str
+    values: Dict
+
+
+def key_columns(dataset: str) -> List[str]:
+    return list(TRACKER_SETTINGS.get(dataset, {}).get("key_columns", ("chain", "tokenAddress")))
+
+
+def parse_rule(spec: Dict) -> Rule:
+    try:
+        rule_id, dataset, when = str(spec["id"]), spec["dataset"], spec["when"]
+    except KeyError as e:
+        raise ValueError(f"Alert rule {spec!r} is missing {e.args[0]!r}.") from None
+    conditions = []
+    for condition in when:
+        if len(condition) != 3 or condition[1] not in OPS:
+            raise ValueError(f"Rule {rule_id}: bad condition {condition!r}; expected [column, op, value], op in {OPS}.")
+        column, op, value = condition
+        if op in ("in", "not_in"):
+            value = tuple(value)
+        elif op in ("<", "<=", ">", ">=") and (not isinstance(value, (int, float)) or isinstance(value, bool)):
+            raise ValueError(f"Rule {rule_id}: {column} {op} needs a number, got {value!r}.")
+        conditions.append((str(column), op, value))
+    if not conditions:
+        raise ValueError(f"Rule {rule_id} has no conditions.")
+    return Rule(rule_id, dataset, tuple(conditions), spec.get("message", ""),
+                float(spec.get("cooldown", ALERT_COOLDOWN)))
+
+
+def _mask(column: pd.Series, op: str, value) -> np.ndarray:
+    """Vectorized condition; missing values never match."""
+    if op == "in":
+        return column.isin(value).to_numpy(dtype=bool)
+    if op == "not_in":
+        return (~column.isin(value) & column.notna()).to_numpy(dtype=bool)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        values = pd.to_numeric(column, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    else:
+        values = column.astype(object).to_numpy()
+    with np.errstate(invalid="ignore"):
+        if op == "<":
+            out = values < value
+        elif op == "<=":
+            out = values <= value
+        elif op == ">":
+            out = values > value
+        elif op == ">=":
+            out = values >= value
+        elif op == "==":
+            out = values == value
+        else:
+            out = (values != value) & column.notna().to_numpy()
+    return np.asarray(out, dtype=bool)
+
+
+class _DatasetState:
+    """Tokens of one dataset; they get integer ids so rule state is numpy arrays.
+
+    Cooldowns are kept here, per rule and token, so they hold across sources.
+    """
+
+    def __init__(self):
+        self.keys = pd.Index([], dtype=object)
+        self.last_fired: Dict[str, np.ndarray] = {}  # rule id -> time of the last alert, -inf if none
+
+    def ids(self, keys: np.ndarray, rules: List[Rule], seeds: Dict[str, Dict[str, float]]) -> np.ndarray:
+        ids = self.keys.get_indexer(keys)
+        new = ids < 0
+        if new.any():
+            added = pd.Index(pd.unique(keys[new]))
+            self.keys = self.keys.append(added)
+            for rule in rules:
+                fired = np.full(len(added), -np.inf)
+                if seeds.get(rule.id):
+                    fired = pd.Series(seeds[rule.id], dtype="float64").reindex(added).fillna(-np.inf).to_numpy()
+                self.last_fired[rule.id] = np.concatenate([self.last_fired.get(rule.id, np.zeros(0)), fired])
+            ids = self.keys.get_indexer(keys)
+        return ids
+
+
+class _SourceState:
+    """What one source (e.g. one polled query) last sent, indexed by the dataset's token ids."""
+
+    def __init__(self):
+        self.hashes = np.zeros(0, dtype=np.uint64)  # hash of the rule columns in the last batch
+        self.seen = np.zeros(0, dtype=bool)
+        self.active: Dict[str, np.ndarray] = {}  # rule id -> token matched at its last change
+
+    def grow(self, size: int, rules: List[Rule]):
+        grow = size - len(self.seen)
+        if grow > 0:
+            self.hashes = np.concatenate([self.hashes, np.zeros(grow, dtype=np.uint64)])
+            self.seen = np.concatenate([self.seen, np.zeros(grow, dtype=bool)])
+            for rule in rules:
+                self.active[rule.id] = np.concatenate([self.active.get(rule.id, np.zeros(0, bool)), np.zeros(grow, bool)])
+
+
+class AlertEngine:
+    def __init__(self, rules: Sequence[Rule], sinks: Sequence = (), clock: Callable[[], float] = time.time):
+        self.rules = list(rules)
+        self.sinks = list(sinks)
+        self.clock = clock
+        self._by_dataset: Dict[str, List[Rule]] = {}
+        for rule in self.rules:
+            self._by_dataset.setdefault(rule.dataset, []).append(rule)
+        self._datasets: Dict[str, _DatasetState] = {}
+        self._sources: Dict[Tuple[str, Optional[str]], _SourceState] = {}  # (dataset, source) -> state
+        # Last alert times from a persistent sink, applied as tokens are first seen.
+        self._seeds: Dict[str, Dict[str, float]] = {}
+        self._warned: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        for sink in self.sinks:
+            if hasattr(sink, "last_fired"):
+                for (rule_id, key), fired_at in sink.last_fired().items():
+                    self._seeds.setdefault(rule_id, {})[key] = fired_at
+
+    def columns(self, dataset: str) -> List[str]:
+        """Columns the dataset's rules read."""
+        return list(dict.fromkeys(column for rule in self._by_dataset.get(dataset, []) for column, _, _ in rule.when))
+
+    def evaluate(
+        self, dataset: str, df: pd.DataFrame, complete: bool = False, source: Optional[str] = None
+    ) -> List[Alert]:
+        """
+        Evaluate the dataset's rules on the rows of `df` that changed since the
+        previous batch from the same `source` (e.g. one polled query), write fired
+        alerts to the sinks and return them. With `complete=True`, `df` is the whole
+        result of that source: tokens absent from it stop matching (and may fire
+        again when they come back).
+        """
+        rules = self._by_dataset.get(dataset)
+        if not rules or (df.empty and not complete):
+            return []
+        with self._lock, span("alerts", dataset=dataset, rows=len(df)) as tags:
+            tokens = self._datasets.setdefault(dataset, _DatasetState())
+            state = self._sources.setdefault((dataset, source), _SourceState())
+            changed, ids = self._changed_rows(dataset, tokens, state, df, complete)
+            tags["changed"] = len(changed)
+            alerts = self._fire(dataset, tokens, state, rules, changed, ids) if len(changed) else []
+            tags["fired"] = len(alerts)
+        if alerts:
+            inc("nansen_alerts_total", len(alerts), dataset=dataset)
+            for sink in self.sinks:
+                try:
+                    sink.write(alerts)
+                except Exception:
+                    logger.exception("Alert sink %s failed", type(sink).__name__)
+        return alerts
+
+    def _changed_rows(
+        self, dataset: str, tokens: _DatasetState, state: _SourceState, df: pd.DataFrame, complete: bool
+    ) -> Tuple[pd.DataFrame, np.ndarray]:
+        parts = [df[column].astype(str) for column in key_columns(dataset)]
+        keys = parts[0]
+        for part in parts[1:]:
+            keys = keys + ":" + part
+        ids = tokens.ids(keys.to_numpy(dtype=object), self._by_dataset[dataset], self._seeds)
+        state.grow(len(tokens.keys), self._by_dataset[dataset])
+        watched = [column for column in self.columns(dataset) if column in df.columns]
+        if watched:
+            hashes = pd.util.hash_pandas_object(df[watched], index=False).to_numpy()
+        else:
+            hashes = np.zeros(len(df), dtype=np.uint64)
+        changed = ~state.seen[ids] | (state.hashes[ids] != hashes)
+        if complete:
+            gone = np.ones(len(state.seen), dtype=bool)
+            gone[ids] = False
+            state.seen[gone] = False
+            for active in state.active.values():
+                active[gone] = False
+        state.hashes[ids] = hashes
+        state.seen[ids] = True
+        return df[changed], ids[changed]
+
+    def _fire(
+        self, dataset: str, tokens: _DatasetState, state: _SourceState, rules: List[Rule],
+        rows: pd.DataFrame, ids: np.ndarray,
+    ) -> List[Alert]:
+        masks: Dict[Condition, np.ndarray] = {}  # rules often share conditions; compute each once
+        now = self.clock()
+        fired: List[Tuple[Rule, np.ndarray]] = []
+        for rule in rules:
+            missing = [column for column, _, _ in rule.when if column not in rows.columns]
+            if missing:
+                if (rule.id, dataset) not in self._warned:
+                    self._warned.add((rule.id, dataset))
+                    logger.warning("Rule %s skipped: %s has no column %s", rule.id, dataset, ", ".join(missing))
+                continue
+            match = np.ones(len(rows), dtype=bool)
+            try:
+                for condition in rule.when:
+                    if condition not in masks:
+                        masks[condition] = _mask(rows[condition[0]], condition[1], condition[2])
+                    match &= masks[condition]
+            except (TypeError, ValueError) as e:
+                if (rule.id, dataset) not in self._warned:
+                    self._warned.add((rule.id, dataset))
+                    logger.warning("Rule %s skipped: cannot evaluate it on %s: %s", rule.id, dataset, e)
+                continue
+            active, last_fired = state.active[rule.id], tokens.last_fired[rule.id]
+            # Edge: fire only where the token was not already matching, and not within the cooldown.
+            fire = match & ~active[ids] & (now - last_fired[ids] >= rule.cooldown)
+            active[ids] = match
+            if fire.any():
+                positions = np.flatnonzero(fire)
+                positions = positions[np.unique(ids[positions], return_index=True)[1]]
+                last_fired[ids[positions]] = now
+                fired.append((rule, positions))
+        return self._alerts(dataset, tokens, rows, ids, fired, now) if fired else []
+
+    def _alerts(
+        self, dataset: str, tokens: _DatasetState, rows: pd.DataFrame, ids: np.ndarray,
+        fired: List[Tuple[Rule, np.ndarray]], now: float,
+    ) -> List[Alert]:
+        # Rows that fired any rule are converted to dicts once, not once per rule.
+        union = np.unique(np.concatenate([positions for _, positions in fired]))
+        records = {
+            position: {column: _plain(value) for column, value in record.items()}
+            for position, record in zip(union.tolist(), rows.iloc[union].to_dict("records"))
+        }
+        symbol_column = next((c for c in SYMBOL_COLUMNS if c in rows.columns), None)
+        for record in records.values():
+            record["symbol"] = record.get(symbol_column) if symbol_column else None
+        out = []
+        for rule, positions in fired:
+            columns = list(dict.fromkeys([*key_columns(dataset), *(column for column, _, _ in rule.when)]))
+            for position, key in zip(positions.tolist(), tokens.keys[ids[positions]]):
+                record = records[position]
+                values = {"symbol": record["symbol"], **{column: record.get(column) for column in columns}}
+                message = f"{rule.id}: {record['symbol'] or key}"
+                if rule.message:
+                    try:
+                        message = rule.message.format_map(record)
+                    except (KeyError, ValueError, TypeError):
+                        logger.warning("Rule %s: cannot format message %r", rule.id, rule.message)
+                out.append(Alert(rule.id, dataset, key, now, message, values))
+        return out
+
+
+def _plain(value):
+    """JSON-friendly value: numpy numbers to Python, missing to None, lists kept, anything else to str."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_plain(item) for item in value]
+    return None if pd.isna(value) else str(value)
+
+
+class JsonlSink:
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, alerts: List[Alert]):
+        with open(self.path, "a") as fh:
+            for alert in alerts:
+                fh.write(json.dumps(alert._asdict(), default=str) + "\n")
+
+
+class SqliteSink:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS alerts ("
+                "rule_id TEXT, dataset TEXT, key TEXT, fired_at REAL, message TEXT, alert_values TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS alerts_rule_key ON alerts (rule_id, key, fired_at)")
+
+    def write(self, alerts: List[Alert]):
+        rows = [(a.rule_id, a.dataset, a.key, a.fired_at, a.message, json.dumps(a.values, default=str)) for a in alerts]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO alerts VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def last_fired(self) -> Dict[Tuple[str, str], float]:
+        with self._lock:
+            rows = self._conn.execute("SELECT rule_id, key, MAX(fired_at) FROM alerts GROUP BY rule_id, key").fetchall()
+        return {(rule_id, key): fired_at for rule_id, key, fired_at in rows}
+
+    def recent(self, limit: int = 100) -> pd.DataFrame:
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT * FROM alerts ORDER BY fired_at DESC LIMIT ?", self._conn, params=(limit,)
+            )
+
+
+class WebhookSink:
+    """POSTs {"alerts": [...]} to a URL; failures are logged by the engine, never retried."""
+
+    def __init__(self, url: str, timeout: float = WEBHOOK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def write(self, alerts: List[Alert]):
+        import httpx
+
+        body = json.loads(json.dumps({"alerts": [alert._asdict() for alert in alerts]}, default=str))
+        httpx.post(self.url, json=body, timeout=self.timeout).raise_for_status()
+
+
+SINKS = {"jsonl": JsonlSink, "sqlite": SqliteSink, "webhook": WebhookSink}
+
+
+def make_sink(spec: Dict):
+    kind = spec.get("type")
+    if kind not in SINKS:
+        raise ValueError(f"Unknown alert sink {kind!r}; expected one of {', '.join(SINKS)}.")
+    return SINKS[kind](**{name: value for name, value in spec.items() if name != "type"})
+
+
+def load_engine(path: str, clock: Callable[[], float] = time.time) -> AlertEngine:
+    """AlertEngine for a rules file; sinks default to alerts.jsonl next to it."""
+    with open(path) as fh:
+        config = json.load(fh)
+    rules = [parse_rule(spec) for spec in config.get("rules", [])]
+    ids = [rule.id for rule in rules]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Duplicate rule ids in {path}.")
+    sink_specs = config.get("sinks") or [
+        {"type": "jsonl", "path": os.path.join(os.path.dirname(os.path.abspath(path)), "alerts.jsonl")}
+    ]
+    return AlertEngine(rules, [make_sink(spec) for spec in sink_specs], clock)
@@ -0,0 +1,386 @@
+"""
+Analytics jobs over normalized frames, off the Streamlit script thread.
+
+    handle = default_pool().submit(df, {
+        "corr": ("correlation", {"columns": CORR_COLUMNS}),
+        "top": ("topk", {"by": ["volume"], "k": 30}),
+    })
+    handle.done("top")       # never blocks
+    handle.result("top")     # rows of df, in order (blocks until finished)
+
+Frames with at least NANSEN_ANALYTICS_MIN_ROWS rows go to a process pool:
+only the columns the jobs read are written once as an Arrow IPC stream into
+shared memory, which every job of the submit call maps instead of receiving
+a pickled copy. Jobs return small results (row positions, a correlation
+matrix) that are turned back into rows of the caller's frame, so dtypes and
+index are preserved. Smaller frames, or NANSEN_ANALYTICS_WORKERS=0, run on a
+thread of the calling process with the same handle.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from aggregates import (
+    CORR_COLUMNS,
+    EMERGING_MAX_AGE_DAYS,
+    ScreenerAggregates,
+    _memo_key,
+    cached_screener_aggregates,
+    correlation,
+    store_screener_aggregates,
+    top_k,
+)
+from metrics import REGISTRY
+from query import SCREENER, Query
+
+ANALYTICS_WORKERS = int(os.getenv("NANSEN_ANALYTICS_WORKERS", str(min(4, os.cpu_count() or 1))))
+ANALYTICS_MIN_ROWS = int(os.getenv("NANSEN_ANALYTICS_MIN_ROWS", "20000"))
+# spawn, not fork: the Streamlit server is multi-threaded.
+START_METHOD = os.getenv("NANSEN_ANALYTICS_START_METHOD", "spawn")
+
+
+class Job(NamedTuple):
+    run: Callable  # (frame, **params) -> small picklable result; runs in the worker
+    columns: Callable  # (**params) -> columns the job reads
+    finish: Optional[Callable] = None  # (full frame, result, **params) -> value; runs in the caller
+
+
+def _positions(df: pd.DataFrame) -> np.ndarray:
+    # Worker frames have a RangeIndex, so labels are row positions.
+    return df.index.to_numpy(dtype=np.int64)
+
+
+def _rows(df: pd.DataFrame, positions: np.ndarray, **params) -> pd.DataFrame:
+    return df.iloc[positions]
+
+
+def _topk_run(df: pd.DataFrame, by: List[str], ascending: Optional[List[bool]] = None, k: int = 30):
+    return _positions(top_k(df, by, ascending or [False] * len(by), k))
+
+
+def _query_run(df: pd.DataFrame, query: Query):
+    return _positions(query.apply(df))
+
+
+def _query_columns(query: Query) -> List[str]:
+    from query import LOCAL_COLUMNS
+
+    return list(query.order) + [LOCAL_COLUMNS[query.path][name] for name in query.local()]
+
+
+def _correlation_run(df: pd.DataFrame, columns: List[str] = CORR_COLUMNS):
+    # Missing columns stay in the matrix as NaN rows, as with inline correlation().
+    return correlation(df, columns)
+
+
+JOBS: Dict[str, Job] = {
+    "correlation": Job(_correlation_run, lambda columns=CORR_COLUMNS: list(columns)),
+    "topk": Job(_topk_run, lambda by, ascending=None, k=30: list(by), _rows),
+    "query": Job(_query_run, _query_columns, _rows),
+}
+
+
+def register_job(name: str, run: Callable, columns: Callable, finish: Optional[Callable] = None):
+    """Add a job; `run` must be a module-level function so worker processes can import it."""
+    JOBS[name] = Job(run, columns, finish)
+
+
+def _read_shared(shm_name: str) -> pd.DataFrame:
+    import pyarrow as pa
+
+    shm = SharedMemory(name=shm_name)
+    try:
+        buf = pa.py_buffer(shm.buf)
+        with pa.ipc.open_stream(buf) as reader:
+            df = reader.read_pandas()
+        del reader, buf
+    finally:
+        shm.close()
+    return df
+
+
+def _run_shared(name: str, shm_name: str, params: Dict):
+    """Worker entry point: map the shared frame and run one job."""
+    return JOBS[name].run(_read_shared(shm_name), **params)
+
+
+def _warm():
+    import pyarrow  # noqa: F401  (workers pay the import once, before the first job)
+
+
+def _share(df: pd.DataFrame) -> SharedMemory:
+    """Write df (no index) as one Arrow IPC stream into a new shared memory block."""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sizer = pa.MockOutputStream()
+    with pa.ipc.new_stream(sizer, table.schema) as writer:
+        writer.write_table(table)
+    shm = SharedMemory(create=True, size=max(1, sizer.size()))
+    try:
+        buf = pa.py_buffer(shm.buf)
+        with pa.ipc.new_stream(pa.FixedSizeBufferWriter(buf), table.schema) as writer:
+            writer.write_table(table)
+        del writer, buf
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    return shm
+
+
+class AnalyticsHandle:
+    """Futures of one submit() call, by job key; every method except result() returns at once."""
+
+    def __init__(self, df: pd.DataFrame, futures: Dict[str, Future], specs: Dict[str, Tuple[str, Dict]]):
+        self.df = df
+        self.futures = futures
+        self.specs = specs
+        self._done_callbacks: List[Callable] = []
+        self._lock = threading.Lock()
+        self._pending = len(futures)
+        for future in futures.values():
+            future.add_done_callback(self._one_done)
+
+    def _one_done(self, _future: Future):
+        with self._lock:
+            self._pending -= 1
+            callbacks = list(self._done_callbacks) if self._pending == 0 else []
+        for callback in callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback: Callable):
+        """Call callback(handle) once every job has finished (immediately if they have)."""
+        with self._lock:
+            if self._pending:
+                self._done_callbacks.append(callback)
+                return
+        callback(self)
+
+    def done(self, key: Optional[str] = None) -> bool:
+        if key is not None:
+            return self.futures[key].done()
+        return all(future.done() for future in self.futures.values())
+
+    def progress(self) -> Tuple[int, int]:
+        return sum(future.done() for future in self.futures.values()), len(self.futures)
+
+    def exception(self, key: str) -> Optional[BaseException]:
+        """The job's exception (CancelledError if it was cancelled), or None while it runs or when it succeeded."""
+        future = self.futures[key]
+        if not future.done():
+            return None
+        return CancelledError() if future.cancelled() else future.exception()
+
+    def result(self, key: str, timeout: Optional[float] = None):
+        name, params = self.specs[key]
+        value = self.futures[key].result(timeout)
+        finish = JOBS[name].finish
+        return finish(self.df, value, **params) if finish is not None else value
+
+
+class AnalyticsPool:
+    def __init__(self, workers: int = ANALYTICS_WORKERS, min_rows: int = ANALYTICS_MIN_ROWS,
+                 start_method: str = START_METHOD):
+        self.workers = workers
+        self.min_rows = min_rows
+        self.start_method = start_method
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._threads = ThreadPoolExecutor(max_workers=max(1, min(workers, 4)), thread_name_prefix="analytics")
+        self._lock = threading.Lock()
+
+    def _process_pool(self) -> Executor:
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=get_context(self.start_method), initializer=_warm
+                )
+            return self._processes
+
+    def submit(self, df: pd.DataFrame, jobs: Dict[str, Tuple[str, Dict]]) -> AnalyticsHandle:
+        """Start jobs ({key: (job name, params)}) over df and return without waiting."""
+        started = time.perf_counter()
+        unknown = {name for name, _ in jobs.values()} - set(JOBS)
+        if unknown:
+            raise ValueError(f"Unknown analytics jobs: {', '.join(sorted(unknown))}.")
+        columns = list(dict.fromkeys(
+            column for name, params in jobs.values() for column in JOBS[name].columns(**params)
+            if column in df.columns
+        ))
+        frame = df[columns].reset_index(drop=True)
+        if self.workers > 0 and len(df) >= self.min_rows:
+            try:
+                futures = self._submit_processes(frame, jobs)
+                mode = "process"
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory); start a fresh pool next time.
+                with self._lock:
+                    self._processes = None
+                futures = self._submit_threads(frame, jobs)
+                mode = "thread"
+        else:
+            futures = self._submit_threads(frame, jobs)
+            mode = "thread"
+        for key, future in futures.items():
+            tags = {"job": jobs[key][0], "key": key, "rows": len(df), "mode": mode}
+            future.add_done_callback(
+                lambda f, tags=tags: REGISTRY.record(
+                    "analytics", time.perf_counter() - started, tags,
+                    type(f.exception()).__name__ if not f.cancelled() and f.exception() else None,
+                )
+            )
+        return AnalyticsHandle(df, futures, dict(jobs))
+
+    def _submit_threads(self, frame: pd.DataFrame, jobs: Dict[str, Tuple[str, Dict]]) -> Dict[str, Future]:
+        return {key: self._threads.submit(JOBS[name].run, frame, **params) for key, (name, params) in jobs.items()}
+
+    def _submit_processes(self, frame: pd.DataFrame, jobs: Dict[str, Tuple[str, Dict]]) -> Dict[str, Future]:
+        pool = self._process_pool()
+        shm = _share(frame)
+        futures: Dict[str, Future] = {}
+        try:
+            for key, (name, params) in jobs.items():
+                futures[key] = pool.submit(_run_shared, name, shm.name, params)
+        except BaseException:
+            for future in futures.values():
+                future.cancel()
+            shm.close()
+            shm.unlink()
+            raise
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def release(_future: Future):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                shm.close()
+                shm.unlink()
+
+        def broken(future: Future):
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                # A worker died while running (e.g. out of memory); start a fresh pool next time.
+                with self._lock:
+                    if self._processes is pool:
+                        self._processes = None
+
+        for future in futures.values():
+            future.add_done_callback(release)
+            future.add_done_callback(broken)
+        return futures
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            processes, self._processes = self._processes, None
+        if processes is not None:
+            processes.shutdown(wait=wait, cancel_futures=True)
+        self._threads.shutdown(wait=wait, cancel_futures=True)
+
+
+_default_pool: Optional[AnalyticsPool] = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> AnalyticsPool:
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = AnalyticsPool()
+        return _default_pool
+
+
+def screener_jobs(k: int = 30) -> Dict[str, Tuple[str, Dict]]:
+    """The jobs behind aggregates.compute_screener_aggregates, one per table."""
+    return {
+        "significant": ("topk", {"by": ["volume", "netflow"], "k": k}),
+        "fundamentals": ("topk", {"by": ["fdvMcRatio", "volume"], "ascending": [True, False], "k": k}),
+        "emerging": ("query", {"query": Query(SCREENER).where(max_age_days=EMERGING_MAX_AGE_DAYS)
+                               .order_by("netflow", "volume").limit(k)}),
+        "correlation": ("correlation", {}),
+    }
+
+
+class _Completed:
+    """Handle-like view of an already memoised ScreenerAggregates."""
+
+    def __init__(self, result: ScreenerAggregates):
+        self._result = result
+
+    def done(self, key: Optional[str] = None) -> bool:
+        return True
+
+    def progress(self) -> Tuple[int, int]:
+        return len(ScreenerAggregates._fields), len(ScreenerAggregates._fields)
+
+    def exception(self, key: str) -> Optional[BaseException]:
+        return None
+
+    def result(self, key: str, timeout: Optional[float] = None):
+        return getattr(self._result, key)
+
+    def add_done_callback(self, callback: Callable):
+        callback(self)
+
+
+# Failed runs are kept (a few, most recent last) so a deterministic error is
+# shown for that version instead of being recomputed on every rerun. Runs that
+# failed for a transient reason (a dead worker, a cancelled job) are not kept.
+FAILED_KEEP = 4
+TRANSIENT_ERRORS = (BrokenProcessPool, CancelledError)
+
+_inflight: Dict[Hashable, AnalyticsHandle] = {}
+_failed: "OrderedDict[Hashable, AnalyticsHandle]" = OrderedDict()
+_inflight_lock = threading.Lock()
+
+
+def screener_aggregates_async(df: pd.DataFrame, version: Hashable, k: int = 30, pool: Optional[AnalyticsPool] = None):
+    """
+    Non-blocking aggregates.screener_aggregates: a handle whose keys are the
+    ScreenerAggregates fields. Sessions asking for the same version share one
+    run, and the finished result is memoised like screener_aggregates'; a run
+    with a failed job is kept as it is, so its error is not recomputed.
+    """
+    cached = cached_screener_aggregates(df, version, k)
+    if cached is not None:
+        return _Completed(cached)
+    key = _memo_key(df, version, k)
+    with _inflight_lock:
+        handle = _inflight.get(key) or _failed.get(key)
+        # Without a version the key is id(df); only reuse a run of this very frame.
+        if handle is not None and (version is not None or handle.df is df):
+            return handle
+        jobs = screener_jobs(k)
+        if "fdvMcRatio" not in df.columns:
+            jobs["fundamentals"] = ("topk", {"by": ["volume"], "k": k})
+        if "tokenAgeDaysNum" not in df.columns:
+            jobs["emerging"] = ("topk", {"by": ["netflow", "volume"], "k": k})
+        handle = (pool or default_pool()).submit(df, jobs)
+        _inflight[key] = handle
+
+    def finished(done: AnalyticsHandle):
+        errors = [done.exception(field) for field in ScreenerAggregates._fields]
+        failed = any(error is not None for error in errors)
+        if not failed:
+            result = ScreenerAggregates(*(done.result(field) for field in ScreenerAggregates._fields))
+            store_screener_aggregates(df, version, k, result)
+        with _inflight_lock:
+            if _inflight.get(key) is done:
+                del _inflight[key]
+            # Frame-keyed runs are not kept: they would pin the frame, and a new frame may reuse its id.
+            if failed and version is not None and not any(isinstance(e, TRANSIENT_ERRORS) for e in errors):
+                _failed[key] = done
+                while len(_failed) > FAILED_KEEP:
+                    _failed.popitem(last=False)
+
+    handle.add_done_callback(finished)
+    return handle
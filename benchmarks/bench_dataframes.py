@@ -0,0 +1,138 @@
+"""
+Micro-benchmark: schema-driven normalization vs the previous per-column
+pd.to_numeric / per-row .apply converters.
+
+    python -m benchmarks.bench_dataframes --rows 100000
+"""
+import argparse
+import json
+import random
+import time
+from typing import Dict, List
+
+import pandas as pd
+
+from dataframes import holdings_to_dataframe, screener_to_dataframe
+
+CHAINS = ["ethereum", "solana", "base", "arbitrum", "bnb"]
+SECTORS = ["DeFi", "Meme", "AI", "Gaming", "Infrastructure", "Stablecoin"]
+
+
+def holdings_records(n: int, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "chain": rng.choice(CHAINS),
+            "tokenAddress": f"0x{rng.getrandbits(160):040x}",
+            "symbol": f"TKN{i % 5000}",
+            "sectors": rng.sample(SECTORS, rng.randint(0, 3)),
+            "balanceUsd": rng.uniform(1e3, 1e9),
+            "balancePctChange24h": rng.uniform(-50, 50),
+            "nofHolders": rng.randint(1, 500),
+            "shareOfHoldings": rng.random(),
+            "tokenAgeDays": rng.randint(0, 3000),
+            "marketCap": rng.uniform(1e5, 1e11),
+        }
+        for i in range(n)
+    ]
+
+
+def screener_records(n: int, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "chain": rng.choice(CHAINS),
+            "tokenAddressHex": f"0x{rng.getrandbits(160):040x}",
+            "tokenSymbol": f"TKN{i % 5000}",
+            "tokenAgeDays": rng.randint(0, 3000),
+            "marketCap": rng.uniform(1e5, 1e11),
+            "liquidity": rng.uniform(1e3, 1e8),
+            "priceUsd": rng.uniform(1e-6, 1e4),
+            "priceChange": rng.uniform(-1, 1),
+            "fdv": rng.uniform(1e5, 1e11),
+            "fdvMcRatio": rng.uniform(1, 10),
+            "buyVolume": rng.uniform(0, 1e7),
+            "inflowFdvRatio": rng.random(),
+            "outflowFdvRatio": rng.random(),
+            "sellVolume": rng.uniform(0, 1e7),
+            "volume": rng.uniform(0, 2e7),
+            "netflow": rng.uniform(-1e7, 1e7),
+        }
+        for i in range(n)
+    ]
+
+
+def legacy_holdings_to_dataframe(items: List[Dict]) -> pd.DataFrame:
+    df = pd.DataFrame(items)
+    if "sectors" in df.columns:
+        df["sectors"] = df["sectors"].apply(lambda x: ", ".join(x) if isinstance(x, list) else x)
+    if "balancePctChange24H" not in df.columns and "balancePctChange24h" in df.columns:
+        df["balancePctChange24H"] = df["balancePctChange24h"]
+    for col in ["balanceUsd", "balancePctChange24H", "shareOfHoldings", "marketCap"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    if "tokenAgeDays" in df.columns:
+        df["tokenAgeDaysNum"] = pd.to_numeric(df["tokenAgeDays"], errors="coerce")
+    return df
+
+
+def legacy_screener_to_dataframe(items: List[Dict]) -> pd.DataFrame:
+    df = pd.DataFrame(items)
+    for col in ["marketCap", "fdv", "fdvMcRatio", "buyVolume", "sellVolume", "volume", "netflow",
+                "priceUsd", "priceChange", "liquidity", "inflowFdvRatio", "outflowFdvRatio"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    if "tokenAgeDays" in df.columns:
+        df["tokenAgeDaysNum"] = pd.to_numeric(df["tokenAgeDays"], errors="coerce")
+    return df
+
+
+def _best_of(fns, items, repeat: int) -> List[float]:
+    """Best time of each converter; runs alternate so both see the same machine noise."""
+    best = [float("inf")] * len(fns)
+    for _ in range(repeat):
+        for i, fn in enumerate(fns):
+            start = time.perf_counter()
+            fn(items)
+            best[i] = min(best[i], time.perf_counter() - start)
+    return best
+
+
+def _bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def run(rows: int, repeat: int = 3) -> List[Dict]:
+    cases = [
+        ("holdings", holdings_records(rows), legacy_holdings_to_dataframe, holdings_to_dataframe),
+        ("screener", screener_records(rows), legacy_screener_to_dataframe, screener_to_dataframe),
+    ]
+    results = []
+    for name, items, legacy, current in cases:
+        legacy_s, current_s = _best_of([legacy, current], items, repeat)
+        legacy_bytes, current_bytes = _bytes(legacy(items)), _bytes(current(items))
+        results.append({
+            "converter": name,
+            "rows": rows,
+            "legacy_seconds": round(legacy_s, 4),
+            "schema_seconds": round(current_s, 4),
+            "speedup": round(legacy_s / current_s, 2),
+            "legacy_bytes": legacy_bytes,
+            "schema_bytes": current_bytes,
+            "memory_ratio": round(current_bytes / legacy_bytes, 3),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for rows in args.rows:
+        for result in run(rows, args.repeat):
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Cold-start benchmark: import time of the entry points and views, measured
+with `python -X importtime` in a fresh interpreter per run.
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --repeat 7 >> import_times.ndjson
+
+Each JSON line carries the git commit and a timestamp, so appending runs to a
+file tracks import time over time. `heaviest` lists the slowest third-party
+top-level packages pulled in by the module.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = [
+    "streamlit_app",
+    "views.smart_money",
+    "views.token_screener",
+    "nansen_client",
+    "nansen_cli",
+    "nansen_worker",
+]
+PROJECT = {os.path.splitext(name)[0] for name in os.listdir(ROOT) if name.endswith(".py")} | {"views", "benchmarks"}
+
+
+def _importtime(module: str) -> List[Tuple[int, int, int, str]]:
+    """(self_us, cumulative_us, depth, name) for every module imported by `import module`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    # Keep only the subtree of the measured module (the last top-level entry),
+    # not what the interpreter imported at startup (site, sitecustomize, ...).
+    start = len(rows) - 1
+    while start > 0 and rows[start - 1][2] > 0:
+        start -= 1
+    return rows[start:]
+
+
+def measure(module: str, repeat: int) -> Dict:
+    totals, runs = [], []
+    for _ in range(repeat):
+        rows = _importtime(module)
+        totals.append(rows[-1][1])
+        runs.append(rows)
+    median_run = runs[totals.index(sorted(totals)[len(totals) // 2])]
+    packages: Dict[str, int] = {}
+    for _, cumulative_us, _, name in median_run:
+        top = name.split(".")[0]
+        if top not in PROJECT and not top.startswith("_") and top not in sys.stdlib_module_names:
+            packages[top] = max(packages.get(top, 0), cumulative_us)
+    heaviest = sorted(packages.items(), key=lambda item: -item[1])[:5]
+    return {
+        "module": module,
+        "median_ms": round(statistics.median(totals) / 1000, 1),
+        "min_ms": round(min(totals) / 1000, 1),
+        "modules_imported": len(median_run),
+        "heaviest": {name: round(us / 1000, 1) for name, us in heaviest},
+        "loads_pandas": "pandas" in packages,
+        "loads_plotly": "plotly" in packages,
+        "loads_streamlit": "streamlit" in packages,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    commit, stamp = git_commit(), time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    for module in args.modules:
+        print(json.dumps({"commit": commit, "timestamp": stamp, **measure(module, args.repeat)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Local stand-in for the Nansen API, for benchmarks and offline dashboard runs.
+
+    python -m benchmarks.mock_api --port 8765 --records 5000 --latency 0.05 --error-rate 0.02
+    NANSEN_BASE_URL=http://127.0.0.1:8765 apiKey=mock streamlit run streamlit_app.py
+
+Serves POST /smart-money/inflows, /smart-money/holdings, /token-screener,
+/tgm/flow-intelligence and /tgm/flows (any path prefix, e.g. /api/beta, is
+ignored) with deterministic synthetic records shaped like the real responses.
+Pagination follows payload["pagination"]; latency, jitter, records per
+dataset, padding per record and 429/5xx injection are configurable.
+"""
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence
+
+CHAINS = ["ethereum", "solana", "base", "arbitrum", "bnb"]
+SECTORS = ["DeFi", "Meme", "AI", "Gaming", "Infrastructure", "Stablecoin"]
+FLOW_SEGMENTS = ("publicFigure", "topPnl", "whale", "smartTrader", "exchange", "freshWallets")
+
+
+def _address(rng: random.Random) -> str:
+    return f"0x{rng.getrandbits(160):040x}"
+
+
+def inflows_records(start: int, count: int, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed * 1_000_003 + start)
+    return [
+        {
+            "chain": rng.choice(CHAINS),
+            "tokenAddress": _address(rng),
+            "symbol": f"TKN{i % 5000}",
+            "sectors": rng.sample(SECTORS, rng.randint(0, 3)),
+            "volume24hUSD": rng.uniform(1e3, 1e8),
+            "volume7dUSD": rng.uniform(1e4, 1e9),
+            "volume30dUSD": rng.uniform(1e5, 1e10),
+            "nofTraders": rng.randint(1, 500),
+            "tokenAgeDays": rng.randint(0, 2000),
+            "marketCap": rng.uniform(1e5, 1e11),
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def holdings_records(start: int, count: int, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed * 1_000_003 + start)
+    return [
+        {
+            "chain": rng.choice(CHAINS),
+            "tokenAddress": _address(rng),
+            "symbol": f"TKN{i % 5000}",
+            "sectors": rng.sample(SECTORS, rng.randint(0, 3)),
+            "balanceUsd": rng.uniform(1e3, 1e9),
+            "balancePctChange24h": rng.uniform(-50, 50),
+            "nofHolders": rng.randint(1, 500),
+            "shareOfHoldings": rng.random(),
+            "tokenAgeDays": rng.randint(0, 2000),
+            "marketCap": rng.uniform(1e5, 1e11),
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def screener_records(start: int, count: int, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed * 1_000_003 + start)
+    out = []
+    for i in range(start, start + count):
+        buy, sell = rng.uniform(0, 1e7), rng.uniform(0, 1e7)
+        out.append({
+            "chain": rng.choice(CHAINS),
+            "tokenAddressHex": _address(rng),
+            "tokenSymbol": f"TKN{i % 5000}",
+            "tokenAgeDays": rng.randint(0, 2000),
+            "marketCap": rng.uniform(1e5, 1e11),
+            "liquidity": rng.uniform(1e3, 1e9),
+            "priceUsd": rng.uniform(1e-6, 5e4),
+            "priceChange": rng.uniform(-0.9, 3.0),
+            "fdv": rng.uniform(1e5, 1e11),
+            "fdvMcRatio": rng.uniform(1, 10),
+            "buyVolume": buy,
+            "inflowFdvRatio": rng.random() / 100,
+            "outflowFdvRatio": rng.random() / 100,
+            "sellVolume": sell,
+            "volume": buy + sell,
+            "netflow": buy - sell,
+        })
+    return out
+
+
+def flow_intelligence_records(start: int, count: int, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed * 1_000_003 + start)
+    out = []
+    for _ in range(count):
+        row: Dict = {}
+        for segment in FLOW_SEGMENTS:
+            row[f"{segment}Flow"] = rng.uniform(-1e6, 1e6)
+            row[f"{segment}AvgAbsFlow"] = rng.uniform(0, 1e5)
+            row[f"{segment}Wallets"] = rng.randint(0, 300)
+        out.append(row)
+    return out
+
+
+def token_flows_records(date_from: str, date_to: str, start: int, count: int, seed: int = 0) -> List[Dict]:
+    """One row per day between date_from and date_to, price following a random walk."""
+    first = datetime.date.fromisoformat(date_from)
+    days = (datetime.date.fromisoformat(date_to) - first).days + 1
+    rng = random.Random(seed)
+    price = 1.0
+    out = []
+    for day in range(min(days, start + count)):
+        price *= 1 + rng.gauss(0, 0.03)
+        if day >= start:
+            out.append({
+                "blockDate": str(first + datetime.timedelta(days=day)),
+                "priceUsd": price,
+                "holderCount": 1000 + day,
+                "totalInflowCount": rng.randint(0, 500),
+                "totalOutflowCount": rng.randint(0, 500),
+                "value": rng.uniform(-1e6, 1e6),
+            })
+    return out
+
+
+GENERATORS: Dict[str, Callable[[int, int, int], List[Dict]]] = {
+    "/smart-money/inflows": inflows_records,
+    "/smart-money/holdings": holdings_records,
+    "/token-screener": screener_records,
+    "/tgm/flow-intelligence": flow_intelligence_records,
+}
+
+
+class MockNansenAPI:
+    """Threaded HTTP server; start() returns the base URL to pass to NansenClient."""
+
+    def __init__(
+        self,
+        records: int = 1000,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_statuses: Sequence[int] = (429, 503),
+        retry_after: float = 0.05,
+        fail_first: int = 0,
+        padding: int = 0,
+        seed: int = 0,
+    ):
+        self.records = records
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = list(error_statuses)
+        self.retry_after = retry_after
+        self.fail_first = fail_first
+        self.padding = padding
+        self.seed = seed
+        self.requests = 0
+        self.errors = 0
+        self.clients = set()  # (host, port) of every connection seen
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self, port: int = 0, host: str = "127.0.0.1") -> str:
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    payload = {}
+                with api._lock:
+                    api.clients.add(self.client_address)
+                status, headers, body = api.handle(self.path, payload)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="mock-nansen-api", daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _inject_error(self) -> Optional[int]:
+        with self._lock:
+            self.requests += 1
+            failing = self.requests <= self.fail_first or (self.error_rate and self._rng.random() < self.error_rate)
+            if not failing:
+                return None
+            self.errors += 1
+            return self.error_statuses[self._rng.randrange(len(self.error_statuses))] if self.error_statuses else 503
+
+    def handle(self, path: str, payload: Dict):
+        """(status, headers, body) for one request; also usable without the HTTP server."""
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        status = self._inject_error()
+        if status is not None:
+            headers = {"Retry-After": str(self.retry_after)} if status == 429 else {}
+            return status, headers, b""
+        endpoint = next((known for known in (*GENERATORS, "/tgm/flows") if path.endswith(known)), None)
+        if endpoint is None:
+            return 404, {"Content-Type": "application/json"}, b'{"error": "unknown endpoint"}'
+        pagination = payload.get("pagination") or {}
+        page = max(1, int(pagination.get("page", 1)))
+        per_page = max(1, int(pagination.get("recordsPerPage", 100)))
+        return 200, {"Content-Type": "application/json"}, self._page(endpoint, payload, page, per_page)
+
+    def _page(self, endpoint: str, payload: Dict, page: int, per_page: int) -> bytes:
+        parameters = payload.get("parameters") or {}
+        date = parameters.get("date") or {}
+        key = (endpoint, page, per_page, date.get("from"), date.get("to"))
+        with self._lock:
+            cached = self._pages.get(key)
+        if cached is not None:
+            return cached
+        start = (page - 1) * per_page
+        if endpoint == "/tgm/flows":
+            today = str(datetime.date.today())
+            rows = token_flows_records(date.get("from") or today, date.get("to") or today, start, per_page, self.seed)
+        elif endpoint == "/tgm/flow-intelligence":
+            rows = flow_intelligence_records(start, 1 if page == 1 else 0, self.seed)
+        else:
+            rows = GENERATORS[endpoint](start, max(0, min(per_page, self.records - start)), self.seed)
+        if self.padding:
+            pad = "x" * self.padding
+            for row in rows:
+                row["padding"] = pad
+        body = json.dumps({"data": rows}).encode()
+        with self._lock:
+            self._pages[key] = body
+            while len(self._pages) > 4096:
+                self._pages.popitem(last=False)
+        return body
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "connections": len(self.clients)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--records", type=int, default=1000, help="records per paged dataset")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 429/503")
+    parser.add_argument("--padding", type=int, default=0, help="bytes of padding added to every record")
+    args = parser.parse_args()
+    api = MockNansenAPI(
+        records=args.records, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, padding=args.padding
+    )
+    print(f"Mock Nansen API on {api.start(args.port, args.host)}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
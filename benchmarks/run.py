@@ -0,0 +1,272 @@
+"""
+End-to-end benchmark harness against the local mock API (benchmarks/mock_api.py).
+
+    python -m benchmarks.run                                   # all sections, 100 .. 100k records
+    python -m benchmarks.run --full --out results.ndjson       # adds 1M records
+    python -m benchmarks.run --sections client --latency 0.02 --error-rate 0.05
+    python -m benchmarks.run --compare before.ndjson after.ndjson
+
+Sections:
+    client        NansenClient paging and concurrent calls: throughput, p50/p99 request latency
+    converters    dataframes.py converters: rows/s and frame memory
+    aggregations  screener aggregates (cold and memoized) and DeltaTracker updates
+
+Every result is one JSON line tagged with the git commit, so files from
+different commits can be compared with --compare (ratios of new/old timings).
+"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from benchmarks.bench_import import git_commit
+from benchmarks.mock_api import MockNansenAPI, holdings_records, inflows_records, screener_records
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000]
+FULL_SIZES = DEFAULT_SIZES + [1_000_000]
+CLIENT_MAX_RECORDS = 100_000
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _timed(fn: Callable, repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def _summary(times: List[float]) -> Dict:
+    return {"median_s": round(statistics.median(times), 6), "min_s": round(min(times), 6), "repeat": len(times)}
+
+
+def _client(base_url: str):
+    from nansen_client import NansenClient
+    from rate_limiter import RateLimiter
+
+    # No cache and no rate limit: measure the transport, retries and paging.
+    client = NansenClient(
+        base_url=base_url, api_key="bench", cache=None, backoff_base=0.01, backoff_max=0.2,
+        rate_limiter=RateLimiter(rate=0, per_minute=0),
+    )
+    latencies: List[float] = []
+    fetch = client._async._fetch
+
+    async def timed_fetch(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await fetch(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    client._async._fetch = timed_fetch
+    return client, latencies
+
+
+def bench_client(sizes: Iterable[int], latency: float, error_rate: float, page_size: int, calls: int) -> List[Dict]:
+    results = []
+    sizes = [size for size in sizes if size <= CLIENT_MAX_RECORDS]
+    if not sizes:
+        print(f"client: skipped, every size is above {CLIENT_MAX_RECORDS} records", file=sys.stderr)
+        return results
+    api = MockNansenAPI(records=max(sizes), latency=latency, error_rate=error_rate, retry_after=0.01)
+    base_url = api.start()
+    client, latencies = _client(base_url)
+    settings = {"latency_s": latency, "error_rate": error_rate}
+    try:
+        for size in sizes:
+            payload = {"parameters": {"chains": ["ethereum"]}, "pagination": {"page": 1, "recordsPerPage": page_size}}
+            client.fetch_records("/token-screener", payload, page_size)  # warm the mock's page cache
+            latencies.clear()
+            before = api.stats()
+            started = time.perf_counter()
+            records = client.fetch_records("/token-screener", payload, size)
+            elapsed = time.perf_counter() - started
+            after = api.stats()
+            results.append({
+                "section": "client", "case": "paged_fetch", "size": size, **settings,
+                "page_size": page_size,
+                "seconds": round(elapsed, 4),
+                "records": len(records),
+                "records_per_s": round(len(records) / elapsed, 1),
+                "requests": after["requests"] - before["requests"],
+                "injected_errors": after["errors"] - before["errors"],
+                "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+                "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+            })
+        tokens = [("ethereum", f"0x{i:040x}") for i in range(calls)]
+        latencies.clear()
+        before = api.stats()
+        started = time.perf_counter()
+        outcome = client.flow_intelligence_many(tokens, "1d", limit=16)
+        elapsed = time.perf_counter() - started
+        after = api.stats()
+        results.append({
+            "section": "client", "case": "flow_intelligence_many", "size": calls, **settings,
+            "seconds": round(elapsed, 4),
+            "requests_per_s": round(calls / elapsed, 1),
+            "requests": after["requests"] - before["requests"],
+            "injected_errors": after["errors"] - before["errors"],
+            "failed": sum(isinstance(value, Exception) for value in outcome.values()),
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        })
+    finally:
+        client.close()
+        api.stop()
+    return results
+
+
+def bench_converters(sizes: Iterable[int], repeat: int) -> List[Dict]:
+    from dataframes import holdings_to_dataframe, inflows_to_dataframe, screener_to_dataframe
+
+    cases = [
+        ("inflows", inflows_records, inflows_to_dataframe),
+        ("holdings", holdings_records, holdings_to_dataframe),
+        ("screener", screener_records, screener_to_dataframe),
+    ]
+    results = []
+    for size in sizes:
+        for name, generate, convert in cases:
+            items = generate(0, size)
+            frame = convert(items)
+            times = _timed(lambda: convert(items), repeat)
+            results.append({
+                "section": "converters", "case": name, "size": size, **_summary(times),
+                "rows_per_s": round(size / statistics.median(times), 1),
+                "frame_bytes": int(frame.memory_usage(index=True, deep=True).sum()),
+            })
+            del items, frame
+    return results
+
+
+def _wait_all(handle):
+    for key in handle.futures:
+        handle.result(key)
+
+
+def bench_aggregations(sizes: Iterable[int], repeat: int) -> List[Dict]:
+    import numpy as np
+
+    from aggregates import compute_screener_aggregates, screener_aggregates
+    from analytics_pool import AnalyticsPool, screener_aggregates_async
+    from dataframes import screener_to_dataframe
+    from deltas import tracker_for
+
+    pool = AnalyticsPool(min_rows=0)
+    results = []
+    try:
+        for size in sizes:
+            df = screener_to_dataframe(screener_records(0, size))
+            times = _timed(lambda: compute_screener_aggregates(df), repeat)
+            results.append({"section": "aggregations", "case": "screener_aggregates", "size": size, **_summary(times)})
+            screener_aggregates(df, version=("bench", size))
+            times = _timed(lambda: screener_aggregates(df, version=("bench", size)), repeat)
+            results.append({
+                "section": "aggregations", "case": "screener_aggregates_memo", "size": size, **_summary(times)
+            })
+            # Same work through the process pool (shared-memory handoff included); fresh versions skip the memo.
+            runs = iter(range(repeat + 1))
+            _wait_all(screener_aggregates_async(df, ("pool", size, next(runs)), pool=pool))  # start the workers
+            times = _timed(lambda: _wait_all(screener_aggregates_async(df, ("pool", size, next(runs)), pool=pool)), repeat)
+            results.append({
+                "section": "aggregations", "case": "screener_aggregates_pool", "size": size, **_summary(times)
+            })
+
+            # Second refresh with 1% of rows changed, as a dashboard refresh would see.
+            changed = df.copy()
+            rows = np.random.default_rng(0).choice(size, max(1, size // 100), replace=False)
+            changed.loc[rows, "volume"] = changed.loc[rows, "volume"] * 2
+            changed.loc[rows, "netflow"] = -changed.loc[rows, "netflow"]
+            trackers = []
+
+            def initial():
+                trackers.append(tracker_for("screener"))
+                trackers[-1].update(df, complete=True)
+
+            times = _timed(initial, repeat)
+            results.append({"section": "aggregations", "case": "delta_initial", "size": size, **_summary(times)})
+            times = _timed(lambda: trackers.pop().update(changed, complete=True), repeat)
+            results.append({"section": "aggregations", "case": "delta_1pct_changed", "size": size, **_summary(times)})
+    finally:
+        pool.shutdown()
+    return results
+
+
+def compare(old_path: str, new_path: str) -> List[Dict]:
+    """new/old ratios of the timing metrics for results present in both files (< 1 is faster)."""
+    def load(path: str) -> Dict:
+        with open(path) as fh:
+            rows = [json.loads(line) for line in fh if line.strip()]
+        return {(r["section"], r["case"], r["size"], r.get("latency_s"), r.get("error_rate")): r for r in rows}
+
+    old, new = load(old_path), load(new_path)
+    out = []
+    for key in sorted(old.keys() & new.keys(), key=str):
+        before, after = old[key], new[key]
+        ratios = {
+            metric: round(after[metric] / before[metric], 3)
+            for metric in ("median_s", "seconds", "p50_ms", "p99_ms")
+            if metric in before and metric in after and before[metric]
+        }
+        out.append({
+            "section": key[0], "case": key[1], "size": key[2],
+            "old_commit": before.get("commit"), "new_commit": after.get("commit"), **ratios,
+        })
+    return out
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", nargs="+", default=["client", "converters", "aggregations"],
+                        choices=["client", "converters", "aggregations"])
+    parser.add_argument("--sizes", type=int, nargs="+", help=f"record counts (default {DEFAULT_SIZES})")
+    parser.add_argument("--full", action="store_true", help="include 1M records")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="mock API latency per request, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock requests failing 429/503")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--calls", type=int, default=200, help="tokens for the flow_intelligence_many case")
+    parser.add_argument("--out", help="append results to this file instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        for row in compare(*args.compare):
+            print(json.dumps(row))
+        return
+
+    sizes = args.sizes or (FULL_SIZES if args.full else DEFAULT_SIZES)
+    tags = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": sys.version.split()[0]}
+    out = open(args.out, "a") if args.out else sys.stdout
+    try:
+        for section in args.sections:
+            if section == "client":
+                rows = bench_client(sizes, args.latency, args.error_rate, args.page_size, args.calls)
+            elif section == "converters":
+                rows = bench_converters(sizes, args.repeat)
+            else:
+                rows = bench_aggregations(sizes, args.repeat)
+            for row in rows:
+                out.write(json.dumps({**tags, **row}) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
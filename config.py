@@ -0,0 +1,28 @@
+"""
+Explicit configuration loading.
+
+Module-level settings (NANSEN_* constants in nansen_client, rate_limiter,
+response_cache, the stores, ...) read os.environ when the module is first
+imported. Entry points (streamlit_app, nansen_cli, nansen_worker) therefore
+call load_config() before importing the rest of the project; library code
+never loads .env on its own.
+"""
+import os
+import threading
+from typing import Optional
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_config(dotenv_path: Optional[str] = None, override: bool = False) -> bool:
+    """Load `.env` (default: the repo root) into os.environ once; returns True on the first call."""
+    global _loaded
+    with _lock:
+        if _loaded:
+            return False
+        from dotenv import load_dotenv
+
+        load_dotenv(dotenv_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"), override=override)
+        _loaded = True
+        return True
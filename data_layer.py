@@ -0,0 +1,168 @@
+"""
+Process-wide registry of normalized frames shared by all dashboard sessions.
+
+One frame is held per (endpoint, payload, max_records). Sessions keep only
+the entry key and look the frame up on each rerun, so N sessions viewing the
+same query share one copy and one fetch. Frames are treated as immutable:
+a refresh stores a new frame under a new version instead of mutating it.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+import pandas as pd
+
+from metrics import register_collector
+from response_cache import DEFAULT_TTL, ENDPOINT_TTLS, canonical_key
+
+DATA_LAYER_MAX_MB = float(os.getenv("NANSEN_DATA_LAYER_MAX_MB", "512"))
+
+
+class FrameEntry:
+    __slots__ = ("key", "path", "payload", "max_records", "frame", "version", "nbytes", "loaded_at", "hits")
+
+    def __init__(
+        self, key: str, path: str, payload: Dict, max_records: Optional[int], frame: pd.DataFrame, serial: int
+    ):
+        self.key = key
+        self.path = path
+        self.payload = payload
+        self.max_records = max_records
+        self.frame = frame
+        self.version: Hashable = (key, serial)
+        self.nbytes = int(frame.memory_usage(index=True, deep=True).sum())
+        self.loaded_at = time.time()
+        self.hits = 0
+
+    def age(self) -> float:
+        return time.time() - self.loaded_at
+
+
+class DataLayer:
+    def __init__(self, max_bytes: float = DATA_LAYER_MAX_MB * 2 ** 20, ttls: Optional[Dict[str, float]] = None,
+                 default_ttl: float = DEFAULT_TTL):
+        self.max_bytes = max_bytes
+        self.ttls = dict(ENDPOINT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, FrameEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._serial = itertools.count(1)
+        self.evictions = 0
+
+    @staticmethod
+    def key(path: str, payload: Dict, max_records: Optional[int] = None) -> str:
+        return canonical_key(path, {"payload": payload, "max_records": max_records})
+
+    def ttl_for(self, path: str) -> float:
+        return self.ttls.get(path, self.default_ttl)
+
+    def get(self, key: str) -> Optional[FrameEntry]:
+        """The entry for `key` regardless of age, or None if never loaded or evicted."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+            return entry
+
+    def put(self, path: str, payload: Dict, frame: pd.DataFrame, max_records: Optional[int] = None) -> FrameEntry:
+        key = self.key(path, payload, max_records)
+        entry = FrameEntry(key, path, payload, max_records, frame, next(self._serial))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict(keep=key)
+        return entry
+
+    def get_or_load(
+        self,
+        path: str,
+        payload: Dict,
+        loader: Callable[[], pd.DataFrame],
+        max_records: Optional[int] = None,
+        refresh: bool = False,
+    ) -> FrameEntry:
+        """
+        The shared entry for the query, calling `loader` only when it is missing,
+        older than the endpoint's TTL, or `refresh` is set. Concurrent callers
+        for the same key wait for a single load.
+        """
+        key = self.key(path, payload, max_records)
+        entry = None if refresh else self.lookup(path, payload, max_records)
+        if entry is not None:
+            return entry
+        requested_at = time.time()
+        with self._lock:
+            load_lock = self._loading.setdefault(key, threading.Lock())
+        with load_lock:
+            # Another session may have loaded it while we waited.
+            entry = self.lookup(path, payload, max_records)
+            if entry is not None and (not refresh or entry.loaded_at >= requested_at):
+                return entry
+            entry = self.put(path, payload, loader(), max_records)
+        with self._lock:
+            self._loading.pop(key, None)
+        return entry
+
+    def lookup(self, path: str, payload: Dict, max_records: Optional[int] = None) -> Optional[FrameEntry]:
+        """The entry for the query if it is within the endpoint's TTL, else None."""
+        entry = self.get(self.key(path, payload, max_records))
+        if entry is not None and entry.age() <= self.ttl_for(path):
+            return entry
+        return None
+
+    def _evict(self, keep: str):
+        total = sum(entry.nbytes for entry in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._entries.pop(key).nbytes
+            self.evictions += 1
+
+    def invalidate(self, path: Optional[str] = None, payload: Optional[Dict] = None,
+                   max_records: Optional[int] = None) -> int:
+        """Drop one query (path and payload), every query of an endpoint (path only), or everything."""
+        with self._lock:
+            if path is not None and payload is not None:
+                keys = [self.key(path, payload, max_records)]
+            else:
+                keys = [key for key, entry in self._entries.items() if path is None or entry.path == path]
+            return sum(self._entries.pop(key, None) is not None for key in keys)
+
+    def usage(self) -> pd.DataFrame:
+        """One row per entry, most recently used last."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return pd.DataFrame(
+            [(e.key[:12], e.path, e.version[1], len(e.frame), e.nbytes, round(e.age(), 1), e.hits) for e in entries],
+            columns=["key", "path", "version", "rows", "bytes", "age_s", "hits"],
+        )
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(entry.nbytes for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+_default_layer: Optional[DataLayer] = None
+_default_lock = threading.Lock()
+
+
+def default_layer() -> DataLayer:
+    global _default_layer
+    with _default_lock:
+        if _default_layer is None:
+            _default_layer = DataLayer()
+            register_collector("nansen_data_layer", _default_layer.stats)
+        return _default_layer
+
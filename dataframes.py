@@ -1,80 +1,227 @@
-from typing import List, Dict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
 import pandas as pd
 
+try:
+    import pyarrow  # noqa: F401
+    ADDRESS_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    ADDRESS_DTYPE = pd.StringDtype()
 
-def inflows_to_dataframe(items: List[Dict]) -> pd.DataFrame:
+
+class Column(NamedTuple):
+    """How one output column is parsed.
+
+    dtype: "float64", "float32", "category", "address" (Arrow-backed string) or "infer".
+    aliases: alternative source keys, tried when the canonical key is absent.
+    join: separator used to flatten list values (e.g. sectors) before casting.
+    source: read values from another key (used for derived numeric columns).
+    """
+    dtype: str
+    aliases: Tuple[str, ...] = ()
+    join: Optional[str] = None
+    source: Optional[str] = None
+
+
+# USD amounts stay float64 (float32 would lose cents above ~$100k); ratios,
+# percentages and ages use float32.
+INFLOWS_SCHEMA: Dict[str, Column] = {
+    "chain": Column("category"),
+    "tokenAddress": Column("address"),
+    "symbol": Column("category"),
+    "sectors": Column("category", join=", "),
+    "volume24hUSD": Column("float64"),
+    "volume7dUSD": Column("float64"),
+    "volume30dUSD": Column("float64"),
+    "nofTraders": Column("infer"),
+    "tokenAgeDays": Column("infer"),
+    "marketCap": Column("float64"),
+    "tokenAgeDaysNum": Column("float32", source="tokenAgeDays"),
+}
+
+HOLDINGS_SCHEMA: Dict[str, Column] = {
+    "chain": Column("category"),
+    "tokenAddress": Column("address"),
+    "symbol": Column("category"),
+    "sectors": Column("category", join=", "),
+    "balanceUsd": Column("float64"),
+    "balancePctChange24H": Column("float32", aliases=("balancePctChange24h",)),
+    "nofHolders": Column("infer"),
+    "shareOfHoldings": Column("float32"),
+    "tokenAgeDays": Column("infer"),
+    "marketCap": Column("float64"),
+    "tokenAgeDaysNum": Column("float32", source="tokenAgeDays"),
+}
+
+SCREENER_SCHEMA: Dict[str, Column] = {
+    "chain": Column("category"),
+    "tokenAddressHex": Column("address"),
+    "tokenSymbol": Column("category"),
+    "tokenAgeDays": Column("infer"),
+    "marketCap": Column("float64"),
+    "liquidity": Column("float64"),
+    "priceUsd": Column("float64"),
+    "priceChange": Column("float32"),
+    "fdv": Column("float64"),
+    "fdvMcRatio": Column("float32"),
+    "buyVolume": Column("float64"),
+    "inflowFdvRatio": Column("float32"),
+    "outflowFdvRatio": Column("float32"),
+    "sellVolume": Column("float64"),
+    "volume": Column("float64"),
+    "netflow": Column("float64"),
+    "tokenAgeDaysNum": Column("float32", source="tokenAgeDays"),
+}
+
+# Wallet counts are float64 so a token without a count is NaN rather than an
+# object/null column that cannot hold later tokens' counts.
+FLOW_SCHEMA: Dict[str, Column] = {
+    f"{segment}{suffix}": Column("float64")
+    for segment in ("publicFigure", "topPnl", "whale", "smartTrader", "exchange", "freshWallets")
+    for suffix in ("Flow", "AvgAbsFlow", "Wallets")
+}
+
+# /tgm/flows rows: one per blockDate; other fields are kept as extras.
+TOKEN_FLOWS_SCHEMA: Dict[str, Column] = {
+    "blockDate": Column("infer"),
+    "priceUsd": Column("float64"),
+}
+
+FLOWS_MANY_SCHEMA: Dict[str, Column] = {
+    "chain": Column("category"),
+    "tokenAddress": Column("address"),
+    **FLOW_SCHEMA,
+}
+
+
+def _to_float(values: np.ndarray, dtype: str) -> np.ndarray:
+    try:
+        # Fast path: numbers, numeric strings and None/NaN parse in one C loop.
+        return np.array(values, dtype=dtype)
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=dtype)
+
+
+def _to_address(values: np.ndarray) -> pd.api.extensions.ExtensionArray:
+    try:
+        return pd.array(values, dtype=ADDRESS_DTYPE)
+    except (TypeError, ValueError):
+        return pd.array(
+            [v if isinstance(v, str) else None if pd.isna(v) else str(v) for v in values], dtype=ADDRESS_DTYPE
+        )
+
+
+def _infer(values: np.ndarray):
+    """Numbers as a numpy array (one C loop); anything else with pandas' inferred dtype."""
+    if len(values):
+        try:
+            numbers = np.array(values.tolist())
+        except (TypeError, ValueError):
+            numbers = None
+        if numbers is not None and numbers.ndim == 1 and numbers.dtype.kind in "iufb":
+            return numbers
+    # Copy: `values` may be a view of normalize()'s whole record block.
+    return pd.Series(values, dtype=object, copy=True).infer_objects().array
+
+
+def _cast(values: np.ndarray, column: Column):
+    if column.join is not None:
+        values = np.array([column.join.join(v) if isinstance(v, list) else v for v in values], dtype=object)
+    if column.dtype in ("float64", "float32"):
+        return _to_float(values, column.dtype)
+    if column.dtype == "category":
+        return pd.Categorical(values)
+    if column.dtype == "address":
+        return _to_address(values)
+    return _infer(values)
+
+
+def _empty_frame(schema: Dict[str, Column]) -> pd.DataFrame:
+    return pd.DataFrame({name: _cast(np.array([], dtype=object), column) for name, column in schema.items()})
+
+
+def normalize(items: List[Dict], schema: Dict[str, Column]) -> pd.DataFrame:
+    """
+    Build a typed DataFrame from API records. Every key is read in one C-level
+    pass into object columns (no dtype inference), then each column is cast once.
+    Keys not in the schema (nor used as aliases/sources) are kept with inferred
+    dtypes; keys missing from a record are NaN.
+    """
     if not items:
-        return pd.DataFrame(columns=[
-            "chain", "tokenAddress", "symbol", "sectors",
-            "volume24hUSD", "volume7dUSD", "volume30dUSD",
-            "nofTraders", "tokenAgeDays", "marketCap"
-        ])
-    df = pd.DataFrame(items)
-    if "sectors" in df.columns:
-        df["sectors"] = df["sectors"].apply(lambda x: ", ".join(x) if isinstance(x, list) else x)
-    for col in ["volume24hUSD", "volume7dUSD", "volume30dUSD", "marketCap"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    if "tokenAgeDays" in df.columns:
-        df["tokenAgeDaysNum"] = pd.to_numeric(df["tokenAgeDays"], errors="coerce")
-    return df
+        return _empty_frame(schema)
+    known = set(schema)
+    for column in schema.values():
+        known.update(column.aliases)
+    first_seen = {key: None for key in items[0]}
+    extras = [key for key in first_seen if key not in known]
+    extras += sorted(set().union(*items) - known - set(first_seen))
+    keys = [key for name, column in schema.items() for key in (column.source or name, *column.aliases)]
+    records = pd.DataFrame(items, columns=list(dict.fromkeys(keys + extras)), dtype=object)
+    data = {}
+    for name, column in schema.items():
+        values = records[column.source or name].to_numpy()
+        for alias in column.aliases:
+            missing = pd.isna(values)
+            if missing.any():
+                values = np.where(missing, records[alias].to_numpy(), values)
+        data[name] = _cast(values, column)
+    for key in extras:
+        data[key] = _infer(records[key].to_numpy())
+    return pd.DataFrame(data, copy=False)
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate normalized frames (e.g. one per page) without losing categorical dtypes."""
+    if len(frames) == 1:
+        return frames[0]
+    out = pd.concat(frames, ignore_index=True)
+    for name, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not isinstance(out[name].dtype, pd.CategoricalDtype):
+            out[name] = out[name].astype("category")
+    return out
+
+
+def frame_from_batches(batches: Iterable[List[Dict]], to_dataframe: Callable) -> pd.DataFrame:
+    """
+    Convert record batches (e.g. NansenClient.stream_batches) as they arrive, so
+    only one batch of Python dicts is alive next to the compact typed frames.
+    """
+    frames = [to_dataframe(batch) for batch in batches]
+    if not frames:
+        return to_dataframe([])
+    return concat_frames(frames)
+
+
+def inflows_to_dataframe(items: List[Dict]) -> pd.DataFrame:
+    return normalize(items, INFLOWS_SCHEMA)
 
 
 def holdings_to_dataframe(items: List[Dict]) -> pd.DataFrame:
-    if not items:
-        return pd.DataFrame(columns=[
-            "chain", "tokenAddress", "symbol", "sectors",
-            "balanceUsd", "balancePctChange24H", "nofHolders",
-            "shareOfHoldings", "tokenAgeDays", "marketCap"
-        ])
-    df = pd.DataFrame(items)
-    if "sectors" in df.columns:
-        df["sectors"] = df["sectors"].apply(lambda x: ", ".join(x) if isinstance(x, list) else x)
-    if "balancePctChange24H" not in df.columns and "balancePctChange24h" in df.columns:
-        df["balancePctChange24H"] = df["balancePctChange24h"]
-    for col in ["balanceUsd", "balancePctChange24H", "shareOfHoldings", "marketCap"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    if "tokenAgeDays" in df.columns:
-        df["tokenAgeDaysNum"] = pd.to_numeric(df["tokenAgeDays"], errors="coerce")
-    return df
+    return normalize(items, HOLDINGS_SCHEMA)
 
 
 def screener_to_dataframe(items: List[Dict]) -> pd.DataFrame:
-    if not items:
-        return pd.DataFrame(columns=[
-            "chain", "tokenAddressHex", "tokenSymbol", "tokenAgeDays",
-            "marketCap", "liquidity", "priceUsd", "priceChange", "fdv", "fdvMcRatio",
-            "buyVolume", "inflowFdvRatio", "outflowFdvRatio", "sellVolume", "volume", "netflow"
-        ])
-    df = pd.DataFrame(items)
-    numeric_cols = ["marketCap", "fdv", "fdvMcRatio", "buyVolume", "sellVolume", "volume", "netflow"]
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    for col in ["priceUsd", "priceChange", "liquidity", "inflowFdvRatio", "outflowFdvRatio"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    if "tokenAgeDays" in df.columns:
-        df["tokenAgeDaysNum"] = pd.to_numeric(df["tokenAgeDays"], errors="coerce")
-    return df
+    return normalize(items, SCREENER_SCHEMA)
 
 
 def flow_to_dataframe(items: List[Dict]) -> pd.DataFrame:
-    if not items:
-        return pd.DataFrame(columns=[
-            "publicFigureFlow", "publicFigureAvgAbsFlow", "publicFigureWallets",
-            "topPnlFlow", "topPnlAvgAbsFlow", "topPnlWallets",
-            "whaleFlow", "whaleAvgAbsFlow", "whaleWallets",
-            "smartTraderFlow", "smartTraderAvgAbsFlow", "smartTraderWallets",
-            "exchangeFlow", "exchangeAvgAbsFlow", "exchangeWallets",
-            "freshWalletsFlow", "freshWalletsAvgAbsFlow", "freshWalletsWallets"
-        ])
-    df = pd.DataFrame(items)
-    for col in [
-        "publicFigureAvgAbsFlow", "topPnlAvgAbsFlow", "whaleAvgAbsFlow",
-        "smartTraderAvgAbsFlow", "exchangeAvgAbsFlow", "freshWalletsAvgAbsFlow"
-    ]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    return df
+    return normalize(items, FLOW_SCHEMA)
+
+
+def token_flows_to_dataframe(items: List[Dict]) -> pd.DataFrame:
+    return normalize(items, TOKEN_FLOWS_SCHEMA)
+
+
+def flows_many_to_dataframe(results: Dict[Tuple[str, str], object]) -> pd.DataFrame:
+    """
+    One wide row per token from NansenClient.flow_intelligence_many results:
+    chain, tokenAddress and the FLOW_SCHEMA columns. Failed or empty results
+    are skipped; when a token returns several rows the first one is used.
+    """
+    rows = [
+        {**items[0], "chain": chain, "tokenAddress": address}
+        for (chain, address), items in results.items()
+        if isinstance(items, list) and items
+    ]
+    return normalize(rows, FLOWS_MANY_SCHEMA)
@@ -0,0 +1,211 @@
+"""
+Incremental change tracking between successive fetches of the same query.
+
+A DeltaTracker keeps the last seen value of a few watched columns per
+(chain, tokenAddress). update() hashes the watched columns of each incoming
+row in one vectorized pass, touches only rows that are new or whose hash
+changed, and returns ChangeEvents:
+
+    new            first time the token is seen (after the initial load)
+    removed        token missing from a complete refresh
+    entered_top_k  token moved into the top K by the ranking column
+    left_top_k     token dropped out of the top K
+    jump           |new - old| of a column reached its threshold
+    sign_flip      a column (e.g. netflow) changed sign
+"""
+import heapq
+import itertools
+import math
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class ChangeEvent(NamedTuple):
+    kind: str
+    key: Tuple
+    column: Optional[str] = None
+    old: Optional[float] = None
+    new: Optional[float] = None
+
+
+class TopK:
+    """
+    Top-k by value under arbitrary updates, using a max-heap with lazy
+    deletion: updates push a new entry and stale ones are skipped when read.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._values: Dict[Hashable, float] = {}
+        self._entry: Dict[Hashable, int] = {}
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._seq = itertools.count()
+
+    def update(self, key: Hashable, value: Optional[float]):
+        if value is None or math.isnan(value):
+            self.remove(key)
+            return
+        seq = next(self._seq)
+        self._values[key] = value
+        self._entry[key] = seq
+        heapq.heappush(self._heap, (-value, seq, key))
+        if len(self._heap) > 2 * len(self._values) + self.k:
+            self._rebuild()
+
+    def remove(self, key: Hashable):
+        self._values.pop(key, None)
+        self._entry.pop(key, None)
+
+    def _rebuild(self):
+        self._heap = [(-value, self._entry[key], key) for key, value in self._values.items()]
+        heapq.heapify(self._heap)
+
+    def top(self) -> List[Tuple[Hashable, float]]:
+        """The k largest (key, value) pairs, largest first; O(k log n) amortised."""
+        found = []
+        while self._heap and len(found) < self.k:
+            entry = heapq.heappop(self._heap)
+            if self._entry.get(entry[2]) == entry[1]:
+                found.append(entry)
+        for entry in found:
+            heapq.heappush(self._heap, entry)
+        return [(key, -neg) for neg, _, key in found]
+
+    def __len__(self):
+        return len(self._values)
+
+
+class DeltaTracker:
+    def __init__(
+        self,
+        rank_by: str,
+        k: int = 20,
+        key_columns: Sequence[str] = ("chain", "tokenAddress"),
+        jumps: Optional[Dict[str, float]] = None,
+        sign_flips: Sequence[str] = (),
+    ):
+        self.rank_by = rank_by
+        self.key_columns = list(key_columns)
+        self.jumps = dict(jumps or {})
+        self.sign_flips = list(sign_flips)
+        self.watched = list(dict.fromkeys([rank_by, *self.jumps, *self.sign_flips]))
+        self.ranking = TopK(k)
+        self.state: Dict[Tuple, Tuple] = {}
+        self.updates = 0
+        # Every key ever seen gets a slot: its hash of the watched columns and
+        # whether it is in the state, so unchanged rows are skipped without Python work.
+        self._slots = pd.Index([], dtype=object)
+        self._slot_keys: List[Tuple] = []
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._present = np.zeros(0, dtype=bool)
+
+    def _slot_ids(self, df: pd.DataFrame) -> np.ndarray:
+        parts = [df[column].astype(str).to_numpy(dtype=object) for column in self.key_columns]
+        joined = parts[0]
+        for part in parts[1:]:
+            joined = joined + "\x1f" + part
+        ids = self._slots.get_indexer(joined)
+        new = ids < 0
+        if new.any():
+            positions = np.flatnonzero(new)
+            first = positions[~pd.Index(joined[positions]).duplicated()]
+            added = joined[first]
+            self._slots = self._slots.append(pd.Index(added, dtype=object))
+            self._slot_keys.extend(zip(*(part[first].tolist() for part in parts)))
+            self._hashes = np.concatenate([self._hashes, np.zeros(len(added), dtype=np.uint64)])
+            self._present = np.concatenate([self._present, np.zeros(len(added), dtype=bool)])
+            ids = self._slots.get_indexer(joined)
+        return ids
+
+    def update(self, df: pd.DataFrame, complete: bool = False) -> List[ChangeEvent]:
+        """
+        Merge a frame (one page or a full refresh) into the state. With
+        `complete=True`, tokens absent from `df` are treated as removed.
+        """
+        initial = self.updates == 0
+        self.updates += 1
+        columns = [c for c in self.key_columns + self.watched if c in df.columns]
+        if len(columns) < len(self.key_columns) + len(self.watched):
+            missing = sorted(set(self.key_columns + self.watched) - set(columns))
+            raise KeyError(f"DeltaTracker needs columns {missing}")
+        top_before = {key for key, _ in self.ranking.top()}
+        events: List[ChangeEvent] = []
+        ids = self._slot_ids(df)
+        hashes = pd.util.hash_pandas_object(df[self.watched], index=False).to_numpy()
+        changed = ~self._present[ids] | (self._hashes[ids] != hashes)
+        if complete:
+            gone = self._present.copy()
+            gone[ids] = False
+        self._hashes[ids] = hashes
+        self._present[ids] = True
+        rows = df[changed]
+        numbers = np.column_stack([
+            pd.to_numeric(rows[column], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            for column in self.watched
+        ])
+        for slot, row in zip(ids[changed].tolist(), numbers.tolist()):
+            key = self._slot_keys[slot]
+            values = tuple(None if math.isnan(v) else v for v in row)
+            old = self.state.get(key)
+            if old == values:
+                continue
+            self.state[key] = values
+            self.ranking.update(key, values[0])
+            if old is None:
+                if not initial:
+                    events.append(ChangeEvent("new", key))
+                continue
+            events.extend(self._compare(key, old, values))
+        if complete:
+            self._present[gone] = False
+            for slot in np.flatnonzero(gone).tolist():
+                key = self._slot_keys[slot]
+                del self.state[key]
+                self.ranking.remove(key)
+                events.append(ChangeEvent("removed", key))
+        top_after = self.ranking.top()
+        if not initial:
+            after_keys = {key for key, _ in top_after}
+            events.extend(
+                ChangeEvent("entered_top_k", key, self.rank_by, None, value)
+                for key, value in top_after if key not in top_before
+            )
+            events.extend(ChangeEvent("left_top_k", key, self.rank_by) for key in top_before - after_keys)
+        return events
+
+    def _compare(self, key: Tuple, old: Tuple, new: Tuple) -> Iterable[ChangeEvent]:
+        for index, column in enumerate(self.watched):
+            before, after = old[index], new[index]
+            if before is None or after is None:
+                continue
+            threshold = self.jumps.get(column)
+            if threshold is not None and abs(after - before) >= threshold:
+                yield ChangeEvent("jump", key, column, before, after)
+            if column in self.sign_flips and before * after < 0:
+                yield ChangeEvent("sign_flip", key, column, before, after)
+
+    def top(self) -> List[Tuple[Tuple, float]]:
+        return self.ranking.top()
+
+
+# Per-dataset defaults used by the dashboard.
+TRACKER_SETTINGS = {
+    "inflows": {"rank_by": "volume24hUSD", "k": 20},
+    "holdings": {"rank_by": "balanceUsd", "k": 50, "jumps": {"balancePctChange24H": 10.0}},
+    "screener": {
+        "rank_by": "volume", "k": 30, "key_columns": ("chain", "tokenAddressHex"), "sign_flips": ("netflow",),
+    },
+}
+
+
+def tracker_for(dataset: str) -> DeltaTracker:
+    return DeltaTracker(**TRACKER_SETTINGS[dataset])
+
+
+def events_to_dataframe(events: List[ChangeEvent]) -> pd.DataFrame:
+    return pd.DataFrame(
+        [(e.kind, e.key[0], e.key[-1], e.column, e.old, e.new) for e in events],
+        columns=["change", "chain", "tokenAddress", "column", "old", "new"],
+    )
@@ -0,0 +1,260 @@
+"""
+Append-only history of normalized frames, partitioned by chain and UTC date:
+
+    <root>/<dataset>/chain=<chain>/date=<YYYY-MM-DD>/part-<timestamp>-<id>.parquet
+
+Every row carries `snapshotTs` and a uniform `tokenAddress` key. Part files
+are sorted by (tokenAddress, snapshotTs), so Parquet row-group statistics
+let token filters skip most of each file. A SQLite manifest indexes files by
+(dataset, chain, date) and by (dataset, chain, tokenAddress, date), so a
+token's history opens only the files that contain it.
+"""
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from dataframes import concat_frames
+
+HISTORY_DIR = os.getenv("NANSEN_HISTORY_DIR", "")
+RETENTION_DAYS = int(os.getenv("NANSEN_HISTORY_RETENTION_DAYS", "90"))
+
+# Column holding the token address, per dataset, when it is not `tokenAddress`.
+TOKEN_COLUMNS = {"screener": "tokenAddressHex"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    dataset TEXT, chain TEXT, date TEXT, path TEXT PRIMARY KEY,
+    min_ts REAL, max_ts REAL, rows INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_by_partition ON files (dataset, chain, date);
+CREATE TABLE IF NOT EXISTS tokens (
+    dataset TEXT, chain TEXT, token_address TEXT, date TEXT, path TEXT
+);
+CREATE INDEX IF NOT EXISTS tokens_by_key ON tokens (dataset, chain, token_address, date);
+CREATE INDEX IF NOT EXISTS tokens_by_path ON tokens (path);
+"""
+
+
+def _utc(value) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def _date(value) -> str:
+    return _utc(value).strftime("%Y-%m-%d")
+
+
+class HistoryStore:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "manifest.sqlite"), timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _partition_dir(self, dataset: str, chain: str, date: str) -> str:
+        return os.path.join(self.root, dataset, f"chain={chain}", f"date={date}")
+
+    def _write_part(self, dataset: str, chain: str, date: str, df: pd.DataFrame) -> str:
+        directory = self._partition_dir(dataset, chain, date)
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = os.path.join(directory, f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet")
+        df = df.sort_values(["tokenAddress", "snapshotTs"], kind="stable")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=8192)
+        return path
+
+    def _register(self, conn: sqlite3.Connection, dataset: str, chain: str, date: str, path: str, df: pd.DataFrame):
+        ts = df["snapshotTs"]
+        conn.execute(
+            "INSERT INTO files (dataset, chain, date, path, min_ts, max_ts, rows) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (dataset, chain, date, path, ts.min().timestamp(), ts.max().timestamp(), len(df)),
+        )
+        conn.executemany(
+            "INSERT INTO tokens (dataset, chain, token_address, date, path) VALUES (?, ?, ?, ?, ?)",
+            [(dataset, chain, token, date, path) for token in df["tokenAddress"].dropna().unique()],
+        )
+
+    def append(self, dataset: str, df: pd.DataFrame, ts: Optional[datetime] = None) -> List[str]:
+        """Persist one snapshot of a normalized frame; returns the written part files."""
+        if df.empty:
+            return []
+        frame = df.copy()
+        token_column = TOKEN_COLUMNS.get(dataset, "tokenAddress")
+        if token_column != "tokenAddress":
+            frame["tokenAddress"] = frame[token_column]
+        frame["tokenAddress"] = frame["tokenAddress"].astype("string")
+        snapshot_ts = _utc(ts or datetime.now(timezone.utc))
+        frame["snapshotTs"] = snapshot_ts
+        date = _date(snapshot_ts)
+        chains = frame["chain"].astype(str) if "chain" in frame.columns else pd.Series("unknown", index=frame.index)
+        paths = []
+        conn = self._conn()
+        with conn:
+            for chain, part in frame.groupby(chains, sort=False, observed=True):
+                path = self._write_part(dataset, chain, date, part)
+                self._register(conn, dataset, chain, date, path, part)
+                paths.append(path)
+        return paths
+
+    def _files(
+        self, dataset: str, chain: Optional[str], token_address: Optional[str], since: Optional[datetime]
+    ) -> List[str]:
+        clauses = ["dataset = ?"]
+        params: list = [dataset]
+        if chain is not None:
+            clauses.append("chain = ?")
+            params.append(chain)
+        if since is not None:
+            clauses.append("date >= ?")
+            params.append(_date(since))
+        if token_address is not None:
+            clauses.append("token_address = ?")
+            params.append(token_address)
+            sql = f"SELECT DISTINCT path FROM tokens WHERE {' AND '.join(clauses)} ORDER BY date"
+        else:
+            sql = f"SELECT path FROM files WHERE {' AND '.join(clauses)} ORDER BY date, min_ts"
+        return [row[0] for row in self._conn().execute(sql, params)]
+
+    def query(
+        self,
+        dataset: str,
+        chain: Optional[str] = None,
+        token_address: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """Rows matching the filters, ordered by snapshotTs."""
+        filters = []
+        if token_address is not None:
+            filters.append(("tokenAddress", "=", token_address))
+        if since is not None:
+            filters.append(("snapshotTs", ">=", _utc(since)))
+        if until is not None:
+            filters.append(("snapshotTs", "<=", _utc(until)))
+        if columns is not None:
+            columns = list(dict.fromkeys(["chain", "tokenAddress", "snapshotTs", *columns]))
+        frames = []
+        for path in self._files(dataset, chain, token_address, since):
+            try:
+                table = pq.read_table(path, columns=columns, filters=filters or None)
+            except OSError:
+                continue  # removed by a concurrent compaction; its rows live in the merged file
+            if table.num_rows:
+                frames.append(table.to_pandas())
+        if not frames:
+            return pd.DataFrame(columns=columns or ["chain", "tokenAddress", "snapshotTs"])
+        return concat_frames(frames).sort_values("snapshotTs", kind="stable").reset_index(drop=True)
+
+    def token_history(
+        self, dataset: str, chain: str, token_address: str, column: str, days: int = 30
+    ) -> pd.Series:
+        """`column` over time for one token, e.g. netflow over the last 30 days."""
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        df = self.query(dataset, chain, token_address, since=since, columns=[column])
+        return df.set_index("snapshotTs")[column] if not df.empty else pd.Series(dtype="float64", name=column)
+
+    def top_deltas(
+        self, dataset: str, column: str, since: datetime, chain: Optional[str] = None, k: int = 20
+    ) -> pd.DataFrame:
+        """
+        Largest changes of `column` per token between the last snapshot at or
+        before `since` and the latest snapshot.
+        """
+        since_ts = _utc(since)
+        # Look back one extra day so tokens have a "before" value at the boundary.
+        df = self.query(dataset, chain, since=since_ts - timedelta(days=1), columns=[column])
+        if df.empty or column not in df.columns:
+            return pd.DataFrame(columns=["chain", "tokenAddress", "before", "after", "delta"])
+        df["chain"] = df["chain"].astype(str)
+        keys = ["chain", "tokenAddress"]
+        before = df[df["snapshotTs"] <= since_ts].groupby(keys, observed=True).tail(1).set_index(keys)
+        after = df.groupby(keys, observed=True).tail(1).set_index(keys)
+        out = after[[column]].rename(columns={column: "after"})
+        out = out.join(before[[column]].rename(columns={column: "before"}), how="inner")
+        out["delta"] = out["after"].astype("float64") - out["before"].astype("float64")
+        return out.nlargest(k, "delta").reset_index()
+
+    def compact(self, dataset: str, before_date: Optional[str] = None) -> int:
+        """
+        Merge the part files of each closed partition (dates before `before_date`,
+        default today UTC) into one sorted file. Returns partitions compacted.
+        """
+        before_date = before_date or _date(pd.Timestamp.now(tz="UTC"))
+        conn = self._conn()
+        partitions = conn.execute(
+            "SELECT chain, date FROM files WHERE dataset = ? AND date < ? GROUP BY chain, date HAVING COUNT(*) > 1",
+            (dataset, before_date),
+        ).fetchall()
+        for chain, date in partitions:
+            old = [row[0] for row in conn.execute(
+                "SELECT path FROM files WHERE dataset = ? AND chain = ? AND date = ?", (dataset, chain, date)
+            )]
+            merged = concat_frames([pq.read_table(path).to_pandas() for path in old])
+            path = self._write_part(dataset, chain, date, merged)
+            with conn:
+                conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in old])
+                conn.executemany("DELETE FROM tokens WHERE path = ?", [(p,) for p in old])
+                self._register(conn, dataset, chain, date, path, merged)
+            for stale in old:
+                os.remove(stale)
+        return len(partitions)
+
+    def apply_retention(self, dataset: str, keep_days: int = RETENTION_DAYS) -> int:
+        """Drop partitions older than `keep_days`; returns files removed."""
+        cutoff = _date(pd.Timestamp.now(tz="UTC") - timedelta(days=keep_days))
+        conn = self._conn()
+        old = [row[0] for row in conn.execute(
+            "SELECT path FROM files WHERE dataset = ? AND date < ?", (dataset, cutoff)
+        )]
+        with conn:
+            conn.execute("DELETE FROM files WHERE dataset = ? AND date < ?", (dataset, cutoff))
+            conn.execute("DELETE FROM tokens WHERE dataset = ? AND date < ?", (dataset, cutoff))
+        for path in old:
+            try:
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+        return len(old)
+
+    def maintain(self, dataset: str):
+        self.compact(dataset)
+        self.apply_retention(dataset)
+
+
+_default_history: Optional[HistoryStore] = None
+
+
+def default_history() -> Optional[HistoryStore]:
+    """Store under NANSEN_HISTORY_DIR, or None when history is not configured."""
+    global _default_history
+    if _default_history is None and HISTORY_DIR:
+        _default_history = HistoryStore(HISTORY_DIR)
+    return _default_history
+
+
+def record_frame(dataset: str, df: pd.DataFrame, **columns) -> None:
+    """Append `df` to the default history store if one is configured. Extra
+    keyword arguments are added as constant columns (e.g. chain, tokenAddress)."""
+    store = default_history()
+    if store is None or df.empty:
+        return
+    if columns:
+        df = df.assign(**columns)
+    store.append(dataset, df)
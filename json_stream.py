@@ -0,0 +1,159 @@
+"""
+Incremental decoding of `{"data": [...]}` / `[...]` API responses.
+
+Records are decoded one at a time from a stream of byte chunks with
+json.JSONDecoder.raw_decode, so only the undecoded tail of the body and the
+current batch are held in memory, never the whole response.
+"""
+import codecs
+import json
+from typing import AsyncIterator, Dict, Iterable, Iterator, List
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# Drop consumed text from the buffer once this many characters have been parsed.
+_COMPACT_AT = 1 << 16
+
+_INCOMPLETE = object()
+_DONE = object()
+
+
+class _ArrayParser:
+    """Push-style parser: feed() text, then drain records with next_item()."""
+
+    def __init__(self, key: str = "data"):
+        self.key = key
+        self.buf = ""
+        self.pos = 0
+        self.state = "start"  # start -> keys -> array -> done
+        self.final = False
+
+    def feed(self, text: str, final: bool = False):
+        if self.pos >= _COMPACT_AT:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += text
+        self.final = final
+
+    def _skip(self, chars: str = _WHITESPACE):
+        while self.pos < len(self.buf) and self.buf[self.pos] in chars:
+            self.pos += 1
+
+    def _decode(self):
+        """Decode one JSON value at pos, or return _INCOMPLETE if more input is needed."""
+        try:
+            value, end = _decoder.raw_decode(self.buf, self.pos)
+        except json.JSONDecodeError:
+            if self.final:
+                raise
+            return _INCOMPLETE
+        # A scalar that ends exactly at the end of the buffer may still be growing ("12" of "123").
+        if end == len(self.buf) and not self.final:
+            return _INCOMPLETE
+        self.pos = end
+        return value
+
+    def next_item(self):
+        """Return the next array element, _INCOMPLETE, or _DONE."""
+        while True:
+            self._skip()
+            if self.pos >= len(self.buf):
+                if self.final and self.state != "done":
+                    if self.state == "keys":
+                        return _DONE  # object without the key: no records
+                    raise ValueError("Unexpected end of JSON response")
+                return _DONE if self.state == "done" else _INCOMPLETE
+            char = self.buf[self.pos]
+            if self.state == "start":
+                if char == "[":
+                    self.state = "array"
+                    self.pos += 1
+                elif char == "{":
+                    self.state = "keys"
+                    self.pos += 1
+                else:
+                    self.state = "done"
+                    return _DONE
+            elif self.state == "keys":
+                if char == ",":
+                    self.pos += 1
+                    continue
+                if char == "}":
+                    self.state = "done"
+                    return _DONE
+                start = self.pos
+                name = self._decode()
+                if name is _INCOMPLETE:
+                    return _INCOMPLETE
+                self._skip()
+                if self.pos >= len(self.buf):
+                    self.pos = start
+                    return _INCOMPLETE
+                if self.buf[self.pos] != ":":
+                    raise ValueError(f"Expected ':' at offset {self.pos} of JSON response")
+                self.pos += 1
+                self._skip()
+                if self.pos >= len(self.buf):
+                    self.pos = start
+                    return _INCOMPLETE
+                if name == self.key and self.buf[self.pos] == "[":
+                    self.state = "array"
+                    self.pos += 1
+                elif self._decode() is _INCOMPLETE:
+                    # Other top-level values (pagination, metadata) are small; retry once buffered.
+                    self.pos = start
+                    return _INCOMPLETE
+            elif self.state == "array":
+                if char == ",":
+                    self.pos += 1
+                    continue
+                if char == "]":
+                    self.state = "done"
+                    return _DONE
+                return self._decode()
+            else:
+                return _DONE
+
+
+def _drain(parser: _ArrayParser, batch: List, batch_size: int) -> Iterator[List]:
+    while True:
+        item = parser.next_item()
+        if item is _INCOMPLETE or item is _DONE:
+            return
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch[:]
+            batch.clear()
+
+
+def iter_record_batches(chunks: Iterable[bytes], batch_size: int = 1000, key: str = "data") -> Iterator[List[Dict]]:
+    """Yield lists of at most `batch_size` records decoded from byte chunks."""
+    parser = _ArrayParser(key)
+    text = codecs.getincrementaldecoder("utf-8")()
+    batch: List[Dict] = []
+    for chunk in chunks:
+        parser.feed(text.decode(chunk))
+        yield from _drain(parser, batch, batch_size)
+    parser.feed(text.decode(b"", final=True), final=True)
+    yield from _drain(parser, batch, batch_size)
+    if batch:
+        yield batch
+
+
+async def aiter_record_batches(
+    chunks: AsyncIterator[bytes], batch_size: int = 1000, key: str = "data"
+) -> AsyncIterator[List[Dict]]:
+    """Async version of iter_record_batches, e.g. over httpx Response.aiter_bytes()."""
+    parser = _ArrayParser(key)
+    text = codecs.getincrementaldecoder("utf-8")()
+    batch: List[Dict] = []
+    async for chunk in chunks:
+        parser.feed(text.decode(chunk))
+        for full in _drain(parser, batch, batch_size):
+            yield full
+    parser.feed(text.decode(b"", final=True), final=True)
+    for full in _drain(parser, batch, batch_size):
+        yield full
+    if batch:
+        yield batch
+
@@ -0,0 +1,233 @@
+"""
+In-process instrumentation: timing spans, counters and a Prometheus text export.
+
+    with span("normalize", endpoint=path) as tags:
+        df = to_dataframe(page)
+        tags["rows"] = len(df)
+    inc("nansen_http_retries_total", endpoint=path, reason="503")
+
+Spans are kept in a ring buffer (latest first in recent_spans()) and feed a
+per-(stage, endpoint) duration histogram. Spans slower than
+NANSEN_SLOW_SPAN_SECONDS also go to the slow-query log and the logger.
+Set NANSEN_METRICS_PORT to serve GET /metrics from a background thread.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+METRICS_PORT = int(os.getenv("NANSEN_METRICS_PORT", "0"))
+SLOW_SPAN_SECONDS = float(os.getenv("NANSEN_SLOW_SPAN_SECONDS", "2.0"))
+SPAN_BUFFER = int(os.getenv("NANSEN_SPAN_BUFFER", "500"))
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Span tags that become histogram labels; everything else (rows, bytes, ...)
+# stays on the span only, to keep label cardinality bounded.
+LABEL_TAGS = ("endpoint", "view")
+
+logger = logging.getLogger("nansen.metrics")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Span(NamedTuple):
+    name: str
+    started_at: float
+    seconds: float
+    tags: Dict
+    error: Optional[str] = None
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class Registry:
+    def __init__(self, span_buffer: int = SPAN_BUFFER, slow_seconds: float = SLOW_SPAN_SECONDS):
+        self.slow_seconds = slow_seconds
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        self._spans: deque = deque(maxlen=span_buffer)
+        self._slow: deque = deque(maxlen=100)
+        self._collectors: Dict[str, Callable[[], Dict]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            # Per-bucket counts, then sum and count.
+            hist = self._histograms.setdefault(key, [0.0] * (len(BUCKETS) + 2))
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist[index] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+
+    def record(self, name: str, seconds: float, tags: Dict, error: Optional[str] = None, started_at=None):
+        entry = Span(name, started_at or time.time() - seconds, seconds, tags, error)
+        labels = {key: tags[key] for key in LABEL_TAGS if key in tags}
+        self.observe("nansen_stage_seconds", seconds, stage=name, **labels)
+        if error is not None:
+            self.inc("nansen_stage_errors_total", stage=name, error=error, **labels)
+        with self._lock:
+            self._spans.append(entry)
+            if seconds >= self.slow_seconds:
+                self._slow.append(entry)
+        if seconds >= self.slow_seconds:
+            logger.warning("slow %s %.2fs %s", name, seconds, tags)
+
+    @contextmanager
+    def span(self, name: str, **tags) -> Iterator[Dict]:
+        """Time the block; the yielded dict can be filled with more tags (rows, bytes, ...)."""
+        started_at, started = time.time(), time.perf_counter()
+        error = None
+        try:
+            yield tags
+        except BaseException as exc:
+            error = type(exc).__name__
+            raise
+        finally:
+            self.record(name, time.perf_counter() - started, tags, error, started_at)
+
+    def register_collector(self, prefix: str, collect: Callable[[], Dict]):
+        """Export collect()'s numeric values as gauges named <prefix>_<key> on every scrape."""
+        with self._lock:
+            self._collectors[prefix] = collect
+
+    def recent_spans(self, n: int = 100) -> List[Span]:
+        with self._lock:
+            return list(self._spans)[-n:][::-1]
+
+    def slow_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._slow)[::-1]
+
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            items = list(self._counters.items())
+        return {f"{name}{_format_labels(labels)}": value for (name, labels), value in sorted(items)}
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(values)) for key, values in self._histograms.items())
+            collectors = list(self._collectors.items())
+        lines: List[str] = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), hist in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in zip(BUCKETS, hist):
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {count:g}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {hist[-1]:g}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {hist[-2]:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist[-1]:g}")
+        for prefix, collect in collectors:
+            try:
+                values = collect()
+            except Exception:
+                logger.exception("metrics collector %s failed", prefix)
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+span = REGISTRY.span
+inc = REGISTRY.inc
+register_collector = REGISTRY.register_collector
+
+
+class HttpTimer:
+    """
+    httpx "trace" extension callback recording connect, time-to-first-byte and
+    download times for one request (see AsyncNansenClient._send).
+    """
+
+    def __init__(self):
+        self.marks: Dict[str, float] = {}
+
+    async def __call__(self, event: str, info: Dict):
+        # e.g. "connection.connect_tcp.started", "http11.receive_response_headers.complete"
+        self.marks[event.split(".", 1)[-1]] = time.perf_counter()
+
+    def _between(self, start: str, end: str) -> Optional[float]:
+        if start in self.marks and end in self.marks:
+            return round(self.marks[end] - self.marks[start], 6)
+        return None
+
+    def timings(self) -> Dict[str, float]:
+        connect = self._between("connect_tcp.started", "connect_tcp.complete")
+        tls = self._between("start_tls.started", "start_tls.complete")
+        out = {
+            "connect_s": (connect or 0.0) + (tls or 0.0) if connect is not None else None,
+            "ttfb_s": self._between("send_request_headers.started", "receive_response_headers.complete"),
+            "download_s": self._between("receive_response_body.started", "receive_response_body.complete"),
+        }
+        return {key: value for key, value in out.items() if value is not None}
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_server(port: Optional[int] = None, host: str = "0.0.0.0") -> Optional[int]:
+    """Serve GET /metrics on `port` once per process; returns the bound port or None when disabled."""
+    global _server
+    if port is None:
+        # Read at call time: .env is loaded by config.load_config() after this module may be imported.
+        port = int(os.getenv("NANSEN_METRICS_PORT", str(METRICS_PORT)))
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            class Handler(BaseHTTPRequestHandler):
+                def log_message(self, *args):
+                    pass
+
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = REGISTRY.prometheus().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            try:
+                _server = ThreadingHTTPServer((host, port), Handler)
+            except OSError:
+                # Another process (e.g. a second Streamlit worker) already serves this port.
+                logger.warning("metrics port %s is in use; not serving /metrics from this process", port)
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="nansen-metrics", daemon=True).start()
+        return _server.server_address[1]
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Headless export of Nansen data, without Streamlit or Plotly:
+
+    python -m nansen_cli screener --chains ethereum,base --sectors DeFi,AI --out screener.parquet
+    python -m nansen_cli inflows --chains solana --max-records 1000 --out inflows.csv
+    python -m nansen_cli holdings --out - | jq .symbol
+    python -m nansen_cli flows --token ethereum:0xa0b8... --token base:0x... --timeframe 7d --out flows.ndjson
+
+Pages are converted with the dataframes.py converters and written as they
+arrive, so memory stays at about one page. The format follows the --out
+extension (.parquet, .csv, .ndjson/.jsonl) unless --format is given; `-`
+writes NDJSON to stdout.
+"""
+import argparse
+import datetime
+import sys
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from config import load_config
+from dataframes import flows_many_to_dataframe, holdings_to_dataframe, inflows_to_dataframe, screener_to_dataframe
+from query import screener_query, smart_money_query
+
+if TYPE_CHECKING:
+    from nansen_client import NansenClient
+
+FORMATS = {".parquet": "parquet", ".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+DEFAULT_CHAINS = ["ethereum", "solana", "base"]
+DEFAULT_SM_FILTER = ["180D Smart Trader", "Fund", "Smart Trader"]
+
+
+# Parquet pages are buffered until every column has a concrete type (a column
+# that is empty on the first page is Arrow `null`), up to this many rows.
+PARQUET_BUFFER_ROWS = 100_000
+
+
+def _arrow_type(field_type):
+    """The writer type for a page's field; None while the page only has nulls."""
+    import pyarrow as pa
+
+    if pa.types.is_null(field_type):
+        return None
+    if pa.types.is_dictionary(field_type):
+        if pa.types.is_null(field_type.value_type):
+            return None
+        # Later pages may have more categories than fit the first page's int8 index.
+        return pa.dictionary(pa.int32(), field_type.value_type)
+    return field_type
+
+
+class FrameWriter:
+    """Appends frames to one output file in the chosen format.
+
+    The file's columns are those of the first page (for Parquet: of the
+    buffered pages); columns that only appear later are dropped with a warning.
+    """
+
+    def __init__(self, out: str, fmt: str):
+        self.out = out
+        self.fmt = fmt
+        self.rows = 0
+        self._fh = None
+        self._columns: Optional[List[str]] = None
+        self._dropped = set()
+        self._parquet = None
+        self._pending = []
+        self._types = {}
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        if self.fmt == "parquet":
+            self._write_parquet(df)
+        else:
+            if self._fh is None:
+                self._fh = sys.stdout if self.out == "-" else open(self.out, "w", newline="")
+            if self.fmt == "csv":
+                if self._columns is None:
+                    self._columns = list(df.columns)
+                else:
+                    self._drop_new(df.columns)
+                    df = df.reindex(columns=self._columns)
+                df.to_csv(self._fh, header=self.rows == 0, index=False)
+            else:
+                df.to_json(self._fh, orient="records", lines=True, date_format="iso")
+        self.rows += len(df)
+
+    def _drop_new(self, columns):
+        new = [name for name in columns if name not in self._columns and name not in self._dropped]
+        if new:
+            self._dropped.update(new)
+            print(f"warning: dropping columns not in the first page: {', '.join(new)}", file=sys.stderr)
+
+    def _write_parquet(self, df: pd.DataFrame):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._parquet is not None:
+            self._write_table(table)
+            return
+        for field in table.schema:
+            known, seen = self._types.get(field.name), _arrow_type(field.type)
+            if known is None:
+                self._types[field.name] = seen
+            elif seen is not None and pa.types.is_integer(known) and pa.types.is_floating(seen):
+                self._types[field.name] = pa.float64()
+        self._pending.append(table)
+        if all(self._types.values()) or sum(len(t) for t in self._pending) >= PARQUET_BUFFER_ROWS:
+            self._open_parquet()
+
+    def _open_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        fields = [pa.field(name, type_ or pa.null()) for name, type_ in self._types.items()]
+        schema = pa.schema(fields, metadata=self._pending[0].schema.metadata)
+        self._columns = schema.names
+        self._parquet = pq.ParquetWriter(self.out, schema)
+        pending, self._pending = self._pending, []
+        for table in pending:
+            self._write_table(table)
+
+    def _write_table(self, table):
+        import pyarrow as pa
+
+        schema = self._parquet.schema
+        self._drop_new(table.column_names)
+        for field in schema:
+            if field.name not in table.column_names:
+                table = table.append_column(field.name, pa.nulls(len(table), field.type))
+        try:
+            table = table.select(schema.names).cast(schema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(
+                f"a page does not fit the Parquet schema of the earlier pages ({e}); "
+                "the rows written before it are kept"
+            ) from e
+        self._parquet.write_table(table)
+
+    def close(self):
+        if self._parquet is None and self._pending:
+            self._open_parquet()
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._fh is not None and self._fh is not sys.stdout:
+            self._fh.close()
+
+
+def _chains(value: str) -> List[str]:
+    return [chain.strip() for chain in value.split(",") if chain.strip()]
+
+
+def _token(value: str) -> Tuple[str, str]:
+    chain, sep, address = value.partition(":")
+    if not sep or not chain or not address:
+        raise argparse.ArgumentTypeError("expected CHAIN:ADDRESS")
+    return chain, address
+
+
+def smart_money_payload(args) -> Dict:
+    query = smart_money_query(
+        args.chains, args.sm_filter,
+        include_stablecoins=not args.exclude_stablecoins, include_native=not args.exclude_native,
+    )
+    return query.payload({"page": 1, "recordsPerPage": args.page_size})
+
+
+def screener_payload(args) -> Dict:
+    today = str(datetime.date.today())
+    query = screener_query(
+        args.chains, args.date_from or today, args.date_to or today,
+        only_smart_money=not args.all_wallets, sectors=args.sectors,
+    )
+    return query.payload({"page": 1, "recordsPerPage": args.page_size})
+
+
+PAGED_COMMANDS = {
+    "inflows": ("/smart-money/inflows", smart_money_payload, inflows_to_dataframe),
+    "holdings": ("/smart-money/holdings", smart_money_payload, holdings_to_dataframe),
+    "screener": ("/token-screener", screener_payload, screener_to_dataframe),
+}
+
+
+def export_pages(client: "NansenClient", args, writer: FrameWriter):
+    path, build_payload, to_dataframe = PAGED_COMMANDS[args.command]
+    for page in client.iter_pages(path, build_payload(args), args.max_records):
+        writer.write(to_dataframe(page))
+
+
+def export_flows(client: "NansenClient", args, writer: FrameWriter) -> int:
+    """One row per token (same columns for one token or many); returns the number of failed tokens."""
+    failed = 0
+    pagination = {"page": 1, "recordsPerPage": args.page_size}
+    for token, items in client.iter_flow_intelligence(args.token, args.timeframe, pagination=pagination):
+        if isinstance(items, Exception):
+            failed += 1
+            print(f"{token[0]}:{token[1]} failed: {items}", file=sys.stderr)
+            continue
+        writer.write(flows_many_to_dataframe({token: items}))
+    if failed:
+        print(f"{failed} of {len(args.token)} tokens failed", file=sys.stderr)
+    return failed
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="nansen_cli", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--out", default="-", help="output file, or - for NDJSON on stdout (default)")
+    common.add_argument("--format", choices=sorted(set(FORMATS.values())), help="override the --out extension")
+    common.add_argument("--page-size", type=int, default=100, help="records per page (default 100)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("inflows", "holdings"):
+        cmd = sub.add_parser(name, parents=[common], help=f"smart money {name}")
+        cmd.add_argument("--chains", type=_chains, default=["ethereum", "solana"])
+        cmd.add_argument("--sm-filter", type=_chains, default=DEFAULT_SM_FILTER, help="comma-separated labels")
+        cmd.add_argument("--exclude-stablecoins", action="store_true")
+        cmd.add_argument("--exclude-native", action="store_true")
+        cmd.add_argument("--max-records", type=int, help="stop after this many records (default: all pages)")
+
+    cmd = sub.add_parser("screener", parents=[common], help="token screener")
+    cmd.add_argument("--chains", type=_chains, default=DEFAULT_CHAINS)
+    cmd.add_argument("--date-from", help="YYYY-MM-DD (default today)")
+    cmd.add_argument("--date-to", help="YYYY-MM-DD (default today)")
+    cmd.add_argument("--all-wallets", action="store_true", help="do not restrict to smart money")
+    cmd.add_argument("--sectors", type=_chains, default=[], help="comma-separated sectors (filtered by the API)")
+    cmd.add_argument("--max-records", type=int, help="stop after this many records (default: all pages)")
+
+    cmd = sub.add_parser("flows", parents=[common], help="flow intelligence for one or more tokens")
+    cmd.add_argument("--token", type=_token, action="append", required=True, metavar="CHAIN:ADDRESS")
+    cmd.add_argument("--timeframe", default="1d", choices=["1d", "7d", "30d"])
+    return parser
+
+
+def output_format(out: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    if out == "-":
+        return "ndjson"
+    for suffix, name in FORMATS.items():
+        if out.lower().endswith(suffix):
+            return name
+    raise ValueError(f"Cannot tell the format of {out!r}; use --format.")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        fmt = output_format(args.out, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    if fmt == "parquet" and args.out == "-":
+        parser.error("Parquet output needs a file name.")
+
+    # Settings modules read the environment on import, so load .env first.
+    load_config()
+    from nansen_client import get_client
+
+    started = time.monotonic()
+    client = get_client()
+    writer = FrameWriter(args.out, fmt)
+    failed = 0
+    try:
+        if args.command == "flows":
+            failed = export_flows(client, args, writer)
+        else:
+            export_pages(client, args, writer)
+    finally:
+        writer.close()
+        client.close()
+    print(f"{writer.rows} rows -> {args.out} ({fmt}) in {time.monotonic() - started:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
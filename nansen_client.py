@@ -1,49 +1,296 @@
+import asyncio
+import copy
 import os
-from typing import Dict, List, Optional
+import random
+import threading
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
-import requests
-from dotenv import load_dotenv
+import httpx
 
-load_dotenv()
+from json_stream import aiter_record_batches
+from metrics import HttpTimer, inc, register_collector, span
+from rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, RateLimiter, credits_for, default_limiter
+from response_cache import MISS, ResponseCache, canonical_key
 
-API_BASE = os.getenv("NANSEN_BASE_URL", "https://api.nansen.ai/api/beta")
-API_KEY = os.getenv("apiKey")
+DEFAULT_BASE_URL = "https://api.nansen.ai/api/beta"
 CANDLES_PATH = os.getenv("NANSEN_CANDLES_PATH", "")
+POOL_SIZE = int(os.getenv("NANSEN_POOL_SIZE", "16"))
+MAX_RETRIES = int(os.getenv("NANSEN_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("NANSEN_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("NANSEN_BACKOFF_MAX", "8"))
+GATHER_LIMIT = int(os.getenv("NANSEN_GATHER_LIMIT", "4"))
+PREFETCH_PAGES = int(os.getenv("NANSEN_PREFETCH_PAGES", "2"))
+STREAM_BATCH_SIZE = int(os.getenv("NANSEN_STREAM_BATCH_SIZE", "1000"))
 
-class NansenClient:
-    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None):
-        self.base_url = base_url or API_BASE
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# (connect, read) timeouts in seconds; endpoints not listed use DEFAULT_TIMEOUT.
+DEFAULT_TIMEOUT = (5, 45)
+ENDPOINT_TIMEOUTS = {
+    "/smart-money/inflows": (5, 30),
+    "/smart-money/holdings": (5, 30),
+    "/token-screener": (5, 60),
+    "/tgm/flow-intelligence": (5, 30),
+    "/tgm/flows": (5, 60),
+}
+
+
+class RateLimitError(Exception):
+    """The API kept answering 429 after all retries."""
+
+    def __init__(self, path: str, retry_after: Optional[float] = None):
+        self.path = path
+        self.retry_after = retry_after
+        hint = f" Retry after {retry_after:.1f}s." if retry_after else ""
+        super().__init__(f"Nansen API rate limit reached for {path}.{hint}")
+
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def _as_timeout(value) -> httpx.Timeout:
+    if isinstance(value, httpx.Timeout):
+        return value
+    if isinstance(value, (tuple, list)):
+        connect, read = value
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(value)
+
+
+def _unwrap(data) -> List[Dict]:
+    if isinstance(data, dict) and "data" in data:
+        return data["data"]
+    if isinstance(data, list):
+        return data
+    return []
+
+
+class AsyncNansenClient:
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        pool_size: int = POOL_SIZE,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+        timeouts: Optional[Dict] = None,
+        cache: Optional[ResponseCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ):
+        # Read at construction, not import, so config.load_config() may run after this module is imported.
+        self.base_url = base_url or os.getenv("NANSEN_BASE_URL", DEFAULT_BASE_URL)
         self.headers = {
-            "apiKey": api_key or API_KEY,
+            "apiKey": api_key or os.getenv("apiKey"),
             "Content-Type": "application/json",
         }
         if not self.headers["apiKey"]:
             raise ValueError("Missing apiKey. Add it to .env file.")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeouts = dict(ENDPOINT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self.cache = cache
+        self.rate_limiter = rate_limiter or default_limiter()
+        self.priority = priority
+        # Single-flight map: identical requests already on the wire, keyed like the cache.
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}  # callers awaiting each in-flight request
+        self.coalesced = 0
+
+        # One keep-alive pool shared by every caller of this client. Retries are
+        # handled in _fetch so backoff and Retry-After apply uniformly.
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.http = httpx.AsyncClient(headers=self.headers, limits=limits, timeout=_as_timeout(DEFAULT_TIMEOUT))
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    def _backoff(self, attempt: int, resp: Optional[httpx.Response] = None) -> float:
+        """Exponential backoff with full jitter, honouring Retry-After when present."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = _retry_after(resp) if resp is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    async def _post(self, path: str, json_body: Dict, timeout=None, priority: Optional[int] = None):
+        if self.cache is not None:
+            cached = self.cache.get(path, json_body)
+            if cached is not MISS:
+                inc("nansen_cache_requests_total", endpoint=path, result="hit")
+                return cached
+            inc("nansen_cache_requests_total", endpoint=path, result="miss")
+        key = canonical_key(path, json_body)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(path, json_body, timeout, priority))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+            inc("nansen_coalesced_total", endpoint=path)
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # Shield so one caller giving up does not cancel the request for the others.
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # The last caller gave up (e.g. an unused prefetch): stop the request too.
+                    self._forget(key, task)
+                    task.cancel()
+
+    def _forget(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _fetch_and_store(self, path: str, json_body: Dict, timeout=None, priority: Optional[int] = None):
+        data = await self._fetch(path, json_body, timeout, priority)
+        if self.cache is not None:
+            self.cache.set(path, json_body, data)
+        return data
+
+    async def _fetch(self, path: str, json_body: Dict, timeout=None, priority: Optional[int] = None):
+        resp = await self._send(path, json_body, timeout, priority)
+        with span("decode", endpoint=path, response_bytes=len(resp.content)) as tags:
+            records = _unwrap(resp.json())
+            tags["records"] = len(records)
+        return records
 
-    def _post(self, path: str, json_body: Dict, timeout: int = 45):
+    async def _send(
+        self, path: str, json_body: Dict, timeout=None, priority: Optional[int] = None, stream: bool = False
+    ) -> httpx.Response:
+        """POST with rate limiting and retries; streamed responses are returned unread."""
         url = f"{self.base_url}{path}"
-        resp = requests.post(url, headers=self.headers, json=json_body, timeout=timeout)
-        resp.raise_for_status()
-        data = resp.json()
-        if isinstance(data, dict) and "data" in data:
-            return data["data"]
-        if isinstance(data, list):
-            return data
-        return []
+        timeout = _as_timeout(timeout or self.timeouts.get(path, DEFAULT_TIMEOUT))
+        priority = self.priority if priority is None else priority
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(credits_for(path), priority)
+            # One span per attempt: connect/TTFB/download come from httpcore's trace events.
+            timer = HttpTimer()
+            try:
+                with span("http", endpoint=path, attempt=attempt) as tags:
+                    request = self.http.build_request(
+                        "POST", url, json=json_body, timeout=timeout, extensions={"trace": timer}
+                    )
+                    tags["request_bytes"] = len(request.content)
+                    try:
+                        resp = await self.http.send(request, stream=stream)
+                    finally:
+                        tags.update(timer.timings())
+                    tags["status"] = resp.status_code
+                    if not stream:
+                        tags["response_bytes"] = len(resp.content)
+            except httpx.TransportError as exc:
+                if attempt >= self.max_retries:
+                    raise
+                inc("nansen_http_retries_total", endpoint=path, reason=type(exc).__name__)
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            inc("nansen_http_responses_total", endpoint=path, status=resp.status_code)
+            if resp.status_code == 429:
+                inc("nansen_http_429_total", endpoint=path)
+                # Hold back every caller sharing the limiter, not just this one.
+                self.rate_limiter.pause(_retry_after(resp) or self._backoff(attempt))
+            if resp.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                inc("nansen_http_retries_total", endpoint=path, reason=str(resp.status_code))
+                await resp.aclose()
+                await asyncio.sleep(self._backoff(attempt, resp))
+                attempt += 1
+                continue
+            break
+        try:
+            if resp.status_code == 429:
+                raise RateLimitError(path, _retry_after(resp))
+            resp.raise_for_status()
+        except Exception:
+            await resp.aclose()
+            raise
+        return resp
 
-    def smart_money_inflows(self, payload: Dict) -> List[Dict]:
-        return self._post("/smart-money/inflows", payload)
+    async def stream_batches(
+        self, path: str, payload: Dict, batch_size: int = STREAM_BATCH_SIZE
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Yield the response's records in batches of `batch_size` while the body is
+        still downloading. Bypasses the response cache and request coalescing, so
+        use it for large single responses rather than dashboard-sized pages.
+        """
+        resp = await self._send(path, payload, stream=True)
+        try:
+            async for batch in aiter_record_batches(resp.aiter_bytes(), batch_size):
+                yield batch
+        finally:
+            await resp.aclose()
 
-    def smart_money_holdings(self, payload: Dict) -> List[Dict]:
-        return self._post("/smart-money/holdings", payload)
+    async def smart_money_inflows(self, payload: Dict) -> List[Dict]:
+        return await self._post("/smart-money/inflows", payload)
 
-    def token_screener(self, payload: Dict) -> List[Dict]:
-        return self._post("/token-screener", payload)
+    async def smart_money_holdings(self, payload: Dict) -> List[Dict]:
+        return await self._post("/smart-money/holdings", payload)
 
-    def flow_intelligence(self, payload: Dict) -> List[Dict]:
-        return self._post("/tgm/flow-intelligence", payload)
+    async def token_screener(self, payload: Dict) -> List[Dict]:
+        return await self._post("/token-screener", payload)
 
-    def token_candles(self, payload: Dict, path: Optional[str] = None) -> List[Dict]:
+    async def flow_intelligence(self, payload: Dict) -> List[Dict]:
+        return await self._post("/tgm/flow-intelligence", payload)
+
+    async def iter_flow_intelligence(
+        self, tokens: Sequence[Tuple[str, str]], timeframe: str, limit: int = GATHER_LIMIT,
+        pagination: Optional[Dict] = None,
+    ) -> AsyncIterator[Tuple[Tuple[str, str], Union[List[Dict], Exception]]]:
+        """
+        Flow intelligence for many (chain, tokenAddress) pairs, at most `limit`
+        requests in flight (all under the rate limiter). Yields (token, records)
+        in completion order; a failed token yields its exception instead.
+        """
+        sem = asyncio.Semaphore(max(1, limit))
+        pagination = pagination or {"page": 1, "recordsPerPage": 100}
+
+        async def run(token: Tuple[str, str]):
+            chain, address = token
+            payload = {
+                "parameters": {"chain": chain, "tokenAddress": address, "timeframe": timeframe},
+                "pagination": pagination,
+            }
+            async with sem:
+                try:
+                    return token, await self.flow_intelligence(payload)
+                except Exception as exc:
+                    return token, exc
+
+        tasks = [asyncio.ensure_future(run(token)) for token in dict.fromkeys(tokens)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def flow_intelligence_many(
+        self, tokens: Sequence[Tuple[str, str]], timeframe: str, limit: int = GATHER_LIMIT,
+        pagination: Optional[Dict] = None,
+    ) -> Dict[Tuple[str, str], Union[List[Dict], Exception]]:
+        """All results of iter_flow_intelligence, keyed by (chain, tokenAddress)."""
+        results = self.iter_flow_intelligence(tokens, timeframe, limit, pagination)
+        return {token: result async for token, result in results}
+
+    async def token_candles(self, payload: Dict, path: Optional[str] = None) -> List[Dict]:
         """
         Fetch OHLCV candles for a token. The endpoint path must be provided via env NANSEN_CANDLES_PATH
         or explicitly via the path argument, to comply with documented endpoints.
@@ -53,8 +300,205 @@ class NansenClient:
             raise ValueError("Missing NANSEN_CANDLES_PATH env or explicit path for candles endpoint.")
         if not candles_path.startswith("/"):
             candles_path = "/" + candles_path
-        return self._post(candles_path, payload)
+        return await self._post(candles_path, payload)
+
+    async def token_flows(self, payload: Dict) -> List[Dict]:
+        """Token God Mode flows (price history and flows)."""
+        return await self._post("/tgm/flows", payload)
+
+    async def iter_pages(
+        self, path: str, payload: Dict, max_records: Optional[int] = None, prefetch: int = PREFETCH_PAGES
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Yield the records of `path` page by page, starting at payload["pagination"]["page"].
+        Up to `prefetch` further pages are requested while the current one is consumed.
+        Stops after a short or empty page, or once `max_records` have been yielded.
+        """
+        pagination = payload.get("pagination") or {}
+        page_size = int(pagination.get("recordsPerPage", 100))
+        next_page = int(pagination.get("page", 1))
+        max_pages = -(-max_records // page_size) if max_records is not None else None
+        pending: deque = deque()
+        requested = 0
+        yielded = 0
+
+        def schedule():
+            nonlocal next_page, requested
+            while len(pending) <= prefetch and (max_pages is None or requested < max_pages):
+                body = copy.deepcopy(payload)
+                body["pagination"] = {**pagination, "page": next_page, "recordsPerPage": page_size}
+                # Pages beyond the one the caller is waiting for are speculative.
+                priority = None if not pending else max(self.priority, PRIORITY_PREFETCH)
+                pending.append(asyncio.ensure_future(self._post(path, body, priority=priority)))
+                next_page += 1
+                requested += 1
+
+        try:
+            schedule()
+            while pending:
+                records = await pending.popleft()
+                full_page = len(records) >= page_size
+                if max_records is not None:
+                    records = records[: max_records - yielded]
+                if records:
+                    yielded += len(records)
+                    yield records
+                if not full_page or (max_records is not None and yielded >= max_records):
+                    break
+                schedule()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def fetch_records(self, path: str, payload: Dict, max_records: Optional[int] = None) -> List[Dict]:
+        records: List[Dict] = []
+        async for page in self.iter_pages(path, payload, max_records):
+            records.extend(page)
+        return records
+
+    async def gather(self, calls: Dict[str, Tuple], limit: int = GATHER_LIMIT) -> Dict:
+        """
+        Run independent endpoint calls concurrently, at most `limit` in flight.
+        `calls` maps a result name to (method name, *args), e.g.
+        {"inflows": ("smart_money_inflows", payload)}. Failed calls yield their exception.
+        """
+        sem = asyncio.Semaphore(max(1, limit))
+
+        async def run(method: str, *args):
+            async with sem:
+                return await getattr(self, method)(*args)
+
+        names = list(calls)
+        results = await asyncio.gather(*(run(*calls[name]) for name in names), return_exceptions=True)
+        return dict(zip(names, results))
+
+
+class NansenClient:
+    """
+    Blocking facade over AsyncNansenClient. Calls from any thread are run on a
+    private event loop so they share the async client's connection pool.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None, **kwargs):
+        self._async = AsyncNansenClient(base_url=base_url, api_key=api_key, **kwargs)
+        self.base_url = self._async.base_url
+        self.headers = self._async.headers
+        self.cache = self._async.cache
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="nansen-client", daemon=True)
+        self._thread.start()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _iterate(self, agen) -> Iterator:
+        """Drive an async generator on the client loop from the calling thread."""
+        try:
+            while True:
+                try:
+                    item = self._run(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            self._run(agen.aclose())
+
+    def close(self):
+        self._run(self._async.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def _post(self, path: str, json_body: Dict, timeout=None):
+        return self._run(self._async._post(path, json_body, timeout))
+
+    def smart_money_inflows(self, payload: Dict) -> List[Dict]:
+        return self._run(self._async.smart_money_inflows(payload))
+
+    def smart_money_holdings(self, payload: Dict) -> List[Dict]:
+        return self._run(self._async.smart_money_holdings(payload))
+
+    def token_screener(self, payload: Dict) -> List[Dict]:
+        return self._run(self._async.token_screener(payload))
+
+    def flow_intelligence(self, payload: Dict) -> List[Dict]:
+        return self._run(self._async.flow_intelligence(payload))
+
+    def iter_flow_intelligence(
+        self, tokens: Sequence[Tuple[str, str]], timeframe: str, limit: int = GATHER_LIMIT,
+        pagination: Optional[Dict] = None,
+    ) -> Iterator[Tuple[Tuple[str, str], Union[List[Dict], Exception]]]:
+        """Blocking version of AsyncNansenClient.iter_flow_intelligence."""
+        return self._iterate(self._async.iter_flow_intelligence(tokens, timeframe, limit, pagination))
+
+    def flow_intelligence_many(
+        self, tokens: Sequence[Tuple[str, str]], timeframe: str, limit: int = GATHER_LIMIT,
+        pagination: Optional[Dict] = None,
+    ) -> Dict[Tuple[str, str], Union[List[Dict], Exception]]:
+        return self._run(self._async.flow_intelligence_many(tokens, timeframe, limit, pagination))
+
+    def token_candles(self, payload: Dict, path: Optional[str] = None) -> List[Dict]:
+        return self._run(self._async.token_candles(payload, path))
 
     def token_flows(self, payload: Dict) -> List[Dict]:
         """Token God Mode flows (price history and flows)."""
-        return self._post("/tgm/flows", payload)
+        return self._run(self._async.token_flows(payload))
+
+    def iter_pages(
+        self, path: str, payload: Dict, max_records: Optional[int] = None, prefetch: int = PREFETCH_PAGES
+    ) -> Iterator[List[Dict]]:
+        """Blocking version of AsyncNansenClient.iter_pages."""
+        return self._iterate(self._async.iter_pages(path, payload, max_records, prefetch))
+
+    def stream_batches(self, path: str, payload: Dict, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[List[Dict]]:
+        """Blocking version of AsyncNansenClient.stream_batches."""
+        return self._iterate(self._async.stream_batches(path, payload, batch_size))
+
+    def fetch_records(self, path: str, payload: Dict, max_records: Optional[int] = None) -> List[Dict]:
+        return self._run(self._async.fetch_records(path, payload, max_records))
+
+    def fetch_all(
+        self, path: str, payload: Dict, to_dataframe: Callable, max_records: Optional[int] = None
+    ):
+        """Convert each page with a dataframes.py converter as it arrives and concatenate once."""
+        from dataframes import concat_frames
+
+        frames = []
+        for page in self.iter_pages(path, payload, max_records):
+            with span("normalize", endpoint=path, records=len(page)):
+                frames.append(to_dataframe(page))
+        if not frames:
+            return to_dataframe([])
+        return concat_frames(frames)
+
+    def gather(self, calls: Dict[str, Tuple], limit: int = GATHER_LIMIT) -> Dict:
+        """Blocking version of AsyncNansenClient.gather."""
+        return self._run(self._async.gather(calls, limit))
+
+    @property
+    def coalesced(self) -> int:
+        """Calls answered by joining an identical request already in flight."""
+        return self._async.coalesced
+
+    def rate_limit_stats(self) -> Dict:
+        return self._async.rate_limiter.stats()
+
+    def cache_stats(self) -> Dict:
+        return self.cache.stats() if self.cache is not None else {}
+
+
+_shared_client: Optional[NansenClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_client() -> NansenClient:
+    """Process-wide client so every view and session reuses one connection pool."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                client = NansenClient(cache=ResponseCache.from_env())
+                register_collector("nansen_response_cache", client.cache_stats)
+                register_collector("nansen_rate_limiter", client.rate_limit_stats)
+                register_collector("nansen_client", lambda: {"coalesced": client.coalesced})
+                _shared_client = client
+    return _shared_client
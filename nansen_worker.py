@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Background refresher that keeps the snapshot store warm for the dashboard.
+
+    NANSEN_SNAPSHOT_DIR=./snapshots python -m nansen_worker --interval 300
+    NANSEN_SNAPSHOT_DIR=./snapshots python -m nansen_worker --config worker.json --once
+    NANSEN_SNAPSHOT_DIR=./snapshots python -m nansen_worker --alerts rules.json
+
+The config file is JSON: {"interval": 300, "jobs": [{"dataset": "inflows",
+"payload": {...}, "max_records": 100}, ...]}. Datasets are the keys of
+snapshot_store.DATASETS. Without a config the jobs mirror the dashboard's
+default queries, so a fresh dashboard session is served from the store.
+When NANSEN_HISTORY_DIR is set, every refreshed frame is also appended to the
+history store, and closed partitions are compacted and expired each cycle.
+With --alerts, the rules in that file (see alerts.py) are evaluated on every
+refreshed frame and fired alerts go to the file's sinks.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from config import load_config
+from query import screener_query, smart_money_query
+
+if TYPE_CHECKING:
+    from alerts import AlertEngine
+    from nansen_client import NansenClient
+    from snapshot_store import SnapshotStore
+
+logger = logging.getLogger("nansen_worker")
+
+DEFAULT_INTERVAL = 300
+
+
+def default_jobs() -> List[Dict]:
+    """The queries the dashboard issues with its default widget values."""
+    pagination = {"page": 1, "recordsPerPage": 100}
+    smart_money_payload = smart_money_query(
+        ["ethereum", "solana"], ["180D Smart Trader", "Fund", "Smart Trader"]
+    ).payload(pagination)
+    today = datetime.date.today()
+    screener_payload = screener_query(["ethereum", "solana", "base"], today, today).payload(pagination)
+    return [
+        {"dataset": "inflows", "payload": smart_money_payload, "max_records": 100},
+        {"dataset": "holdings", "payload": smart_money_payload, "max_records": 100},
+        {"dataset": "screener", "payload": screener_payload, "max_records": 100},
+    ]
+
+
+def run_once(
+    client: "NansenClient", store: "SnapshotStore", jobs: List[Dict], alerts: Optional["AlertEngine"] = None
+) -> int:
+    """Refresh every job once (evaluating alert rules on each fresh frame); returns the number of snapshots written."""
+    from history_store import default_history
+    from response_cache import canonical_key
+    from snapshot_store import DATASETS
+
+    history = default_history()
+    written = 0
+    for job in jobs:
+        dataset = job["dataset"]
+        path, to_dataframe = DATASETS[dataset]
+        max_records = job.get("max_records")
+        try:
+            df = client.fetch_all(path, job["payload"], to_dataframe, max_records)
+            version = store.write(dataset, job["payload"], df, max_records)
+            store.prune(dataset, job["payload"], max_records)
+        except Exception:
+            logger.exception("Refreshing %s failed", dataset)
+            continue
+        written += 1
+        logger.info("Wrote %s snapshot %s (%d rows)", dataset, version, len(df))
+        if history is not None:
+            try:
+                history.append(dataset, df)
+            except Exception:
+                logger.exception("Appending %s to the history failed", dataset)
+        if alerts is not None:
+            try:
+                # Each job returns its whole result, so tokens missing from it have left the query.
+                source = canonical_key(dataset, {"payload": job["payload"], "max_records": max_records})
+                for alert in alerts.evaluate(dataset, df, complete=True, source=source):
+                    logger.info("Alert %s", alert.message)
+            except Exception:
+                logger.exception("Evaluating alerts for %s failed", dataset)
+    if history is not None:
+        for dataset in {job["dataset"] for job in jobs}:
+            try:
+                history.maintain(dataset)
+            except Exception:
+                logger.exception("History maintenance for %s failed", dataset)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", help="JSON file with interval and jobs")
+    parser.add_argument("--interval", type=float, help="seconds between refresh cycles")
+    parser.add_argument("--once", action="store_true", help="run one refresh cycle and exit")
+    parser.add_argument("--alerts", metavar="RULES.json", help="evaluate these alert rules on every refresh")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # Settings modules read the environment on import, so load .env first.
+    load_config()
+    from metrics import register_collector, start_server
+    from nansen_client import NansenClient
+    from rate_limiter import PRIORITY_BACKGROUND
+    from snapshot_store import default_store
+
+    config: Dict = {}
+    if args.config:
+        with open(args.config) as fh:
+            config = json.load(fh)
+    interval = args.interval or config.get("interval", DEFAULT_INTERVAL)
+
+    store = default_store()
+    if store is None:
+        parser.error("Set NANSEN_SNAPSHOT_DIR to the snapshot directory.")
+    # Background priority: interactive requests sharing the limiter are served first.
+    client = NansenClient(priority=PRIORITY_BACKGROUND)
+    register_collector("nansen_rate_limiter", client.rate_limit_stats)
+    engine = None
+    if args.alerts:
+        from alerts import load_engine
+
+        engine = load_engine(args.alerts)
+        logger.info("Loaded %d alert rules from %s", len(engine.rules), args.alerts)
+    if start_server():
+        logger.info("serving /metrics on port %s", os.getenv("NANSEN_METRICS_PORT"))
+    while True:
+        started = time.monotonic()
+        run_once(client, store, config.get("jobs") or default_jobs(), engine)
+        if args.once:
+            break
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Token price history from Token God Mode flows (/tgm/flows).
+
+Series are cached per (chain, token, label) together with the date ranges they
+cover, so widening or moving the window only fetches the days not fetched yet.
+Days before today are final; today's rows are re-fetched until the day closes.
+Long series are reduced before charting: lttb() keeps the visual shape of a
+line, ohlc() buckets prices into at most N candles.
+"""
+import datetime
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dataframes import concat_frames, token_flows_to_dataframe
+
+PRICE_CACHE_TOKENS = int(os.getenv("NANSEN_PRICE_CACHE_TOKENS", "256"))
+FLOWS_PAGE_SIZE = 500
+MAX_LINE_POINTS = 1000
+MAX_CANDLES = 120
+# A candle spans at least this many samples, so daily /tgm/flows prices give weekly candles.
+CANDLE_SAMPLES = 7
+
+Range = Tuple[datetime.date, datetime.date]
+
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def missing_ranges(covered: Sequence[Range], wanted: Range, today: datetime.date) -> List[Range]:
+    """Sub-ranges of `wanted` that are in none of the `covered` ranges (or are still open, i.e. today)."""
+    cursor, end = wanted
+    gaps = []
+    for covered_start, covered_end in sorted(covered):
+        # Only closed days count as covered.
+        covered_end = min(covered_end, today - ONE_DAY)
+        if covered_end < cursor or covered_start > covered_end:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start - ONE_DAY))
+        cursor = covered_end + ONE_DAY
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def merge_ranges(ranges: Sequence[Range]) -> List[Range]:
+    """Sorted ranges with overlapping or adjacent ones joined; disjoint ones stay apart."""
+    merged: List[Range] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + ONE_DAY:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class PriceHistoryCache:
+    def __init__(self, client=None, max_tokens: int = PRICE_CACHE_TOKENS, label: str = "smart_money"):
+        self._client = client
+        self.max_tokens = max_tokens
+        self.label = label
+        self._series: "OrderedDict[Tuple[str, str, str], Tuple[List[Range], pd.DataFrame]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self.requests = 0
+        self.hits = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            from nansen_client import get_client
+
+            self._client = get_client()
+        return self._client
+
+    def _fetch(self, chain: str, token_address: str, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+        payload = {
+            "parameters": {
+                "chain": chain,
+                "tokenAddress": token_address,
+                "date": {"from": str(start), "to": str(end)},
+                "label": self.label,
+            },
+            "pagination": {"page": 1, "recordsPerPage": FLOWS_PAGE_SIZE},
+        }
+        self.requests += 1
+        df = self.client.fetch_all("/tgm/flows", payload, token_flows_to_dataframe)
+        df.insert(0, "time", pd.to_datetime(df["blockDate"], errors="coerce", utc=True))
+        return df.dropna(subset=["time"])
+
+    def get(
+        self, chain: str, token_address: str, start: datetime.date, end: datetime.date,
+        today: Optional[datetime.date] = None,
+    ) -> pd.DataFrame:
+        """Rows of /tgm/flows for the token between `start` and `end` (inclusive), sorted by time."""
+        today = today or datetime.datetime.now(datetime.timezone.utc).date()
+        key = (chain, token_address, self.label)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                cached = self._series.get(key)
+            covered, frame = cached if cached is not None else ([], None)
+            gaps = missing_ranges(covered, (start, end), today)
+            if not gaps:
+                self.hits += 1
+            else:
+                parts = ([frame] if frame is not None else []) + [
+                    self._fetch(chain, token_address, a, b) for a, b in gaps
+                ]
+                frame = concat_frames(parts) if len(parts) > 1 else parts[0]
+                frame = frame.drop_duplicates(subset=["time"], keep="last").sort_values("time", ignore_index=True)
+                covered = merge_ranges([*covered, (start, end)])
+                with self._lock:
+                    self._series[key] = (covered, frame)
+                    while len(self._series) > self.max_tokens:
+                        self._series.popitem(last=False)
+            with self._lock:
+                self._series.move_to_end(key)
+        days = frame["time"].dt.date
+        return frame[(days >= start) & (days <= end)].reset_index(drop=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"tokens": len(self._series), "requests": self.requests, "hits": self.hits}
+
+
+def lttb(df: pd.DataFrame, x: str, y: str, max_points: int = MAX_LINE_POINTS) -> pd.DataFrame:
+    """Largest-Triangle-Three-Buckets downsampling of the (x, y) line to `max_points` rows."""
+    data = df.dropna(subset=[y])
+    n = len(data)
+    if n <= max_points or max_points < 3:
+        return data
+    xs = data[x]
+    if pd.api.types.is_datetime64_any_dtype(xs):
+        xs = xs.astype("int64")
+    xs = xs.to_numpy(dtype="float64")
+    ys = data[y].to_numpy(dtype="float64")
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    keep = [0]
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex.
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = xs[nlo:nhi].mean(), ys[nlo:nhi].mean()
+        ax, ay = xs[keep[-1]], ys[keep[-1]]
+        area = np.abs((ax - avg_x) * (ys[lo:hi] - ay) - (ax - xs[lo:hi]) * (avg_y - ay))
+        keep.append(lo + int(area.argmax()))
+    keep.append(n - 1)
+    return data.iloc[keep]
+
+
+def ohlc(
+    df: pd.DataFrame, time: str = "time", price: str = "priceUsd", max_candles: int = MAX_CANDLES,
+    samples: int = CANDLE_SAMPLES,
+) -> pd.DataFrame:
+    """Bucket a price series into at most `max_candles` time, open, high, low, close rows."""
+    data = df[[time, price]].dropna().sort_values(time)
+    if data.empty:
+        return pd.DataFrame(columns=["time", "open", "high", "low", "close"])
+    span = data[time].iloc[-1] - data[time].iloc[0]
+    # Several samples per candle: one sample per candle is a flat tick, not an OHLC bar.
+    spacing = data[time].diff().median() if len(data) > 1 else pd.Timedelta(0)
+    width = max(span / max(1, max_candles - 1), spacing * samples, pd.Timedelta(minutes=1))
+    width = pd.Timedelta(seconds=int(np.ceil(width.total_seconds())))
+    buckets = data.set_index(time)[price].resample(width, origin="start")
+    candles = buckets.ohlc().dropna()
+    return candles.reset_index().rename(columns={time: "time"})
+
+
+_default_cache: Optional[PriceHistoryCache] = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> PriceHistoryCache:
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = PriceHistoryCache()
+        return _default_cache
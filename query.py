@@ -0,0 +1,186 @@
+"""
+Query builder: turns view filters into API parameters where the endpoint
+documents them, and filters the rest locally with vectorized pandas.
+
+    query = (
+        Query("/token-screener")
+        .where(chains=["ethereum"], sectors=["DeFi"], only_smart_money=True, max_age_days=30)
+        .order_by("netflow", "volume")
+        .limit(30)
+    )
+    payload = query.payload({"page": 1, "recordsPerPage": 100})  # chains, sectorsFilter, ... sent to the API
+    df = query.apply(frame)  # max_age_days, ordering and limit applied locally
+
+Only parameters listed in PUSHDOWN are sent; nothing is guessed. The API has
+no documented age, volume or sort parameters, so those are always local.
+"""
+import copy
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+INFLOWS = "/smart-money/inflows"
+HOLDINGS = "/smart-money/holdings"
+SCREENER = "/token-screener"
+
+_SMART_MONEY_PARAMS = {
+    "chains": "chains",
+    "sm_labels": "smFilter",
+    "exclude_sm_labels": "excludeSmFilter",
+    "include_stablecoins": "includeStablecoin",
+    "include_native": "includeNativeTokens",
+}
+
+# Filter name -> API parameter, per endpoint.
+PUSHDOWN: Dict[str, Dict[str, str]] = {
+    INFLOWS: _SMART_MONEY_PARAMS,
+    HOLDINGS: _SMART_MONEY_PARAMS,
+    SCREENER: {
+        "chains": "chains",
+        "sectors": "sectorsFilter",
+        "sm_labels": "smLabelFilter",
+        "watchlist": "watchlistFilter",
+        "only_smart_money": "onlySmartMoney",
+        "date": "date",
+    },
+}
+
+# Parameters the endpoints expect even when unused (matches the payloads the worker snapshots).
+DEFAULT_PARAMETERS: Dict[str, Dict] = {
+    INFLOWS: {"chains": [], "smFilter": [], "excludeSmFilter": []},
+    HOLDINGS: {"chains": [], "smFilter": [], "excludeSmFilter": []},
+    SCREENER: {"chains": [], "watchlistFilter": [], "sectorsFilter": [], "smLabelFilter": []},
+}
+
+# Filter name -> frame column, for filters applied locally.
+LOCAL_COLUMNS: Dict[str, Dict[str, str]] = {
+    INFLOWS: {"max_age_days": "tokenAgeDaysNum", "min_volume": "volume24hUSD", "sectors": "sectors"},
+    HOLDINGS: {"max_age_days": "tokenAgeDaysNum", "min_balance": "balanceUsd", "sectors": "sectors"},
+    SCREENER: {"max_age_days": "tokenAgeDaysNum", "min_volume": "volume"},
+}
+
+
+def _empty(value) -> bool:
+    return value is None or (isinstance(value, (list, tuple, set)) and not value)
+
+
+class Query:
+    def __init__(self, path: str):
+        if path not in PUSHDOWN:
+            raise ValueError(f"No query capabilities known for {path}.")
+        self.path = path
+        self.filters: Dict = {}
+        self.order: List[str] = []
+        self.ascending = False
+        self.max_rows: Optional[int] = None
+
+    def where(self, **filters) -> "Query":
+        """Add filters; None or an empty list means "no filter"."""
+        known = set(PUSHDOWN[self.path]) | set(LOCAL_COLUMNS[self.path])
+        unknown = set(filters) - known
+        if unknown:
+            raise ValueError(f"{self.path} cannot filter by {', '.join(sorted(unknown))}.")
+        query = self._copy()
+        query.filters.update({name: value for name, value in filters.items() if not _empty(value)})
+        return query
+
+    def order_by(self, *columns: str, ascending: bool = False) -> "Query":
+        query = self._copy()
+        query.order, query.ascending = list(columns), ascending
+        return query
+
+    def limit(self, rows: Optional[int]) -> "Query":
+        query = self._copy()
+        query.max_rows = rows
+        return query
+
+    def _copy(self) -> "Query":
+        query = copy.copy(self)
+        query.filters = dict(self.filters)
+        return query
+
+    def pushed(self) -> Dict:
+        """Filters sent to the API."""
+        return {name: value for name, value in self.filters.items() if name in PUSHDOWN[self.path]}
+
+    def local(self) -> Dict:
+        """Filters applied by apply()."""
+        return {name: value for name, value in self.filters.items() if name not in PUSHDOWN[self.path]}
+
+    def parameters(self) -> Dict:
+        params = copy.deepcopy(DEFAULT_PARAMETERS[self.path])
+        for name, value in self.pushed().items():
+            api_name = PUSHDOWN[self.path][name]
+            if name == "date" and isinstance(value, (tuple, list)):
+                value = {"from": str(value[0]), "to": str(value[1])}
+            params[api_name] = list(value) if isinstance(value, (tuple, set)) else value
+        return params
+
+    def payload(self, pagination: Dict) -> Dict:
+        return {"parameters": self.parameters(), "pagination": dict(pagination)}
+
+    def mask(self, df: "pd.DataFrame"):
+        """Boolean array of the rows passing the local filters."""
+        import numpy as np
+
+        keep = np.ones(len(df), dtype=bool)
+        for name, value in self.local().items():
+            column = df[LOCAL_COLUMNS[self.path][name]]
+            if name == "max_age_days":
+                keep &= column.fillna(np.inf).to_numpy() <= value
+            elif name.startswith("min_"):
+                keep &= column.fillna(-np.inf).to_numpy() >= value
+            elif name == "sectors":
+                keep &= _any_sector(column, set(value))
+        return keep
+
+    def apply(self, df: "pd.DataFrame") -> "pd.DataFrame":
+        """Local filters, then ordering and limit (partial selection when limited)."""
+        from aggregates import top_k
+
+        if self.local():
+            df = df[self.mask(df)]
+        if self.order and self.max_rows is not None:
+            return top_k(df, self.order, [self.ascending] * len(self.order), self.max_rows)
+        if self.order:
+            df = df.sort_values(self.order, ascending=self.ascending)
+        return df.head(self.max_rows) if self.max_rows is not None else df
+
+
+def _any_sector(column: "pd.Series", wanted: set):
+    """Rows whose sectors (joined with ", " by dataframes.py) include any wanted sector."""
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Decide once per category, then broadcast through the codes.
+        hits = np.array([bool(wanted & set(str(c).split(", "))) for c in column.cat.categories], dtype=bool)
+        codes = column.cat.codes.to_numpy()
+        out = np.zeros(len(column), dtype=bool)
+        valid = codes >= 0
+        out[valid] = hits[codes[valid]]
+        return out
+    return column.map(
+        lambda s: bool(wanted & set(s if isinstance(s, (list, tuple)) else str(s).split(", ")))
+    ).to_numpy(dtype=bool)
+
+
+def smart_money_query(
+    chains: Sequence[str], sm_labels: Sequence[str], include_stablecoins: bool = True, include_native: bool = True,
+    path: str = INFLOWS,
+) -> Query:
+    """The dashboard's smart money query (inflows and holdings take the same parameters)."""
+    return Query(path).where(
+        chains=list(chains), sm_labels=list(sm_labels),
+        include_stablecoins=include_stablecoins, include_native=include_native,
+    )
+
+
+def screener_query(
+    chains: Sequence[str], date_from, date_to, only_smart_money: bool = True, sectors: Sequence[str] = (),
+) -> Query:
+    query = Query(SCREENER).where(chains=list(chains), sectors=list(sectors), only_smart_money=only_smart_money)
+    if date_from and date_to:
+        query = query.where(date=(date_from, date_to))
+    return query
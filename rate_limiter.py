@@ -0,0 +1,222 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+RATE_LIMIT = float(os.getenv("NANSEN_RATE_LIMIT", "20"))
+RATE_BURST = float(os.getenv("NANSEN_RATE_BURST", "20"))
+RATE_LIMIT_PER_MIN = float(os.getenv("NANSEN_RATE_LIMIT_PER_MIN", "500"))
+CREDITS_PER_MIN = float(os.getenv("NANSEN_CREDITS_PER_MIN", "0"))
+RATE_LIMIT_DB = os.getenv("NANSEN_RATE_LIMIT_DB", "")
+
+# Lower values are served first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREFETCH = 1
+PRIORITY_BACKGROUND = 2
+
+# Credits charged per call. Override with NANSEN_ENDPOINT_CREDITS='{"/token-screener": 5}'.
+DEFAULT_CREDITS = 1.0
+ENDPOINT_CREDITS: Dict[str, float] = {
+    "/smart-money/inflows": 1.0,
+    "/smart-money/holdings": 1.0,
+    "/token-screener": 1.0,
+    "/tgm/flow-intelligence": 1.0,
+    "/tgm/flows": 1.0,
+}
+ENDPOINT_CREDITS.update(json.loads(os.getenv("NANSEN_ENDPOINT_CREDITS", "{}")))
+
+# Waiters that are not at the head of the queue re-check this often.
+POLL_INTERVAL = 0.01
+
+
+def credits_for(path: str) -> float:
+    return ENDPOINT_CREDITS.get(path, DEFAULT_CREDITS)
+
+
+class TokenBucket:
+    """A named refill rule: `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, name: str, rate: float, capacity: float):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+
+
+class LocalBucketStore:
+    """Bucket levels for this process only."""
+
+    def __init__(self):
+        self._levels: Dict[str, Tuple[float, float]] = {}
+
+    def try_take(self, wants: List[Tuple[TokenBucket, float]], now: float) -> float:
+        """Take from every bucket and return 0, or take nothing and return the seconds to wait.
+        Callers serialise access."""
+        levels = {}
+        wait = 0.0
+        for bucket, amount in wants:
+            tokens, updated = self._levels.get(bucket.name, (bucket.capacity, now))
+            tokens = min(bucket.capacity, tokens + (now - updated) * bucket.rate)
+            levels[bucket.name] = tokens - amount
+            if tokens < amount:
+                wait = max(wait, (amount - tokens) / bucket.rate)
+        if wait <= 0:
+            for name, tokens in levels.items():
+                self._levels[name] = (tokens, now)
+        return wait
+
+
+class SqliteBucketStore:
+    """Bucket levels shared by every process using the same database file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def try_take(self, wants: List[Tuple[TokenBucket, float]], now: float) -> float:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = {}
+            wait = 0.0
+            for bucket, amount in wants:
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (bucket.name,)).fetchone()
+                tokens, updated = row if row else (bucket.capacity, now)
+                tokens = min(bucket.capacity, tokens + max(0.0, now - updated) * bucket.rate)
+                levels[bucket.name] = tokens - amount
+                if tokens < amount:
+                    wait = max(wait, (amount - tokens) / bucket.rate)
+            if wait <= 0:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                    [(name, tokens, now) for name, tokens in levels.items()],
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class RateLimiter:
+    """
+    Priority-ordered admission control over request-rate and credit buckets.
+    Waiters are served strictly by (priority, arrival) order, so interactive
+    calls overtake queued prefetch and background work.
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT,
+        burst: float = RATE_BURST,
+        per_minute: float = RATE_LIMIT_PER_MIN,
+        credits_per_minute: float = CREDITS_PER_MIN,
+        store_path: Optional[str] = None,
+    ):
+        self.request_buckets = []
+        if rate > 0:
+            self.request_buckets.append(TokenBucket("requests_per_second", rate, burst))
+        if per_minute > 0:
+            self.request_buckets.append(TokenBucket("requests_per_minute", per_minute / 60.0, per_minute))
+        self.credit_bucket = (
+            TokenBucket("credits_per_minute", credits_per_minute / 60.0, credits_per_minute)
+            if credits_per_minute > 0 else None
+        )
+        self.store = SqliteBucketStore(store_path) if store_path else LocalBucketStore()
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._waits: deque = deque(maxlen=1000)
+        self._stats = {"granted": 0, "credits_spent": 0.0, "total_wait": 0.0, "max_wait": 0.0, "pauses": 0}
+
+    def _wants(self, credits: float) -> List[Tuple[TokenBucket, float]]:
+        wants = [(bucket, 1.0) for bucket in self.request_buckets]
+        if self.credit_bucket is not None and credits > 0:
+            wants.append((self.credit_bucket, min(credits, self.credit_bucket.capacity)))
+        return wants
+
+    def _try_acquire(self, ticket: Tuple[int, int], credits: float) -> float:
+        with self._lock:
+            if self._queue[0] != ticket:
+                return POLL_INTERVAL
+            now = time.time()
+            if self._paused_until > now:
+                return self._paused_until - now
+            wait = self.store.try_take(self._wants(credits), now)
+            if wait <= 0:
+                heapq.heappop(self._queue)
+            return wait
+
+    async def acquire(self, credits: float = DEFAULT_CREDITS, priority: int = PRIORITY_INTERACTIVE):
+        if not self.request_buckets and self.credit_bucket is None:
+            return
+        ticket = (priority, next(self._seq))
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._try_acquire(ticket, credits)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+        finally:
+            with self._lock:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+        waited = time.monotonic() - started
+        with self._lock:
+            self._waits.append((priority, waited))
+            self._stats["granted"] += 1
+            self._stats["credits_spent"] += credits
+            self._stats["total_wait"] += waited
+            self._stats["max_wait"] = max(self._stats["max_wait"], waited)
+
+    def pause(self, seconds: float):
+        """Hold every waiter back, e.g. after the API answered 429 with Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.time() + seconds)
+            self._stats["pauses"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["queue_depth"] = len(self._queue)
+            stats["queued_by_priority"] = {}
+            for priority, _ in self._queue:
+                stats["queued_by_priority"][priority] = stats["queued_by_priority"].get(priority, 0) + 1
+            waits = sorted(w for _, w in self._waits)
+        stats["avg_wait"] = stats["total_wait"] / stats["granted"] if stats["granted"] else 0.0
+        stats["p95_wait"] = waits[int(0.95 * (len(waits) - 1))] if waits else 0.0
+        return stats
+
+
+_default_limiter: Optional[RateLimiter] = None
+_default_lock = threading.Lock()
+
+
+def default_limiter() -> RateLimiter:
+    """Limiter shared by every client in the process (and across processes with NANSEN_RATE_LIMIT_DB)."""
+    global _default_limiter
+    if _default_limiter is None:
+        with _default_lock:
+            if _default_limiter is None:
+                _default_limiter = RateLimiter(store_path=RATE_LIMIT_DB or None)
+    return _default_limiter
@@ -0,0 +1,196 @@
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+CACHE_SIZE = int(os.getenv("NANSEN_CACHE_SIZE", "256"))
+CACHE_DB = os.getenv("NANSEN_CACHE_DB", "")
+DEFAULT_TTL = float(os.getenv("NANSEN_CACHE_TTL", "300"))
+# Expired rows are deleted from the SQLite tier once every this many writes.
+CACHE_PURGE_EVERY = int(os.getenv("NANSEN_CACHE_PURGE_EVERY", "500"))
+
+# Seconds a response stays fresh per endpoint; 0 disables caching for that endpoint.
+ENDPOINT_TTLS = {
+    "/smart-money/inflows": 300,
+    "/smart-money/holdings": 300,
+    "/token-screener": 300,
+    "/tgm/flow-intelligence": 300,
+    "/tgm/flows": 900,
+}
+
+MISS = object()
+
+
+def canonical_key(path: str, payload: Dict) -> str:
+    """Stable key for (endpoint, payload): key order and whitespace do not matter."""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{path}\n{body}".encode()).hexdigest()
+
+
+class MemoryTier:
+    """Size-bounded LRU of (expires_at, value) entries."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, now: float):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return MISS
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._items[key]
+                return MISS
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, expires_at: float):
+        with self._lock:
+            self._items[key] = (expires_at, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SqliteTier:
+    """On-disk tier shared by every session and process pointing at the same file."""
+
+    def __init__(self, path: str, purge_every: int = CACHE_PURGE_EVERY):
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = itertools.count(1)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, now: float):
+        row = self._conn().execute(
+            "SELECT expires_at, value FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[0] <= now:
+            return MISS, None
+        return json.loads(row[1]), row[0]
+
+    def set(self, key: str, value, expires_at: float):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, expires_at, value) VALUES (?, ?, ?)",
+            (key, expires_at, json.dumps(value)),
+        )
+        conn.commit()
+        if self.purge_every > 0 and next(self._writes) % self.purge_every == 0:
+            self.purge_expired()
+
+    def purge_expired(self, now: Optional[float] = None):
+        conn = self._conn()
+        conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now or time.time(),))
+        conn.commit()
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM responses")
+        conn.commit()
+
+
+class ResponseCache:
+    """
+    Two-tier response cache keyed on (endpoint path, canonical JSON payload).
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_SIZE,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = DEFAULT_TTL,
+        disk_path: Optional[str] = None,
+    ):
+        self.ttls = dict(ENDPOINT_TTLS)
+        self.ttls.update(ttls or {})
+        self.default_ttl = default_ttl
+        self.memory = MemoryTier(max_entries)
+        self.disk = SqliteTier(disk_path) if disk_path else None
+        self._stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0, "stores": 0}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        return cls(disk_path=CACHE_DB or None)
+
+    def ttl_for(self, path: str) -> float:
+        return self.ttls.get(path, self.default_ttl)
+
+    def _count(self, *names: str):
+        with self._stats_lock:
+            for name in names:
+                self._stats[name] += 1
+
+    def get(self, path: str, payload: Dict):
+        """Return the cached value or MISS."""
+        if self.ttl_for(path) <= 0:
+            return MISS
+        key = canonical_key(path, payload)
+        now = time.time()
+        value = self.memory.get(key, now)
+        if value is not MISS:
+            self._count("hits", "memory_hits")
+            return value
+        if self.disk is not None:
+            value, expires_at = self.disk.get(key, now)
+            if value is not MISS:
+                self.memory.set(key, value, expires_at)
+                self._count("hits", "disk_hits")
+                return value
+        self._count("misses")
+        return MISS
+
+    def set(self, path: str, payload: Dict, value):
+        ttl = self.ttl_for(path)
+        if ttl <= 0:
+            return
+        key = canonical_key(path, payload)
+        expires_at = time.time() + ttl
+        self.memory.set(key, value, expires_at)
+        if self.disk is not None:
+            self.disk.set(key, value, expires_at)
+        self._count("stores")
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        return stats
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from dataframes import holdings_to_dataframe, inflows_to_dataframe, screener_to_dataframe
+from response_cache import canonical_key
+
+SNAPSHOT_DIR = os.getenv("NANSEN_SNAPSHOT_DIR", "")
+SNAPSHOT_MAX_AGE = float(os.getenv("NANSEN_SNAPSHOT_MAX_AGE", "900"))
+SNAPSHOT_KEEP = int(os.getenv("NANSEN_SNAPSHOT_KEEP", "24"))
+
+# dataset name -> (endpoint path, converter)
+DATASETS = {
+    "inflows": ("/smart-money/inflows", inflows_to_dataframe),
+    "holdings": ("/smart-money/holdings", holdings_to_dataframe),
+    "screener": ("/token-screener", screener_to_dataframe),
+}
+
+
+class SnapshotStore:
+    """
+    Versioned Parquet snapshots, one directory per (dataset, payload, max_records):
+
+        <root>/<dataset>/<key>/<version>.parquet
+        <root>/<dataset>/<key>/LATEST   (JSON: version, rows, written_at, payload)
+
+    LATEST is replaced atomically, so readers never see a half-written snapshot.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._frames: Dict[str, Tuple[str, pd.DataFrame]] = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, dataset: str, payload: Dict, max_records: Optional[int]) -> str:
+        key = canonical_key(dataset, {"payload": payload, "max_records": max_records})
+        return os.path.join(self.root, dataset, key[:24])
+
+    def write(self, dataset: str, payload: Dict, df: pd.DataFrame, max_records: Optional[int] = None) -> str:
+        directory = self._dir(dataset, payload, max_records)
+        os.makedirs(directory, exist_ok=True)
+        version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        df.to_parquet(os.path.join(directory, f"{version}.parquet"), index=False)
+        meta = {
+            "dataset": dataset,
+            "version": version,
+            "rows": int(len(df)),
+            "written_at": time.time(),
+            "payload": payload,
+            "max_records": max_records,
+        }
+        tmp = os.path.join(directory, f".LATEST.{os.getpid()}.tmp")
+        with open(tmp, "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, os.path.join(directory, "LATEST"))
+        return version
+
+    def latest_meta(self, dataset: str, payload: Dict, max_records: Optional[int] = None) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self._dir(dataset, payload, max_records), "LATEST")) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def read_latest(
+        self, dataset: str, payload: Dict, max_records: Optional[int] = None, max_age: Optional[float] = SNAPSHOT_MAX_AGE
+    ) -> Optional[pd.DataFrame]:
+        """Latest snapshot frame, or None when missing or older than `max_age` seconds."""
+        meta = self.latest_meta(dataset, payload, max_records)
+        if meta is None or (max_age is not None and time.time() - meta["written_at"] > max_age):
+            return None
+        directory = self._dir(dataset, payload, max_records)
+        with self._lock:
+            cached = self._frames.get(directory)
+        if cached is not None and cached[0] == meta["version"]:
+            return cached[1]
+        try:
+            df = pd.read_parquet(os.path.join(directory, f"{meta['version']}.parquet"))
+        except OSError:
+            return None
+        with self._lock:
+            self._frames[directory] = (meta["version"], df)
+        return df
+
+    def prune(self, dataset: str, payload: Dict, max_records: Optional[int] = None, keep: int = SNAPSHOT_KEEP):
+        """Delete all but the newest `keep` versions."""
+        directory = self._dir(dataset, payload, max_records)
+        try:
+            versions = sorted(name for name in os.listdir(directory) if name.endswith(".parquet"))
+        except OSError:
+            return
+        for name in versions[:-keep] if keep > 0 else versions:
+            os.remove(os.path.join(directory, name))
+
+
+_default_store: Optional[SnapshotStore] = None
+
+
+def default_store() -> Optional[SnapshotStore]:
+    """Store under NANSEN_SNAPSHOT_DIR, or None when snapshots are not configured."""
+    global _default_store
+    if _default_store is None and SNAPSHOT_DIR:
+        _default_store = SnapshotStore(SNAPSHOT_DIR)
+    return _default_store
@@ -1,36 +1,17 @@
 #!/usr/bin/env python3
 
 import os
-import json
 import streamlit as st
-from dotenv import load_dotenv
-
-from views.smart_money import render_smart_money
-from views.token_screener import render_token_screener, render_flow_intelligence
-
-DEFAULT_PAYLOAD = {
-        "parameters": {
-            "smFilter": [
-                "180D Smart Trader",
-                "Fund",
-                "Smart Trader"
-            ],
-            "chains": [
-                "ethereum",
-                "solana"
-            ],
-            "includeStablecoin": True,
-            "includeNativeTokens": True,
-            "excludeSmFilter": []
-        },
-        "pagination": {
-            "page": 1,
-            "recordsPerPage": 100
-        }
-    }
+
+from config import load_config
+from query import screener_query, smart_money_query
 
 
 def main():
+    load_config()
+    from metrics import start_server
+
+    start_server()  # no-op unless NANSEN_METRICS_PORT is set
     st.set_page_config(page_title="Smart Money Dashboard", layout="wide")
     
     # Handle authentication
@@ -59,11 +40,17 @@ def main():
     #     st.error("Missing API key. Add 'apiKey' to your .env file.")
     #     st.stop()
 
-    tab_smart, tab_screener = st.tabs(["Smart Money", "Token Screener"])
+    show_admin = os.getenv("NANSEN_ADMIN_PANEL", "").lower() in ("1", "true", "yes")
+    tabs = st.tabs(["Smart Money", "Token Screener"] + (["Admin"] if show_admin else []))
+    tab_smart, tab_screener = tabs[:2]
     with tab_smart:
         include_stable = st.checkbox("Include Stablecoins", value=True)
         include_native = st.checkbox("Include Native Tokens", value=True)
         page_size = st.slider("Records per page", 10, 200, 100, 10)
+        max_records = st.number_input(
+            "Max records (fetched across pages)",
+            min_value=10, max_value=10000, value=100, step=10
+        )
         new_token_max_days = st.number_input(
             "Max token age (days) to consider 'new'",
             min_value=1, max_value=3650, value=30, step=1
@@ -80,15 +67,15 @@ def main():
         )
         submitted = st.button("Run Query")
 
-        payload = json.loads(json.dumps(DEFAULT_PAYLOAD))
-        payload["parameters"]["includeStablecoin"] = include_stable
-        payload["parameters"]["includeNativeTokens"] = include_native
-        payload["parameters"]["chains"] = selected_chains
-        payload["parameters"]["smFilter"] = selected_filters
-        payload["pagination"]["recordsPerPage"] = page_size
+        payload = smart_money_query(
+            selected_chains, selected_filters, include_stablecoins=include_stable, include_native=include_native
+        ).payload({"page": 1, "recordsPerPage": page_size})
 
         if submitted:
-            render_smart_money(payload, new_token_max_days)
+            # Views (and pandas/pyarrow behind them) load on first use, not on the login page.
+            from views.smart_money import render_smart_money
+
+            render_smart_money(payload, new_token_max_days, int(max_records))
 
     with tab_screener:
         col_a, col_b, col_c = st.columns(3)
@@ -103,23 +90,29 @@ def main():
         with col_c:
             date_to = st.date_input("To date")
         only_sm = st.checkbox("Only Smart Money", value=True)
+        sectors_text = st.text_input("Sectors (comma-separated, filtered by the API)", value="")
         screener_page_size = st.slider("Screener records per page", 10, 200, 100, 10)
+        screener_max_records = st.number_input(
+            "Screener max records (fetched across pages)",
+            min_value=10, max_value=10000, value=100, step=10
+        )
         run_screener = st.button("Run Screener")
 
-        if run_screener:
-            parameters = {
-                "chains": screener_chains or ["ethereum", "solana", "base"],
-                "watchlistFilter": [],
-                "sectorsFilter": [],
-                "smLabelFilter": [],
-                "onlySmartMoney": bool(only_sm)
-            }
-            if date_from and date_to:
-                parameters["date"] = {"from": str(date_from), "to": str(date_to)}
+        # Results stay on screen across reruns (e.g. "Analyze flows" below them)
+        # once the screener has been run in this session.
+        if run_screener or st.session_state.get("screener_key"):
+            sectors = [sector.strip() for sector in sectors_text.split(",") if sector.strip()]
+            parameters = screener_query(
+                screener_chains or ["ethereum", "solana", "base"], date_from, date_to,
+                only_smart_money=bool(only_sm), sectors=sectors,
+            ).parameters()
             pagination = {"page": 1, "recordsPerPage": int(screener_page_size)}
-            # Mark trigger for downstream to persist df in session
-            st.session_state["_trigger_run_screener"] = True
-            render_token_screener(parameters, pagination)
+            if run_screener:
+                # Mark trigger for downstream to load the (possibly new) query
+                st.session_state["_trigger_run_screener"] = True
+            from views.token_screener import render_token_screener
+
+            render_token_screener(parameters, pagination, int(screener_max_records))
 
         st.divider()
         st.subheader("Flow Intelligence")
@@ -137,8 +130,16 @@ def main():
 
         if run_flow:
             pagination = {"page": 1, "recordsPerPage": int(fi_rpp)}
+            from views.token_screener import render_flow_intelligence
+
             render_flow_intelligence(fi_chain, fi_token.strip(), fi_timeframe, pagination)
 
+    if show_admin:
+        with tabs[2]:
+            from views.admin import render_admin_panel
+
+            render_admin_panel()
+
 
 if __name__ == "__main__":
     main()
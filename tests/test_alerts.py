@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+from alerts import AlertEngine, Rule, parse_rule
+
+RULE = {"id": "big", "dataset": "inflows", "when": [["volume24hUSD", ">=", 100]], "cooldown": 60}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def inflows(**volumes):
+    return pd.DataFrame({
+        "chain": "ethereum",
+        "tokenAddress": list(volumes),
+        "symbol": [address.upper() for address in volumes],
+        "volume24hUSD": list(volumes.values()),
+    })
+
+
+def fired(alerts):
+    return sorted(alert.key.split(":")[1] for alert in alerts)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def engine(clock):
+    return AlertEngine([parse_rule(RULE)], clock=clock)
+
+
+def test_edge_triggered(engine, clock):
+    assert fired(engine.evaluate("inflows", inflows(a=150, b=50))) == ["a"]
+    clock.now += 600
+    assert engine.evaluate("inflows", inflows(a=150, b=50)) == []
+    assert engine.evaluate("inflows", inflows(a=200, b=50)) == []  # still matching: no new edge
+    assert fired(engine.evaluate("inflows", inflows(a=200, b=120))) == ["b"]
+
+
+def test_cooldown(engine, clock):
+    assert fired(engine.evaluate("inflows", inflows(a=150))) == ["a"]
+    engine.evaluate("inflows", inflows(a=50))
+    clock.now += 30
+    assert engine.evaluate("inflows", inflows(a=150)) == []
+    engine.evaluate("inflows", inflows(a=50))
+    clock.now += 60
+    assert fired(engine.evaluate("inflows", inflows(a=150))) == ["a"]
+
+
+def test_complete_drop_and_return(engine, clock):
+    assert fired(engine.evaluate("inflows", inflows(a=150, b=150), complete=True)) == ["a", "b"]
+    clock.now += 600
+    engine.evaluate("inflows", inflows(b=150), complete=True)
+    assert fired(engine.evaluate("inflows", inflows(a=150, b=150), complete=True)) == ["a"]
+
+
+def test_cooldown_shared_across_sources(engine, clock):
+    assert fired(engine.evaluate("inflows", inflows(a=150), source="q1")) == ["a"]
+    assert engine.evaluate("inflows", inflows(a=150), source="q2") == []
+    clock.now += 600
+    assert fired(engine.evaluate("inflows", inflows(a=150, b=150), source="q2")) == ["b"]
+    assert engine.evaluate("inflows", inflows(a=150), source="q1") == []
+
+
+def test_numeric_ops_need_numbers():
+    with pytest.raises(ValueError, match="needs a number"):
+        parse_rule({**RULE, "when": [["volume24hUSD", ">", "1e6"]]})
+
+
+def test_bad_rule_skips_only_itself(clock, caplog):
+    bad = Rule("bad", "inflows", (("volume24hUSD", ">", "1e6"),))  # built without parse_rule's checks
+    engine = AlertEngine([bad, parse_rule(RULE)], clock=clock)
+    alerts = engine.evaluate("inflows", inflows(a=150))
+    assert [alert.rule_id for alert in alerts] == ["big"]
+    assert "Rule bad skipped" in caplog.text
@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import CancelledError
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+import pytest
+
+import analytics_pool
+from analytics_pool import JOBS, AnalyticsPool, Job, screener_aggregates_async
+
+
+@pytest.fixture
+def pool():
+    pool = AnalyticsPool(workers=0)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def clean_runs(monkeypatch):
+    monkeypatch.setattr(analytics_pool, "_inflight", {})
+    monkeypatch.setattr(analytics_pool, "_failed", analytics_pool.OrderedDict())
+
+
+def screener(n=50):
+    return pd.DataFrame({
+        "tokenSymbol": [f"T{i}" for i in range(n)],
+        "volume": range(n), "netflow": range(n), "priceUsd": 1.0, "liquidity": 1.0,
+        "buyVolume": 1.0, "sellVolume": 1.0,
+    })
+
+
+def fail_with(error):
+    def run(df, **params):
+        raise error
+    return Job(run, lambda **params: [])
+
+
+def wait(handle):
+    # Runs after screener_aggregates_async's own done callback.
+    finished = threading.Event()
+    handle.add_done_callback(lambda _handle: finished.set())
+    assert finished.wait(10)
+
+
+def test_deterministic_failure_is_kept(pool, monkeypatch):
+    monkeypatch.setitem(JOBS, "correlation", fail_with(ValueError("bad frame")))
+    df = screener()
+    first = screener_aggregates_async(df, "v1", pool=pool)
+    wait(first)
+    assert screener_aggregates_async(df, "v1", pool=pool) is first
+
+
+@pytest.mark.parametrize("error", [BrokenProcessPool("worker died"), CancelledError()])
+def test_transient_failure_is_retried(pool, monkeypatch, error):
+    monkeypatch.setitem(JOBS, "correlation", fail_with(error))
+    df = screener()
+    first = screener_aggregates_async(df, "v1", pool=pool)
+    wait(first)
+    assert screener_aggregates_async(df, "v1", pool=pool) is not first
+
+
+def test_unversioned_failure_is_not_kept(pool, monkeypatch):
+    monkeypatch.setitem(JOBS, "correlation", fail_with(ValueError("bad frame")))
+    df = screener()
+    first = screener_aggregates_async(df, None, pool=pool)
+    wait(first)
+    assert analytics_pool._failed == {}
+    assert screener_aggregates_async(df, None, pool=pool) is not first
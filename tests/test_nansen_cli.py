@@ -0,0 +1,44 @@
+import pandas as pd
+import pyarrow.parquet as pq
+
+from dataframes import inflows_to_dataframe
+from nansen_cli import FrameWriter
+
+
+def inflow(i, **fields):
+    return {"chain": "ethereum", "tokenAddress": f"0x{i}", "symbol": f"T{i}", "volume24hUSD": 1.0, **fields}
+
+
+def test_parquet_null_first_page(tmp_path):
+    out = tmp_path / "inflows.parquet"
+    writer = FrameWriter(str(out), "parquet")
+    writer.write(inflows_to_dataframe([inflow(1, tokenAgeDays=None, sectors=None, note=None)]))
+    writer.write(inflows_to_dataframe([inflow(2, tokenAgeDays=3.5, sectors=["DeFi"], note="new")]))
+    writer.write(inflows_to_dataframe([inflow(3, tokenAgeDays=None, sectors=None, note=None)]))
+    writer.close()
+
+    df = pq.read_table(out).to_pandas()
+    assert writer.rows == 3
+    assert df["tokenAgeDays"].tolist()[1] == 3.5
+    assert df["sectors"].tolist()[1] == "DeFi"
+    assert df["note"].tolist()[1] == "new"
+
+
+def test_parquet_column_never_typed(tmp_path):
+    out = tmp_path / "inflows.parquet"
+    writer = FrameWriter(str(out), "parquet")
+    writer.write(inflows_to_dataframe([inflow(1, tokenAgeDays=None)]))
+    writer.close()
+
+    assert pq.read_table(out).num_rows == 1
+
+
+def test_csv_keeps_first_page_columns(tmp_path, capsys):
+    out = tmp_path / "rows.csv"
+    writer = FrameWriter(str(out), "csv")
+    writer.write(pd.DataFrame({"a": [1], "b": [2]}))
+    writer.write(pd.DataFrame({"b": [3], "c": [4]}))
+    writer.close()
+
+    assert out.read_text().splitlines() == ["a,b", "1,2", ",3"]
+    assert "c" in capsys.readouterr().err
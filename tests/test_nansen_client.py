@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from benchmarks.mock_api import MockNansenAPI
+from nansen_client import AsyncNansenClient, NansenClient, RateLimitError
+from rate_limiter import RateLimiter
+
+INFLOWS = "/smart-money/inflows"
+PAGE = {"pagination": {"page": 1, "recordsPerPage": 100}}
+
+
+@pytest.fixture
+def api():
+    api = MockNansenAPI(records=250)
+    yield api
+    api.stop()
+
+
+def client_for(url: str, **kwargs) -> AsyncNansenClient:
+    kwargs.setdefault("rate_limiter", RateLimiter(rate=0, per_minute=0))
+    kwargs.setdefault("backoff_base", 0.01)
+    return AsyncNansenClient(base_url=url, api_key="test", **kwargs)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def fetch(url: str, path: str = INFLOWS, payload=PAGE, **kwargs):
+    async def main():
+        client = client_for(url, **kwargs)
+        try:
+            return await client._post(path, payload)
+        finally:
+            await client.aclose()
+
+    return run(main())
+
+
+def test_429_waits_for_retry_after(api):
+    api.fail_first, api.error_statuses, api.retry_after = 1, [429], 0.3
+    started = time.monotonic()
+    records = fetch(api.start())
+    assert time.monotonic() - started >= 0.3
+    assert len(records) == 100
+    assert api.stats() == {"requests": 2, "errors": 1, "connections": 1}
+
+
+def test_5xx_is_retried_with_backoff(api):
+    api.fail_first, api.error_statuses = 2, [503]
+    assert len(fetch(api.start(), max_retries=3)) == 100
+    assert api.stats()["requests"] == 3
+
+
+def test_retry_limit(api):
+    api.fail_first, api.error_statuses = 10, [503]
+    with pytest.raises(httpx.HTTPStatusError):
+        fetch(api.start(), max_retries=2)
+    assert api.stats()["requests"] == 3
+
+
+def test_429_after_retries_is_rate_limit_error(api):
+    api.fail_first, api.error_statuses, api.retry_after = 10, [429], 0.01
+    with pytest.raises(RateLimitError):
+        fetch(api.start(), max_retries=1)
+    assert api.stats()["requests"] == 2
+
+
+@pytest.mark.parametrize("records, max_records, pages", [
+    (250, None, [100, 100, 50]),
+    (200, None, [100, 100]),  # a full last page: stops at the empty one after it
+    (0, None, []),
+    (250, 150, [100, 50]),
+])
+def test_iter_pages_stops(api, records, max_records, pages):
+    api.records = records
+
+    async def main():
+        client = client_for(api.start())
+        try:
+            return [len(page) async for page in client.iter_pages(INFLOWS, PAGE, max_records)]
+        finally:
+            await client.aclose()
+
+    assert run(main()) == pages
+
+
+def test_concurrent_calls_share_one_pool(api):
+    api.latency = 0.05
+    client = NansenClient(
+        base_url=api.start(), api_key="test", pool_size=2, rate_limiter=RateLimiter(rate=0, per_minute=0)
+    )
+    try:
+        results = []
+
+        def call(page: int):
+            payload = {"pagination": {"page": page, "recordsPerPage": 10}}
+            results.append(len(client.smart_money_inflows(payload)))
+
+        threads = [threading.Thread(target=call, args=(page,)) for page in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        client.close()
+    assert results == [10] * 8
+    assert api.stats()["connections"] <= 2
+
+
+def test_unused_prefetch_is_cancelled(api):
+    async def main():
+        # Three requests go out at once; the prefetched fourth and fifth wait on the limiter.
+        client = client_for(api.start(), rate_limiter=RateLimiter(rate=0.5, burst=3, per_minute=0))
+        payload = {"pagination": {"page": 1, "recordsPerPage": 100}}
+        pages = [len(page) async for page in client.iter_pages(INFLOWS, payload, prefetch=2)]
+        await asyncio.sleep(0)
+        inflight = dict(client._inflight)
+        await client.aclose()
+        return pages, inflight
+
+    pages, inflight = run(main())
+    assert pages == [100, 100, 50]
+    assert inflight == {}
+    assert api.stats()["requests"] == 3
@@ -0,0 +1,56 @@
+import pandas as pd
+
+import history_store
+from nansen_worker import run_once
+
+FRAME = pd.DataFrame({"chain": ["ethereum"], "tokenAddress": ["0x1"], "volume24hUSD": [1.0]})
+
+
+class Client:
+    def fetch_all(self, path, payload, to_dataframe, max_records=None):
+        return FRAME
+
+
+class Store:
+    def __init__(self):
+        self.written = []
+
+    def write(self, dataset, payload, df, max_records=None):
+        self.written.append(dataset)
+        return len(self.written)
+
+    def prune(self, dataset, payload, max_records=None):
+        pass
+
+
+class BrokenHistory:
+    def __init__(self):
+        self.maintained = []
+
+    def append(self, dataset, df):
+        raise OSError("disk full")
+
+    def maintain(self, dataset):
+        self.maintained.append(dataset)
+
+
+class Alerts:
+    def __init__(self):
+        self.evaluated = []
+
+    def evaluate(self, dataset, df, complete=False, source=None):
+        self.evaluated.append(dataset)
+        return []
+
+
+def test_history_failure_keeps_snapshot_and_alerts(monkeypatch, caplog):
+    history = BrokenHistory()
+    monkeypatch.setattr(history_store, "default_history", lambda: history)
+    store, alerts = Store(), Alerts()
+    jobs = [{"dataset": "inflows", "payload": {}}, {"dataset": "holdings", "payload": {}}]
+
+    assert run_once(Client(), store, jobs, alerts) == 2
+    assert store.written == alerts.evaluated == ["inflows", "holdings"]
+    assert sorted(history.maintained) == ["holdings", "inflows"]
+    assert "Appending inflows to the history failed" in caplog.text
+    assert "Refreshing" not in caplog.text
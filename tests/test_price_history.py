@@ -0,0 +1,68 @@
+import datetime
+
+import pandas as pd
+
+from price_history import PriceHistoryCache, merge_ranges, missing_ranges, ohlc
+
+D = datetime.date
+TODAY = D(2024, 6, 1)
+
+
+class FlowsClient:
+    """Answers /tgm/flows with one row per day and records the requested ranges."""
+
+    def __init__(self):
+        self.ranges = []
+
+    def fetch_all(self, path, payload, converter):
+        date = payload["parameters"]["date"]
+        start, end = D.fromisoformat(date["from"]), D.fromisoformat(date["to"])
+        self.ranges.append((start, end))
+        days = pd.date_range(start, end, freq="D")
+        return pd.DataFrame({"blockDate": days.strftime("%Y-%m-%d"), "priceUsd": 1.0})
+
+
+def test_missing_ranges():
+    assert missing_ranges([], (D(2024, 1, 1), D(2024, 1, 31)), TODAY) == [(D(2024, 1, 1), D(2024, 1, 31))]
+    assert missing_ranges([(D(2024, 1, 1), D(2024, 3, 10))], (D(2024, 2, 1), D(2024, 2, 10)), TODAY) == []
+    assert missing_ranges([(D(2024, 2, 1), D(2024, 2, 10))], (D(2024, 1, 25), D(2024, 2, 15)), TODAY) == [
+        (D(2024, 1, 25), D(2024, 1, 31)),
+        (D(2024, 2, 11), D(2024, 2, 15)),
+    ]
+    # Today is never covered.
+    assert missing_ranges([(D(2024, 5, 1), TODAY)], (D(2024, 5, 20), TODAY), TODAY) == [(TODAY, TODAY)]
+
+
+def test_missing_ranges_between_disjoint_windows():
+    covered = [(D(2024, 1, 1), D(2024, 1, 31)), (D(2024, 3, 1), D(2024, 3, 10))]
+    assert missing_ranges(covered, (D(2024, 1, 1), D(2024, 3, 10)), TODAY) == [(D(2024, 2, 1), D(2024, 2, 29))]
+
+
+def test_merge_ranges_keeps_gaps():
+    assert merge_ranges([(D(2024, 3, 1), D(2024, 3, 10)), (D(2024, 1, 1), D(2024, 1, 31))]) == [
+        (D(2024, 1, 1), D(2024, 1, 31)),
+        (D(2024, 3, 1), D(2024, 3, 10)),
+    ]
+    assert merge_ranges([(D(2024, 1, 1), D(2024, 1, 31)), (D(2024, 2, 1), D(2024, 2, 5))]) == [
+        (D(2024, 1, 1), D(2024, 2, 5))
+    ]
+
+
+def test_cache_fetches_gap_between_disjoint_windows():
+    client = FlowsClient()
+    cache = PriceHistoryCache(client)
+    cache.get("ethereum", "0xabc", D(2024, 1, 1), D(2024, 1, 30), today=TODAY)
+    cache.get("ethereum", "0xabc", D(2024, 2, 10), D(2024, 3, 10), today=TODAY)
+    client.ranges.clear()
+
+    frame = cache.get("ethereum", "0xabc", D(2024, 1, 1), D(2024, 3, 10), today=TODAY)
+
+    assert client.ranges == [(D(2024, 1, 31), D(2024, 2, 9))]
+    assert len(frame) == (D(2024, 3, 10) - D(2024, 1, 1)).days + 1
+
+
+def test_ohlc_candles_span_several_samples():
+    history = pd.DataFrame({"time": pd.date_range("2024-01-01", periods=30, freq="D"), "priceUsd": range(30)})
+    candles = ohlc(history)
+    assert len(candles) == 5
+    assert candles.iloc[0][["open", "high", "low", "close"]].tolist() == [0, 6, 0, 6]
@@ -0,0 +1,15 @@
+from response_cache import SqliteTier
+
+
+def rows(tier: SqliteTier) -> int:
+    return tier._conn().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def test_sqlite_tier_purges_expired_rows_on_write(tmp_path):
+    tier = SqliteTier(str(tmp_path / "cache.sqlite"), purge_every=3)
+    tier.set("old", [1], expires_at=1.0)
+    tier.set("fresh", [2], expires_at=4e9)
+    assert rows(tier) == 2
+    tier.set("newer", [3], expires_at=4e9)
+    assert rows(tier) == 2
+    assert tier.get("fresh", now=2.0) == ([2], 4e9)
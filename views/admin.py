@@ -0,0 +1,66 @@
+import datetime
+import sys
+
+import pandas as pd
+import streamlit as st
+
+from metrics import REGISTRY
+
+
+def _spans_frame(spans) -> pd.DataFrame:
+    rows = [
+        {
+            "time": datetime.datetime.fromtimestamp(s.started_at).strftime("%H:%M:%S.%f")[:-3],
+            "stage": s.name,
+            "ms": round(s.seconds * 1000, 1),
+            "endpoint": s.tags.get("endpoint") or s.tags.get("view"),
+            "error": s.error,
+            "tags": ", ".join(f"{k}={v}" for k, v in s.tags.items() if k not in ("endpoint", "view")),
+        }
+        for s in spans
+    ]
+    return pd.DataFrame(rows, columns=["time", "stage", "ms", "endpoint", "error", "tags"])
+
+
+def render_admin_panel():
+    """Counters, latest spans, slow-query log and cache/limiter/data-layer stats of this process."""
+    st.subheader("Instrumentation")
+    if st.button("Refresh", key="admin_refresh"):
+        st.rerun()
+
+    counters = REGISTRY.counters()
+    st.markdown("**Counters**")
+    if counters:
+        st.dataframe(
+            pd.DataFrame({"metric": list(counters), "value": list(counters.values())}),
+            use_container_width=True, hide_index=True,
+        )
+    else:
+        st.caption("No requests yet.")
+
+    spans = REGISTRY.recent_spans(200)
+    st.markdown("**Latest spans**")
+    stages = sorted({s.name for s in spans})
+    chosen = st.multiselect("Stages", options=stages, default=stages, key="admin_stages")
+    st.dataframe(_spans_frame([s for s in spans if s.name in chosen]), use_container_width=True, hide_index=True)
+
+    st.markdown(f"**Slow log (>= {REGISTRY.slow_seconds:g}s)**")
+    slow = REGISTRY.slow_spans()
+    if slow:
+        st.dataframe(_spans_frame(slow), use_container_width=True, hide_index=True)
+    else:
+        st.caption("Nothing slow so far.")
+
+    # Only show components that are already loaded; the panel should not create them.
+    stats = {}
+    client_module = sys.modules.get("nansen_client")
+    if client_module is not None and client_module._shared_client is not None:
+        client = client_module._shared_client
+        stats["Response cache"] = client.cache_stats()
+        stats["Rate limiter"] = client.rate_limit_stats()
+    layer_module = sys.modules.get("data_layer")
+    if layer_module is not None and layer_module._default_layer is not None:
+        stats["Data layer"] = layer_module._default_layer.stats()
+    for title, values in stats.items():
+        st.markdown(f"**{title}**")
+        st.json(values, expanded=False)
@@ -0,0 +1,26 @@
+from typing import Dict
+
+import pandas as pd
+import streamlit as st
+
+from deltas import events_to_dataframe, tracker_for
+from response_cache import canonical_key
+
+
+def render_changes(dataset: str, payload: Dict, df: pd.DataFrame):
+    """Show what changed for this query since this session's previous fetch."""
+    trackers = st.session_state.setdefault("_delta_trackers", {})
+    key = canonical_key(dataset, payload)
+    tracker = trackers.get(key)
+    if tracker is None:
+        tracker = trackers[key] = tracker_for(dataset)
+    first = tracker.updates == 0
+    events = tracker.update(df, complete=True)
+    if first:
+        return
+    label = f"Changes since last fetch ({len(events)})"
+    with st.expander(label, expanded=False):
+        if not events:
+            st.caption("No changes.")
+        else:
+            st.dataframe(events_to_dataframe(events), use_container_width=True)
@@ -0,0 +1,16 @@
+import logging
+import uuid
+
+import streamlit as st
+
+from metrics import inc
+
+logger = logging.getLogger("nansen.views")
+
+
+def show_error(view: str, exc: BaseException, message: str = "Unexpected error"):
+    """Log the traceback and count the failure, then show the message with a reference to the log line."""
+    ref = uuid.uuid4().hex[:8]
+    logger.error("%s failed in view %s [ref %s]", type(exc).__name__, view, ref, exc_info=exc)
+    inc("nansen_view_errors_total", view=view, error=type(exc).__name__)
+    st.error(f"{message}: {exc} (ref {ref})")
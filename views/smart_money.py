@@ -1,87 +1,145 @@
-from typing import Dict
+from typing import Dict, Optional
 import streamlit as st
 
-from nansen_client import NansenClient
-from dataframes import inflows_to_dataframe, holdings_to_dataframe
+from data_layer import default_layer
+from metrics import span
+from query import HOLDINGS, INFLOWS, Query
+from nansen_client import RateLimitError, get_client
+from history_store import record_frame
+from views.changes import render_changes
+from views.errors import show_error
+from snapshot_store import DATASETS, default_store
 
 
-def render_smart_money(payload: Dict, new_token_max_days: int):
-    client = NansenClient()
+def _load_frames(payload: Dict, max_records: Optional[int]) -> Dict:
+    """Inflows and holdings frames (or the exception raised fetching them)."""
+    layer = default_layer()
+    store = default_store()
+    frames = {}
+    for name in ("inflows", "holdings"):
+        path = DATASETS[name][0]
+        entry = layer.lookup(path, payload, max_records)
+        if entry is None:
+            snapshot = store.read_latest(name, payload, max_records) if store else None
+            if snapshot is not None:
+                entry = layer.put(path, payload, snapshot, max_records)
+        if entry is not None:
+            frames[name] = entry.frame
+    # Whatever the worker has not snapshotted is fetched live; the two calls are
+    # independent, so they run concurrently.
+    missing = {
+        name: ("fetch_records", DATASETS[name][0], payload, max_records)
+        for name in ("inflows", "holdings") if name not in frames
+    }
+    if missing:
+        for name, items in get_client().gather(missing).items():
+            if isinstance(items, Exception):
+                frames[name] = items
+                continue
+            with span("normalize", endpoint=DATASETS[name][0], records=len(items)):
+                frames[name] = DATASETS[name][1](items)
+            layer.put(DATASETS[name][0], payload, frames[name], max_records)
+            record_frame(name, frames[name])
+    return frames
+
+
+def _render_inflows(df, payload: Dict, new_token_max_days: int):
+    if df.empty:
+        st.warning("No inflows data returned for the selected filters.")
+    else:
+        render_changes("inflows", payload, df)
+        st.subheader("Most commonly traded tokens by Smart Money (last day)")
+        top_traded = Query(INFLOWS).order_by("volume24hUSD").limit(20).apply(df)
+        st.dataframe(
+            top_traded[[
+                "symbol", "chain", "tokenAddress", "volume24hUSD", "nofTraders", "sectors", "marketCap"
+            ]].rename(columns={
+                "symbol": "Token",
+                "chain": "Chain",
+                "tokenAddress": "Address",
+                "volume24hUSD": "24h Volume (USD)",
+                "nofTraders": "#SM Traders",
+                "sectors": "Sectors",
+                "marketCap": "Market Cap (USD)"
+            }),
+            use_container_width=True
+        )
+        st.bar_chart(top_traded.set_index("symbol")["volume24hUSD"])
+
+        st.subheader("New tokens significantly adopted by Smart Money")
+        # Token age is not an API filter, so it is applied to the fetched frame.
+        new_tokens = (
+            Query(INFLOWS).where(max_age_days=new_token_max_days).order_by("volume24hUSD").limit(20).apply(df)
+        )
+        st.dataframe(
+            new_tokens[[
+                "symbol", "chain", "tokenAddress", "tokenAgeDays", "volume24hUSD", "nofTraders", "sectors", "marketCap"
+            ]].rename(columns={
+                "symbol": "Token",
+                "chain": "Chain",
+                "tokenAddress": "Address",
+                "tokenAgeDays": "Age (days)",
+                "volume24hUSD": "24h Volume (USD)",
+                "nofTraders": "#SM Traders",
+                "sectors": "Sectors",
+                "marketCap": "Market Cap (USD)"
+            }),
+            use_container_width=True
+        )
+
+
+def _render_holdings(df_h, payload: Dict):
+    if df_h.empty:
+        st.warning("No holdings data returned for the selected filters.")
+    else:
+        render_changes("holdings", payload, df_h)
+        st.subheader("What tokens are Smart Money holding?")
+        top_held = Query(HOLDINGS).order_by("balanceUsd").limit(50).apply(df_h)
+        st.dataframe(
+            top_held[[
+                "symbol", "chain", "tokenAddress", "balanceUsd", "balancePctChange24H",
+                "nofHolders", "shareOfHoldings", "sectors", "marketCap"
+            ]].rename(columns={
+                "symbol": "Token",
+                "chain": "Chain",
+                "tokenAddress": "Address",
+                "balanceUsd": "Balance (USD)",
+                "balancePctChange24H": "Balance Change 24h (%)",
+                "nofHolders": "#SM Holders",
+                "shareOfHoldings": "Share of Holdings",
+                "sectors": "Sectors",
+                "marketCap": "Market Cap (USD)"
+            }),
+            use_container_width=True
+        )
+        st.bar_chart(top_held.set_index("symbol")["balanceUsd"])
+
+
+def render_smart_money(payload: Dict, new_token_max_days: int, max_records: Optional[int] = None):
+    frames = _load_frames(payload, max_records)
 
     sub_inflows, sub_holdings = st.tabs(["Inflows", "Holdings"])
 
     with sub_inflows:
         try:
-            items = client.smart_money_inflows(payload)
-            df = inflows_to_dataframe(items)
-            if df.empty:
-                st.warning("No inflows data returned for the selected filters.")
-            else:
-                st.subheader("Most commonly traded tokens by Smart Money (last day)")
-                top_traded = df.sort_values("volume24hUSD", ascending=False).head(20)
-                st.dataframe(
-                    top_traded[[
-                        "symbol", "chain", "tokenAddress", "volume24hUSD", "nofTraders", "sectors", "marketCap"
-                    ]].rename(columns={
-                        "symbol": "Token",
-                        "chain": "Chain",
-                        "tokenAddress": "Address",
-                        "volume24hUSD": "24h Volume (USD)",
-                        "nofTraders": "#SM Traders",
-                        "sectors": "Sectors",
-                        "marketCap": "Market Cap (USD)"
-                    }),
-                    use_container_width=True
-                )
-                st.bar_chart(top_traded.set_index("symbol")["volume24hUSD"])
-
-                st.subheader("New tokens significantly adopted by Smart Money")
-                new_tokens = df[df["tokenAgeDaysNum"].fillna(1e9) <= new_token_max_days]
-                new_tokens = new_tokens.sort_values("volume24hUSD", ascending=False).head(20)
-                st.dataframe(
-                    new_tokens[[
-                        "symbol", "chain", "tokenAddress", "tokenAgeDays", "volume24hUSD", "nofTraders", "sectors", "marketCap"
-                    ]].rename(columns={
-                        "symbol": "Token",
-                        "chain": "Chain",
-                        "tokenAddress": "Address",
-                        "tokenAgeDays": "Age (days)",
-                        "volume24hUSD": "24h Volume (USD)",
-                        "nofTraders": "#SM Traders",
-                        "sectors": "Sectors",
-                        "marketCap": "Market Cap (USD)"
-                    }),
-                    use_container_width=True
-                )
+            df = frames["inflows"]
+            if isinstance(df, Exception):
+                raise df
+            with span("render", view="smart_money.inflows", rows=len(df)):
+                _render_inflows(df, payload, new_token_max_days)
+        except RateLimitError as e:
+            st.warning(f"{e} Please wait a moment and run the query again.")
         except Exception as e:
-            st.error(f"Unexpected error: {e}")
+            show_error("smart_money.inflows", e)
 
     with sub_holdings:
         try:
-            items_h = client.smart_money_holdings(payload)
-            df_h = holdings_to_dataframe(items_h)
-            if df_h.empty:
-                st.warning("No holdings data returned for the selected filters.")
-            else:
-                st.subheader("What tokens are Smart Money holding?")
-                top_held = df_h.sort_values("balanceUsd", ascending=False).head(50)
-                st.dataframe(
-                    top_held[[
-                        "symbol", "chain", "tokenAddress", "balanceUsd", "balancePctChange24H",
-                        "nofHolders", "shareOfHoldings", "sectors", "marketCap"
-                    ]].rename(columns={
-                        "symbol": "Token",
-                        "chain": "Chain",
-                        "tokenAddress": "Address",
-                        "balanceUsd": "Balance (USD)",
-                        "balancePctChange24H": "Balance Change 24h (%)",
-                        "nofHolders": "#SM Holders",
-                        "shareOfHoldings": "Share of Holdings",
-                        "sectors": "Sectors",
-                        "marketCap": "Market Cap (USD)"
-                    }),
-                    use_container_width=True
-                )
-                st.bar_chart(top_held.set_index("symbol")["balanceUsd"])
+            df_h = frames["holdings"]
+            if isinstance(df_h, Exception):
+                raise df_h
+            with span("render", view="smart_money.holdings", rows=len(df_h)):
+                _render_holdings(df_h, payload)
+        except RateLimitError as e:
+            st.warning(f"{e} Please wait a moment and run the query again.")
         except Exception as e:
-            st.error(f"Unexpected error: {e}")
+            show_error("smart_money.holdings", e)
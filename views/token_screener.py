@@ -1,23 +1,30 @@
-from typing import Dict, List
+import datetime
+from typing import Dict, Hashable, List, Optional
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
 import numpy as np
 
-from nansen_client import NansenClient
-from dataframes import screener_to_dataframe, flow_to_dataframe
+from aggregates import top_k
+from analytics_pool import screener_aggregates_async
+from nansen_client import RateLimitError, get_client
+from data_layer import default_layer
+from dataframes import flow_to_dataframe, flows_many_to_dataframe, screener_to_dataframe
+from metrics import span
+from history_store import default_history, record_frame
+from price_history import default_cache, lttb, ohlc
+from snapshot_store import default_store
+from views.changes import render_changes
+from views.errors import show_error
 
-
-def _corr_table(df: pd.DataFrame):
-    corr_df = df[["priceUsd", "liquidity", "volume", "netflow", "buyVolume", "sellVolume"]].copy()
-    corr = corr_df.corr(numeric_only=True)
-    st.dataframe(corr, use_container_width=True)
+ANALYTICS_POLL_SECONDS = 0.5
 
 
 def _candles_chart(df_c: pd.DataFrame, title: str = "Token Candles"):
     if df_c.empty or not set(["time", "open", "high", "low", "close"]).issubset(df_c.columns):
         st.info("No candle data available for this token/timeframe.")
         return
+    import plotly.graph_objects as go  # only needed once a chart is drawn
+
     fig = go.Figure(data=[go.Candlestick(
         x=df_c["time"], open=df_c["open"], high=df_c["high"], low=df_c["low"], close=df_c["close"]
     )])
@@ -25,150 +32,255 @@ def _candles_chart(df_c: pd.DataFrame, title: str = "Token Candles"):
     st.plotly_chart(fig, use_container_width=True)
 
 
-def render_token_screener(parameters: Dict, pagination: Dict):
-    client = NansenClient()
+def _price_history(sig: pd.DataFrame):
+    st.markdown("### Price History")
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        symbols = sig["tokenSymbol"].dropna().astype(str).unique().tolist()
+        selected_symbol = st.selectbox("Select token", options=symbols, key="price_symbol")
+    with col2:
+        timeframe = st.selectbox("Timeframe", options=["7d", "30d", "90d", "180d"], index=1, key="price_timeframe")
+    with col3:
+        style = st.selectbox("Chart", options=["Line", "Weekly candles"], index=0, key="price_style")
+    with col4:
+        run_chart = st.button("Load Chart")
+    if not run_chart or selected_symbol is None:
+        return
+    selected_row = sig[sig["tokenSymbol"].astype(str) == selected_symbol].iloc[0]
+    date_to = datetime.date.today()
+    date_from = date_to - datetime.timedelta(days=int(timeframe[:-1]))
+    try:
+        history = default_cache().get(
+            str(selected_row["chain"]), str(selected_row["tokenAddressHex"]), date_from, date_to
+        )
+    except RateLimitError as e:
+        st.warning(f"{e} Please wait a moment and load the chart again.")
+        return
+    except Exception as e:
+        show_error("token_screener.price_history", e, "Failed to load price history")
+        return
+    if history.empty or history["priceUsd"].isna().all():
+        st.info("No price history available from flows for this selection.")
+        return
+    candles = ohlc(history) if style == "Weekly candles" else None
+    if candles is not None and len(candles) >= 2:
+        _candles_chart(candles, title=f"{selected_symbol} ({timeframe})")
+    else:
+        if candles is not None:
+            st.caption("Too little history for weekly candles; showing the daily price instead.")
+        st.line_chart(lttb(history, "time", "priceUsd").set_index("time")["priceUsd"], height=300)
 
-    st.subheader("Token Screener: Smart Money Across Chains")
 
-    payload = {"parameters": parameters, "pagination": pagination}
-    try:
-        df_s = None
-        run_context = st.session_state.get("screener_df")
-        # Fetch new data if parameters changed via user action outside rerun
-        if st.session_state.get("_trigger_run_screener"):
-            st.session_state.pop("_trigger_run_screener", None)
-            screen_items = client.token_screener(payload)
-            df_s = screener_to_dataframe(screen_items)
-            st.session_state["screener_df"] = df_s
-        elif run_context is not None:
-            df_s = run_context
-        else:
-            # First-time render: fetch and store
-            screen_items = client.token_screener(payload)
-            df_s = screener_to_dataframe(screen_items)
-            st.session_state["screener_df"] = df_s
-        if df_s is None or df_s.empty:
-            st.warning("No screener data available.")
-            return
+def _fetch_screener(payload: Dict, max_records: Optional[int]) -> pd.DataFrame:
+    store = default_store()
+    snapshot = store.read_latest("screener", payload, max_records) if store else None
+    if snapshot is not None:
+        return snapshot
+    df = get_client().fetch_all("/token-screener", payload, screener_to_dataframe, max_records)
+    record_frame("screener", df)
+    return df
 
-        st.markdown("**Significant Smart Money activity (by volume/netflow)**")
-        sig = df_s.sort_values(["volume", "netflow"], ascending=[False, False]).head(30)
-        st.dataframe(
-            sig[["tokenSymbol", "chain", "tokenAddressHex", "volume", "netflow", "buyVolume", "sellVolume"]]
-            .rename(columns={
-                "tokenSymbol": "Token",
-                "tokenAddressHex": "Address",
-                "volume": "Volume (USD)",
-                "netflow": "Netflow (USD)",
-                "buyVolume": "Buy Vol (USD)",
-                "sellVolume": "Sell Vol (USD)"
-            }),
-            use_container_width=True
+
+def _netflow_changes():
+    history = default_history()
+    if history is None:
+        return
+    st.markdown("**Biggest netflow increases since yesterday**")
+    since = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=1)
+    deltas = history.top_deltas("screener", "netflow", since, k=20)
+    if deltas.empty:
+        st.info("Not enough screener history yet.")
+        return
+    st.dataframe(
+        deltas[["chain", "tokenAddress", "before", "after", "delta"]].rename(columns={
+            "tokenAddress": "Address",
+            "before": "Netflow 24h ago (USD)",
+            "after": "Netflow now (USD)",
+            "delta": "Change (USD)"
+        }),
+        use_container_width=True
+    )
+
+
+def _batch_flows(df_s: pd.DataFrame):
+    """Flow intelligence for the top screener tokens, filled in as responses arrive."""
+    st.markdown("**Flow intelligence for these results**")
+    c1, c2, c3 = st.columns([1, 1, 1])
+    with c1:
+        timeframe = st.selectbox("Timeframe", options=["1d", "7d", "30d"], index=0, key="batch_flow_timeframe")
+    with c2:
+        top_n = st.number_input(
+            "Tokens (top by volume)", min_value=1, max_value=500, value=min(100, len(df_s)), key="batch_flow_n"
         )
-        vol_series = sig.set_index("tokenSymbol")["volume"]
-        vol_series = vol_series.replace([np.inf, -np.inf], np.nan).dropna()
-        if vol_series.empty:
-            st.info("No finite volume values to chart.")
-        else:
-            st.bar_chart(vol_series)
-
-        # Selection for price history / candlestick
-        # st.markdown("### Price History")
-        # col1, col2, col3 = st.columns([2, 2, 1])
-        # with col1:
-        #     symbols = sig["tokenSymbol"].dropna().unique().tolist()
-        #     selected_symbol = st.selectbox("Select token", options=symbols)
-        # with col2:
-        #     filtered = sig[sig["tokenSymbol"] == selected_symbol]
-        #     if filtered.empty:
-        #         st.warning("Selected token not in current results.")
-        #         return
-        #     selected_row = filtered.iloc[0]
-        #     selected_address = selected_row["tokenAddressHex"]
-        #     selected_chain = selected_row["chain"]
-        #     timeframe = st.selectbox("Timeframe", options=["1d", "7d", "30d"], index=0)
-        # with col3:
-        #     run_candles = st.button("Load Chart")
-
-        # if run_candles:
-        #     # Use Token God Mode flows for price history
-        #     # Build date range from timeframe selection (approximate: last N days)
-        #     try:
-        #         import datetime as _dt
-        #         days = 1 if timeframe == "1d" else 7 if timeframe == "7d" else 30
-        #         date_to = _dt.date.today()
-        #         date_from = date_to - _dt.timedelta(days=days)
-        #         flows_payload = {
-        #             "parameters": {
-        #                 "chain": selected_chain,
-        #                 "tokenAddress": selected_address,
-        #                 "date": {"from": str(date_from), "to": str(date_to)},
-        #                 "label": "smart_money"
-        #             },
-        #             "pagination": {"page": 1, "recordsPerPage": 500}
-        #         }
-        #         flows = client.token_flows(flows_payload)
-        #         df_f = pd.DataFrame(flows)
-        #         if not df_f.empty and "blockDate" in df_f.columns and "priceUsd" in df_f.columns:
-        #             df_f = df_f.rename(columns={"blockDate": "time"})
-        #             df_f["time"] = pd.to_datetime(df_f["time"], errors="coerce")
-        #             # Render price line chart; if candles desired, we would need OHLC data
-        #             st.line_chart(df_f.set_index("time")["priceUsd"], height=300)
-        #         else:
-        #             st.info("No price history available from flows for this selection.")
-        #     except Exception as e:
-        #         st.error(f"Failed to load price history: {e}")
+    with c3:
+        run = st.button("Analyze flows for these results")
+    if not run:
+        return
+    top = top_k(df_s, ["volume"], [False], int(top_n))
+    # Deduplicated like iter_flow_intelligence does, so the counts below reach the total.
+    tokens = list(dict.fromkeys(zip(top["chain"].astype(str), top["tokenAddressHex"].astype(str))))
+    symbols = dict(zip(top["tokenAddressHex"].astype(str), top["tokenSymbol"].astype(str)))
+    progress = st.progress(0.0, text=f"0/{len(tokens)} tokens")
+    table = st.empty()
+    results: Dict = {}
+    failed: List[str] = []
+
+    def show():
+        wide = flows_many_to_dataframe(results)
+        if "tokenSymbol" not in wide.columns:
+            wide.insert(1, "tokenSymbol", wide["tokenAddress"].astype(str).map(symbols))
+        table.dataframe(wide, use_container_width=True)
+
+    done = 0
+    for done, (token, items) in enumerate(get_client().iter_flow_intelligence(tokens, timeframe), 1):
+        results[token] = items
+        if isinstance(items, Exception):
+            failed.append(f"{symbols.get(token[1], token[1])} ({items})")
+        progress.progress(done / len(tokens), text=f"{done}/{len(tokens)} tokens")
+        if done % 10 == 0:
+            show()
+    if done % 10:
+        show()
+    if failed:
+        st.warning(f"Flow intelligence failed for {len(failed)} tokens: " + "; ".join(failed[:10]))
+    record_frame("flows", flows_many_to_dataframe(results), timeframe=timeframe)
+
+
+def _part(handle, key: str) -> Optional[pd.DataFrame]:
+    """The finished analytics result, or None after showing why it is not there yet."""
+    if not handle.done(key):
+        st.caption("Computing…")
+        return None
+    error = handle.exception(key)
+    if error is not None:
+        show_error(f"token_screener.{key}", error)
+        return None
+    return handle.result(key)
+
+
+def _analytics(handle):
+    """Tables computed by the analytics pool, filled in as each job finishes."""
+    done_at_start = handle.done()
+
+    # Poll only while jobs are running; once all are done the whole page is
+    # rerun, so this section stops polling and other widgets see the results.
+    @st.fragment(run_every=None if done_at_start else ANALYTICS_POLL_SECONDS)
+    def section():
+        if not done_at_start and handle.done():
+            st.rerun()
+        finished, total = handle.progress()
+        if finished < total:
+            st.progress(finished / total, text=f"Analytics {finished}/{total}")
+
+        st.markdown("**Significant Smart Money activity (by volume/netflow)**")
+        sig = _part(handle, "significant")
+        if sig is not None:
+            st.dataframe(
+                sig[["tokenSymbol", "chain", "tokenAddressHex", "volume", "netflow", "buyVolume", "sellVolume"]]
+                .rename(columns={
+                    "tokenSymbol": "Token",
+                    "tokenAddressHex": "Address",
+                    "volume": "Volume (USD)",
+                    "netflow": "Netflow (USD)",
+                    "buyVolume": "Buy Vol (USD)",
+                    "sellVolume": "Sell Vol (USD)"
+                }),
+                use_container_width=True
+            )
+            vol_series = sig.set_index("tokenSymbol")["volume"]
+            vol_series = vol_series.replace([np.inf, -np.inf], np.nan).dropna()
+            if vol_series.empty:
+                st.info("No finite volume values to chart.")
+            else:
+                st.bar_chart(vol_series)
+            if done_at_start:
+                _price_history(sig)
 
         st.markdown("**Market metrics vs Smart Money movements**")
-        _corr_table(df_s)
-        st.caption("Correlation between price/liquidity/volume and SM netflow/buys/sells")
+        corr = _part(handle, "correlation")
+        if corr is not None:
+            st.dataframe(corr, use_container_width=True)
+            st.caption("Correlation between price/liquidity/volume and SM netflow/buys/sells")
 
         st.markdown("**Strong fundamentals (holder/trading proxies)**")
-        fundamentals = df_s.copy()
-        if "fdvMcRatio" in fundamentals.columns:
-            fundamentals = fundamentals.sort_values(["fdvMcRatio", "volume"], ascending=[True, False]).head(30)
-        else:
-            fundamentals = fundamentals.sort_values(["volume"], ascending=[False]).head(30)
-        st.dataframe(
-            fundamentals[[
-                "tokenSymbol", "chain", "marketCap", "fdv", "fdvMcRatio", "volume", "buyVolume", "sellVolume"
-            ]].rename(columns={
-                "tokenSymbol": "Token",
-                "marketCap": "Market Cap (USD)",
-                "fdv": "FDV (USD)",
-                "fdvMcRatio": "FDV/MC",
-                "volume": "Volume (USD)",
-                "buyVolume": "Buy Vol (USD)",
-                "sellVolume": "Sell Vol (USD)"
-            }),
-            use_container_width=True
-        )
+        fundamentals = _part(handle, "fundamentals")
+        if fundamentals is not None:
+            st.dataframe(
+                fundamentals[[
+                    "tokenSymbol", "chain", "marketCap", "fdv", "fdvMcRatio", "volume", "buyVolume", "sellVolume"
+                ]].rename(columns={
+                    "tokenSymbol": "Token",
+                    "marketCap": "Market Cap (USD)",
+                    "fdv": "FDV (USD)",
+                    "fdvMcRatio": "FDV/MC",
+                    "volume": "Volume (USD)",
+                    "buyVolume": "Buy Vol (USD)",
+                    "sellVolume": "Sell Vol (USD)"
+                }),
+                use_container_width=True
+            )
 
         st.markdown("**Emerging tokens with fresh inflows**")
-        emerging = df_s.copy()
-        if "tokenAgeDaysNum" in emerging.columns:
-            emerging = emerging[emerging["tokenAgeDaysNum"].fillna(1e9) <= 30]
-        emerging = emerging.sort_values(["netflow", "volume"], ascending=[False, False]).head(30)
-        st.dataframe(
-            emerging[[
-                "tokenSymbol", "chain", "tokenAddressHex", "tokenAgeDays", "netflow", "volume", "liquidity", "priceUsd"
-            ]].rename(columns={
-                "tokenSymbol": "Token",
-                "tokenAddressHex": "Address",
-                "tokenAgeDays": "Age (days)",
-                "netflow": "Netflow (USD)",
-                "volume": "Volume (USD)",
-                "liquidity": "Liquidity (USD)",
-                "priceUsd": "Price (USD)"
-            }),
-            use_container_width=True
-        )
+        emerging = _part(handle, "emerging")
+        if emerging is not None:
+            st.dataframe(
+                emerging[[
+                    "tokenSymbol", "chain", "tokenAddressHex", "tokenAgeDays", "netflow", "volume", "liquidity",
+                    "priceUsd"
+                ]].rename(columns={
+                    "tokenSymbol": "Token",
+                    "tokenAddressHex": "Address",
+                    "tokenAgeDays": "Age (days)",
+                    "netflow": "Netflow (USD)",
+                    "volume": "Volume (USD)",
+                    "liquidity": "Liquidity (USD)",
+                    "priceUsd": "Price (USD)"
+                }),
+                use_container_width=True
+            )
+
+    section()
+
+
+def _render_results(df_s: pd.DataFrame, payload: Dict, version: Hashable, fetched: bool):
+    if fetched:
+        render_changes("screener", payload, df_s)
+    # Aggregates run in the analytics pool; the rest of the page does not wait for them.
+    _analytics(screener_aggregates_async(df_s, version))
+
+    _netflow_changes()
+    _batch_flows(df_s)
+
+
+def render_token_screener(parameters: Dict, pagination: Dict, max_records: Optional[int] = None):
+    st.subheader("Token Screener: Smart Money Across Chains")
+
+    payload = {"parameters": parameters, "pagination": pagination}
+    try:
+        layer = default_layer()
+        # The frame lives in the shared data layer; the session keeps only its key.
+        entry = layer.get(st.session_state.get("screener_key", ""))
+        run = st.session_state.pop("_trigger_run_screener", False)
+        fetched = run or entry is None
+        if fetched:
+            entry = layer.get_or_load(
+                "/token-screener", payload, lambda: _fetch_screener(payload, max_records), max_records
+            )
+            st.session_state["screener_key"] = entry.key
+        df_s = entry.frame
+        if df_s is None or df_s.empty:
+            st.warning("No screener data available.")
+            return
+        with span("render", view="token_screener", rows=len(df_s)):
+            _render_results(df_s, payload, entry.version, fetched)
+    except RateLimitError as e:
+        st.warning(f"{e} Please wait a moment and run the query again.")
     except Exception as e:
-        st.error(f"Unexpected error: {e}")
+        show_error("token_screener", e)
 
 
 def render_flow_intelligence(chain: str, token_address: str, timeframe: str, pagination: Dict):
-    client = NansenClient()
+    client = get_client()
 
     st.subheader("Flow Intelligence")
     payload = {
@@ -178,9 +290,12 @@ def render_flow_intelligence(chain: str, token_address: str, timeframe: str, pag
     try:
         flow_items = client.flow_intelligence(payload)
         df_flow = flow_to_dataframe(flow_items)
+        record_frame("flows", df_flow, chain=chain, tokenAddress=token_address, timeframe=timeframe)
         if df_flow.empty:
             st.warning("No flow intelligence data returned for the selected inputs.")
         else:
             st.dataframe(df_flow, use_container_width=True)
+    except RateLimitError as e:
+        st.warning(f"{e} Please wait a moment and run the query again.")
     except Exception as e:
-        st.error(f"Unexpected error: {e}")
+        show_error("flow_intelligence", e)